@@ -17,18 +17,42 @@ CSV columns used (exact names from the form):
 - Tier (Very Common/Common/Rare)
 - Date Approved
 
-The script groups rows by SKU and merges locations into counts. It only includes rows where Approved == TRUE and Date Approved is within the recent window (default 30 days).
+The script groups rows by SKU and merges locations into counts. It only includes rows
+whose Date Approved (or, without one, Date Found) is within the recent window (default
+30 days; --window-days 0 keeps every row).
+
+It streams: the header -> alias mapping is resolved once per file, rows are
+aggregated by SKU in one pass (out-of-window rows are dropped as they are read),
+and the JSON array is written one item at a time.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
 import sys
-from collections import defaultdict
-from datetime import datetime
+import textwrap
+from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator, Sequence
+
+# extracted/ (shared date parsing) from the repo root, wherever this script lives
+for _parent in Path(__file__).resolve().parents:
+    if (_parent / "extracted").is_dir():
+        sys.path.insert(0, str(_parent / "extracted"))
+        break
+
+from date_parse import ISO, DateParser  # noqa: E402
 
 RECENT_WINDOW_DAYS = 30
+# "Date Found" values: ISO first, memoized (form exports repeat the same dates)
+FOUND_DATES = DateParser((ISO, "%Y-%m-%d"), strip=False)
+# "Date Approved" values (sheet timestamps like 1/31/2026 13:05:00, or ISO)
+APPROVED_DATES = DateParser()
+TIER_RANKS = {"Very Common": 3, "Common": 2, "Rare": 1}
 
 # Column alias map (case-insensitive). Add your form column names here if they differ.
 FIELD_ALIASES = {
@@ -80,17 +104,50 @@ FIELD_ALIASES = {
 }
 
 
-def build_lookup(row: dict) -> dict:
-    """Return a lowercase-keyed dict for easy lookup."""
-    return {str(k).strip().lower(): v for k, v in row.items()}
+# parse_row reads these canonical fields, in this order
+ROW_FIELDS = (
+    "sku",
+    "name",
+    "photo",
+    "city_state",
+    "notes",
+    "quantity",
+    "date_found",
+    "tier",
+    "status",
+    "date_approved",
+)
+
+
+def resolve_columns(fieldnames: Sequence[str]) -> Callable[[list], tuple]:
+    """
+    Resolve the header -> alias mapping once; returns a getter that turns a raw CSV
+    row into its ROW_FIELDS values ("" for fields the header does not have).
 
+    Headers match aliases case-insensitively after stripping; the first alias in
+    FIELD_ALIASES order wins, and a later header shadows an earlier one that
+    normalizes to the same name (as a lowercase-keyed dict of the row would).
+    The getter pads or truncates rows to the header width.
+    """
+    width = len(fieldnames)
+    by_alias = {str(name).strip().lower(): i for i, name in enumerate(fieldnames)}
+    # Fields without a column read the "" appended at index `width`
+    indexes = [
+        next((by_alias[a] for a in FIELD_ALIASES[key] if a in by_alias), width)
+        for key in ROW_FIELDS
+    ]
+    pick = itemgetter(*indexes)
+    pad = [""] * (width + 1)
 
-def pick_field(row_lc: dict, key: str) -> str:
-    """Fetch first matching alias value for a canonical key."""
-    for alias in FIELD_ALIASES.get(key, []):
-        if alias in row_lc:
-            return row_lc[alias]
-    return ""
+    def get(row: list) -> tuple:
+        if len(row) == width:
+            row.append("")
+        else:
+            row = row[:width]
+            row += pad[len(row) :]
+        return pick(row)
+
+    return get
 
 
 def parse_bool(value: str) -> bool:
@@ -101,116 +158,155 @@ def normalize_state(value: str) -> str:
     return value.strip().upper() if value else ""
 
 
-def parse_row(
-    row: dict, current_time: datetime, include_window_days: int
-) -> dict | None:
-    """Return None if this row should not be included (not approved, outside window).
-    Else return normalized dict.
+@lru_cache(maxsize=1 << 12)
+def _day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def parse_row(values: tuple, current_time: datetime, cutoff) -> tuple | None:
+    """Return None if this row is outside the window (cutoff: a date, or None
+    to keep everything). Else return (sku, name, photo, state, notes, quantity,
+    date, tier, status).
+
+    values: the row's ROW_FIELDS, from resolve_columns().
     """
-    row_lc = build_lookup(row)
+    sku, name, photo, city_state, notes, quantity, found, tier, status, approved = (
+        values
+    )
 
     # Use purchase date or fallback to now
-    date_found = pick_field(row_lc, "date_found")
-    if not date_found:
-        parsed_date = current_time
-    else:
-        try:
-            parsed_date = datetime.fromisoformat(date_found)
-        except ValueError:
-            try:
-                parsed_date = datetime.strptime(date_found, "%Y-%m-%d")
-            except ValueError:
-                parsed_date = current_time
-
-    # Split city/state if present
-    city_state_raw = pick_field(row_lc, "city_state").strip()
-    city, state = "", ""
-    if city_state_raw:
-        if "," in city_state_raw:
-            parts = city_state_raw.split(",")
-            city = parts[0].strip()
-            state = parts[1].strip().upper() if len(parts) > 1 else ""
-        else:
-            city = city_state_raw.strip()
-    return {
-        "sku": pick_field(row_lc, "sku").strip(),
-        "name": pick_field(row_lc, "name").strip(),
-        "photo": pick_field(row_lc, "photo"),
-        "state": state,
-        "city": city,
-        "notes": pick_field(row_lc, "notes").strip(),
-        "quantity": pick_field(row_lc, "quantity").strip(),
-        "date": parsed_date.strftime("%Y-%m-%d"),
-        "tier": (pick_field(row_lc, "tier") or "Rare").strip() or "Rare",
-        "status": pick_field(row_lc, "status").strip(),
-    }
-
-
-def aggregate_rows(row_list: list[dict]) -> list[dict]:
-    grouped = {}
+    parsed_date = FOUND_DATES.parse(found) or current_time
+    if cutoff is not None:
+        approved_date = APPROVED_DATES.parse(approved) or parsed_date
+        if approved_date.date() < cutoff:
+            return None
 
-    for r in row_list:
-        sku = r.get("sku")
-        if not sku:
-            continue
-        if sku not in grouped:
-            grouped[sku] = {
-                "id": sku,
-                "name": r.get("name", ""),
-                "sku": sku,
-                "price": 0.01,
-                "dateAdded": r.get("date"),
-                "tier": r.get("tier", "Rare"),
-                "status": r.get("status", ""),
-                "quantityFound": r.get("quantity", ""),
-                "imageUrl": r.get("photo", "/images/placeholder-product.jpg"),
-                "notes": r.get("notes", ""),
-                "locations": defaultdict(int),
-            }
-        # update latest date
-        if r.get("date"):
-            current = grouped[sku]["dateAdded"]
-            if not current or current < r.get("date"):
-                grouped[sku]["dateAdded"] = r.get("date")
+    # State from "City, State" if present
+    state = ""
+    if "," in city_state:
+        state = city_state.split(",")[1].strip().upper()
+    return (
+        sku.strip(),
+        name.strip(),
+        photo,
+        state,
+        notes.strip(),
+        quantity.strip(),
+        _day(parsed_date),
+        (tier or "Rare").strip() or "Rare",
+        status.strip(),
+    )
 
-        # prefer highest tier
-        tier_ranks = {"Very Common": 3, "Common": 2, "Rare": 1}
-        if tier_ranks.get(r.get("tier", "Rare"), 0) > tier_ranks.get(
-            grouped[sku]["tier"], 0
-        ):
-            grouped[sku]["tier"] = r.get("tier")
 
+class SkuAggregate:
+    """Compact per-SKU state: the first row's fields, latest date, best tier and
+    per-state counts."""
+
+    __slots__ = (
+        "name",
+        "date",
+        "tier",
+        "status",
+        "quantity",
+        "photo",
+        "notes",
+        "locations",
+    )
+
+    def __init__(self, row: tuple):
+        _sku, self.name, self.photo, _state, self.notes, self.quantity, *rest = row
+        self.date, self.tier, self.status = rest
+        self.locations = {}
+
+    def add(self, row: tuple) -> None:
+        date, tier = row[6], row[7]
+        # update latest date
+        if date and (not self.date or self.date < date):
+            self.date = date
+        # prefer highest tier
+        if TIER_RANKS.get(tier, 0) > TIER_RANKS.get(self.tier, 0):
+            self.tier = tier
         # aggregate states
-        st = r.get("state")
-        if st:
-            grouped[sku]["locations"][st] += 1
+        state = row[3]
+        if state:
+            self.locations[state] = self.locations.get(state, 0) + 1
 
-    # finalize
-    result = []
-    for _sku, entry in grouped.items():
-        entry["locations"] = dict(entry["locations"])
-        result.append(entry)
-    return result
+    def to_item(self, item_id: str, sku: str) -> dict:
+        return {
+            "id": item_id,
+            "name": self.name,
+            "sku": sku,
+            "price": 0.01,
+            "dateAdded": self.date,
+            "tier": self.tier,
+            "status": self.status,
+            "quantityFound": self.quantity,
+            "imageUrl": self.photo,
+            "notes": self.notes,
+            "locations": self.locations,
+        }
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(
-            "Usage: python scripts/csv-to-penny-json.py responses.csv > data/penny-list.json"
-        )
-        sys.exit(1)
+def aggregate_rows(rows: Iterable[tuple | None]) -> dict:
+    """Group parsed rows by SKU in one pass (first-seen order); None rows skipped."""
+    grouped = {}
+    for row in rows:
+        if row is None or not row[0]:
+            continue
+        entry = grouped.get(row[0])
+        if entry is None:
+            entry = grouped[row[0]] = SkuAggregate(row)
+        entry.add(row)
+    return grouped
 
-    csv_file = sys.argv[1]
+
+def iter_items(grouped: dict) -> Iterator[dict]:
+    # ids are incremental, not SKUs
+    for i, (sku, entry) in enumerate(grouped.items(), start=1):
+        yield entry.to_item(str(i), sku)
+
+
+def _item_json(item: dict) -> str:
+    # One element of json.dumps(list, indent=2): the item's own indent=2 text,
+    # shifted one level in.
+    return textwrap.indent(json.dumps(item, indent=2), "  ")
+
+
+def write_json_array(items: Iterable[dict], out: IO[str]) -> int:
+    """Write items as print(json.dumps(list, indent=2)) would, one at a time."""
+    count = 0
+    for item in items:
+        out.write(("[\n" if count == 0 else ",\n") + _item_json(item))
+        count += 1
+    out.write("\n]\n" if count else "[]\n")
+    return count
+
+
+def export(csv_file: str, out: IO[str], window_days: int = RECENT_WINDOW_DAYS) -> int:
+    """Stream csv_file into a Penny JSON array on out; returns the item count."""
+    now_dt = datetime.now()
+    cutoff = (now_dt - timedelta(days=window_days)).date() if window_days else None
     with open(csv_file, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        now_dt = datetime.now()
-        parsed_rows = [parse_row(r, now_dt, RECENT_WINDOW_DAYS) for r in reader]
-        parsed_rows = [r for r in parsed_rows if r is not None]
+        reader = csv.reader(f)
+        get = resolve_columns(next(reader, []))
+        grouped = aggregate_rows(
+            parse_row(get(row), now_dt, cutoff) for row in reader if row
+        )
+    return write_json_array(iter_items(grouped), out)
 
-    aggregated = aggregate_rows(parsed_rows)
 
-    # add IDs as incremental if not SKU
-    for i, item in enumerate(aggregated, start=1):
-        item["id"] = str(i)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert form responses CSV to Penny List JSON",
+        usage="python scripts/csv-to-penny-json.py responses.csv > data/penny-list.json",
+    )
+    parser.add_argument("csv_file", help="Form responses CSV")
+    parser.add_argument(
+        "--window-days",
+        type=int,
+        default=RECENT_WINDOW_DAYS,
+        help=f"Recent window in days (default {RECENT_WINDOW_DAYS}; 0 keeps every row)",
+    )
+    args = parser.parse_args()
 
-    print(json.dumps(aggregated, indent=2))
+    export(args.csv_file, sys.stdout, args.window_days)
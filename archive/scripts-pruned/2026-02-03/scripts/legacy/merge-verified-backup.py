@@ -7,14 +7,42 @@ migrated to Supabase in Dec 2025; use Supabase for moderation and enrichment.
 
 (Original behavior: merges backups, applies dedupe rules, and enriches fields. Retained
 for historical or one-off migration tasks only.)
+
+--stream merges exports too large for memory: every input is external-sorted by SKU
+(penny_merge.external_sort) and merge-joined one SKU at a time, so peak memory stays
+at about --chunk-rows rows per input. Rows come out ordered by SKU instead of input
+order; the rows themselves and the stats are the same as the in-memory merge.
 """
 
 import argparse
 import csv
 import json
+import os
 import re
+import sys
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from functools import partial
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# extracted/ (shared date parsing) from the repo root, wherever this script lives
+for _parent in Path(__file__).resolve().parents:
+    if (_parent / "extracted").is_dir():
+        sys.path.insert(0, str(_parent / "extracted"))
+        break
+
+from date_parse import DateParser  # noqa: E402
+from penny_merge import (  # noqa: E402
+    SORT_CHUNK_ROWS,
+    external_sort,
+    iter_json_object,
+    merge_sorted_groups,
+)
+
+SKU_FIELD = "Home Depot SKU (6 or 10 digits)"
+VERIFIED_CONTRIBUTOR = "Cade (GA)"  # All verified items are from Cade
 
 
 def normalize_sku(sku: str) -> str:
@@ -76,35 +104,23 @@ def merge_best_row(row1: Dict, row2: Dict) -> Dict:
     return merged
 
 
-def parse_date_maybe(date_str: str) -> Optional[datetime]:
-    """Parse a date string using common formats; return None if it cannot be parsed."""
-    date_str = date_str.strip()
-    if not date_str:
-        return None
-
-    formats = [
-        "%Y-%m-%d",
-        "%m/%d/%Y",
-        "%Y/%m/%d",
-    ]
+# Purchase-history dates; memoized, since the same dates repeat across many rows
+PURCHASE_DATES = DateParser(("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d"))
 
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
 
-    return None
+def parse_date_maybe(date_str: str) -> Optional[datetime]:
+    """Parse a date string using common formats; return None if it cannot be parsed."""
+    return PURCHASE_DATES.parse(date_str)
 
 
-def load_latest_purchase_dates(purchase_history_path: str) -> Dict[str, str]:
+def iter_ga_purchase_dates(
+    purchase_history_path: str,
+) -> Iterator[Tuple[str, datetime, str]]:
     """
-    Load GA purchase history and return sku -> latest purchase date (YYYY-MM-DD).
+    Yield (sku, parsed date, YYYY-MM-DD) for each dated GA row of the purchase history.
 
     Only considers rows where Store contains "GA".
     """
-    latest: Dict[str, Tuple[datetime, str]] = {}
-
     with open(purchase_history_path, "r", encoding="utf-8-sig", newline="") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -112,7 +128,7 @@ def load_latest_purchase_dates(purchase_history_path: str) -> Dict[str, str]:
             if "GA" not in store:
                 continue
 
-            sku = normalize_sku(row.get("Home Depot SKU (6 or 10 digits)", ""))
+            sku = normalize_sku(row.get(SKU_FIELD, ""))
             if not sku:
                 continue
 
@@ -121,33 +137,41 @@ def load_latest_purchase_dates(purchase_history_path: str) -> Dict[str, str]:
             if not parsed:
                 continue
 
-            iso_date = parsed.strftime("%Y-%m-%d")
-            if sku not in latest or parsed > latest[sku][0]:
-                latest[sku] = (parsed, iso_date)
+            yield sku, parsed, parsed.strftime("%Y-%m-%d")
+
+
+def load_latest_purchase_dates(purchase_history_path: str) -> Dict[str, str]:
+    """
+    Load GA purchase history and return sku -> latest purchase date (YYYY-MM-DD).
+    """
+    latest: Dict[str, Tuple[datetime, str]] = {}
+
+    for sku, parsed, iso_date in iter_ga_purchase_dates(purchase_history_path):
+        if sku not in latest or parsed > latest[sku][0]:
+            latest[sku] = (parsed, iso_date)
 
     return {sku: iso for sku, (_, iso) in latest.items()}
 
 
+def to_verified_item(item: Dict) -> Dict:
+    """Convert one verified backup entry to a verified item."""
+    return {
+        "sku": item.get("sku", ""),
+        "name": item.get("name", ""),
+        "internetNumber": item.get("internetNumber", ""),
+        "brand": item.get("brand", ""),
+        "model": item.get("model", ""),
+        "imageUrl": item.get("imageUrl", ""),
+        "purchaseDates": item.get("purchaseDates", []),
+    }
+
+
 def load_verified_backup(backup_path: str) -> List[Dict]:
     """Load verified backup JSON and convert to list of items."""
     with open(backup_path, "r", encoding="utf-8") as f:
         backup_data = json.load(f)
 
-    verified_items = []
-    for _sku, item in backup_data.items():
-        verified_items.append(
-            {
-                "sku": item.get("sku", ""),
-                "name": item.get("name", ""),
-                "internetNumber": item.get("internetNumber", ""),
-                "brand": item.get("brand", ""),
-                "model": item.get("model", ""),
-                "imageUrl": item.get("imageUrl", ""),
-                "purchaseDates": item.get("purchaseDates", []),
-            }
-        )
-
-    return verified_items
+    return [to_verified_item(item) for item in backup_data.values()]
 
 
 def load_current_csv(csv_path: str) -> List[Dict]:
@@ -157,6 +181,18 @@ def load_current_csv(csv_path: str) -> List[Dict]:
         return list(reader)
 
 
+def index_current_row(current_index: Dict[str, Dict], sku: str, row: Dict) -> None:
+    """Add one current row (valid, normalized sku) to the index, merging duplicates."""
+    contributor = infer_contributor_id(row, "current")
+    key = make_dedupe_key(sku, contributor)
+
+    # If duplicate within current data, merge
+    if key in current_index:
+        current_index[key] = merge_best_row(current_index[key], row)
+    else:
+        current_index[key] = row
+
+
 def build_current_index(current_rows: List[Dict]) -> Dict[str, Dict]:
     """
     Build index of current data with dedupe.
@@ -165,22 +201,129 @@ def build_current_index(current_rows: List[Dict]) -> Dict[str, Dict]:
     current_index = {}
 
     for row in current_rows:
-        sku = normalize_sku(row.get("Home Depot SKU (6 or 10 digits)", ""))
+        sku = normalize_sku(row.get(SKU_FIELD, ""))
         if not sku:
             continue  # Skip invalid SKUs
 
-        contributor = infer_contributor_id(row, "current")
-        key = make_dedupe_key(sku, contributor)
-
-        # If duplicate within current data, merge
-        if key in current_index:
-            current_index[key] = merge_best_row(current_index[key], row)
-        else:
-            current_index[key] = row
+        index_current_row(current_index, sku, row)
 
     return current_index
 
 
+def new_merge_stats() -> Dict[str, int]:
+    return {
+        "upserted": 0,
+        "inserted": 0,
+        "imageUrl_added": 0,
+        "internetSku_added": 0,
+        "brand_model_added": 0,
+        "name_added": 0,
+        "purchase_date_added": 0,
+    }
+
+
+def merge_verified_item(
+    existing_row: Optional[Dict],
+    verified_item: Dict,
+    sku: str,
+    latest_ga_date: str,
+    stats: Dict[str, int],
+    verbose: bool = False,
+) -> Dict:
+    """
+    Upsert one verified item (valid, normalized sku) into its current row, if any.
+
+    Returns the enriched existing row, or the new row to insert.
+    """
+    if existing_row is not None:
+        # UPSERT: Enrich existing row (fill blanks only)
+        updated = False
+
+        # Enrich imageUrl (only if blank)
+        photo_field = "IMAGE URL"
+        if not existing_row.get(photo_field) and verified_item["imageUrl"]:
+            existing_row[photo_field] = verified_item["imageUrl"]
+            stats["imageUrl_added"] += 1
+            updated = True
+
+        # Enrich internetSku (only if blank)
+        internet_field = "INTERNET SKU"
+        if not existing_row.get(internet_field) and verified_item["internetNumber"]:
+            existing_row[internet_field] = verified_item["internetNumber"]
+            stats["internetSku_added"] += 1
+            updated = True
+
+        # Enrich Notes with brand/model (only if "Verified:" not already present)
+        notes = existing_row.get("Notes (Optional)", "")
+        if verified_item["brand"] and verified_item["model"] and "Brand=" not in notes:
+            verified_meta = (
+                f"Brand={verified_item['brand']}; Model={verified_item['model']}"
+            )
+            if notes:
+                existing_row["Notes (Optional)"] = f"{notes}; {verified_meta}"
+            else:
+                existing_row["Notes (Optional)"] = verified_meta
+            stats["brand_model_added"] += 1
+            updated = True
+
+        # Update item name if blank
+        if not existing_row.get("Item Name") and verified_item["name"]:
+            existing_row["Item Name"] = verified_item["name"]
+            stats["name_added"] += 1
+            updated = True
+
+        # Fill purchase date if blank using latest GA purchase
+        if not existing_row.get("Purchase Date") and latest_ga_date:
+            existing_row["Purchase Date"] = latest_ga_date
+            stats["purchase_date_added"] += 1
+            updated = True
+
+        if updated:
+            stats["upserted"] += 1
+            if verbose:
+                print(f"  Upserted: {sku} ({VERIFIED_CONTRIBUTOR})")
+
+    else:
+        # INSERT: Add as new row
+        new_row = {
+            "Timestamp": "",
+            "Email Address": "",
+            "Item Name": verified_item["name"],
+            SKU_FIELD: sku,
+            "Exact Quantity Found": "",
+            "Store (City, State)": "GA",
+            "Purchase Date": (
+                verified_item["purchaseDates"][0]
+                if verified_item["purchaseDates"]
+                else latest_ga_date
+            ),
+            "IMAGE URL": verified_item["imageUrl"],
+            "Notes (Optional)": (
+                f"Brand={verified_item['brand']}; Model={verified_item['model']}"
+                if verified_item["brand"] and verified_item["model"]
+                else ""
+            ),
+            "INTERNET SKU": verified_item["internetNumber"],
+        }
+        stats["inserted"] += 1
+
+        if verified_item["imageUrl"]:
+            stats["imageUrl_added"] += 1
+        if verified_item["internetNumber"]:
+            stats["internetSku_added"] += 1
+        if verified_item["brand"] and verified_item["model"]:
+            stats["brand_model_added"] += 1
+        if latest_ga_date:
+            stats["purchase_date_added"] += 1
+
+        if verbose:
+            print(f"  Inserted: {sku} ({VERIFIED_CONTRIBUTOR})")
+
+        return new_row
+
+    return existing_row
+
+
 def merge_verified_items(
     current_index: Dict[str, Dict],
     verified_items: List[Dict],
@@ -194,114 +337,22 @@ def merge_verified_items(
         - Updated index
         - Stats dict
     """
-    stats = {
-        "upserted": 0,
-        "inserted": 0,
-        "imageUrl_added": 0,
-        "internetSku_added": 0,
-        "brand_model_added": 0,
-        "name_added": 0,
-        "purchase_date_added": 0,
-    }
+    stats = new_merge_stats()
 
     for verified_item in verified_items:
         sku = normalize_sku(verified_item["sku"])
         if not sku:
             continue  # Skip invalid SKUs
 
-        contributor = "Cade (GA)"  # All verified items are from Cade
-        key = make_dedupe_key(sku, contributor)
-        latest_ga_date = purchase_history_dates.get(sku, "")
-
-        if key in current_index:
-            # UPSERT: Enrich existing row (fill blanks only)
-            existing_row = current_index[key]
-            updated = False
-
-            # Enrich imageUrl (only if blank)
-            photo_field = "IMAGE URL"
-            if not existing_row.get(photo_field) and verified_item["imageUrl"]:
-                existing_row[photo_field] = verified_item["imageUrl"]
-                stats["imageUrl_added"] += 1
-                updated = True
-
-            # Enrich internetSku (only if blank)
-            internet_field = "INTERNET SKU"
-            if not existing_row.get(internet_field) and verified_item["internetNumber"]:
-                existing_row[internet_field] = verified_item["internetNumber"]
-                stats["internetSku_added"] += 1
-                updated = True
-
-            # Enrich Notes with brand/model (only if "Verified:" not already present)
-            notes = existing_row.get("Notes (Optional)", "")
-            if (
-                verified_item["brand"]
-                and verified_item["model"]
-                and "Brand=" not in notes
-            ):
-                verified_meta = (
-                    f"Brand={verified_item['brand']}; Model={verified_item['model']}"
-                )
-                if notes:
-                    existing_row["Notes (Optional)"] = f"{notes}; {verified_meta}"
-                else:
-                    existing_row["Notes (Optional)"] = verified_meta
-                stats["brand_model_added"] += 1
-                updated = True
-
-            # Update item name if blank
-            if not existing_row.get("Item Name") and verified_item["name"]:
-                existing_row["Item Name"] = verified_item["name"]
-                stats["name_added"] += 1
-                updated = True
-
-            # Fill purchase date if blank using latest GA purchase
-            if not existing_row.get("Purchase Date") and latest_ga_date:
-                existing_row["Purchase Date"] = latest_ga_date
-                stats["purchase_date_added"] += 1
-                updated = True
-
-            if updated:
-                stats["upserted"] += 1
-                if verbose:
-                    print(f"  Upserted: {sku} ({contributor})")
-
-        else:
-            # INSERT: Add as new row
-            new_row = {
-                "Timestamp": "",
-                "Email Address": "",
-                "Item Name": verified_item["name"],
-                "Home Depot SKU (6 or 10 digits)": sku,
-                "Exact Quantity Found": "",
-                "Store (City, State)": "GA",
-                "Purchase Date": (
-                    verified_item["purchaseDates"][0]
-                    if verified_item["purchaseDates"]
-                    else latest_ga_date
-                ),
-                "IMAGE URL": verified_item["imageUrl"],
-                "Notes (Optional)": (
-                    f"Brand={verified_item['brand']}; Model={verified_item['model']}"
-                    if verified_item["brand"] and verified_item["model"]
-                    else ""
-                ),
-                "INTERNET SKU": verified_item["internetNumber"],
-            }
-            current_index[key] = new_row
-            stats["inserted"] += 1
-
-            if verified_item["imageUrl"]:
-                stats["imageUrl_added"] += 1
-            if verified_item["internetNumber"]:
-                stats["internetSku_added"] += 1
-            if verified_item["brand"] and verified_item["model"]:
-                stats["brand_model_added"] += 1
-            if latest_ga_date:
-                stats["purchase_date_added"] += 1
-
-            if verbose:
-                print(f"  Inserted: {sku} ({contributor})")
+        key = make_dedupe_key(sku, VERIFIED_CONTRIBUTOR)
+        current_index[key] = merge_verified_item(
+            current_index.get(key),
+            verified_item,
+            sku,
+            purchase_history_dates.get(sku, ""),
+            stats,
+            verbose,
+        )
 
     return current_index, stats
 
@@ -329,8 +380,8 @@ def validate_output(final_rows: List[Dict]) -> bool:
     return True
 
 
-def write_output_csv(output_path: str, final_rows: List[Dict]):
-    """Write final CSV with correct column order."""
+def write_output_csv(output_path: str, final_rows: Iterable[Dict]) -> int:
+    """Write final CSV with correct column order; returns the row count."""
     fieldnames = [
         "Timestamp",
         "Email Address",
@@ -347,7 +398,11 @@ def write_output_csv(output_path: str, final_rows: List[Dict]):
     with open(output_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
         writer.writeheader()
-        writer.writerows(final_rows)
+        count = 0
+        for row in final_rows:
+            writer.writerow(row)
+            count += 1
+    return count
 
 
 def write_audit_log(
@@ -395,6 +450,123 @@ VALIDATION:
     print(audit_content)
 
 
+def stream_merge(args) -> int:
+    """
+    --stream: external-sort each input by SKU, then merge-join them one SKU at a time.
+
+    Every (SKU + contributor_id) key lives in exactly one SKU group, so deduping,
+    upserting and validating per group gives the same rows as the in-memory merge.
+    Output goes to a temporary file that replaces --output only if validation passes.
+    """
+    counts = {"current": 0, "verified": 0}
+
+    def current_records():
+        with open(args.current_csv, "r", encoding="utf-8-sig", newline="") as f:
+            for seq, row in enumerate(csv.DictReader(f)):
+                counts["current"] += 1
+                sku = normalize_sku(row.get(SKU_FIELD, ""))
+                if sku:
+                    yield sku, seq, row
+
+    def verified_records():
+        for seq, (_sku, item) in enumerate(iter_json_object(args.verified_backup)):
+            counts["verified"] += 1
+            verified_item = to_verified_item(item)
+            sku = normalize_sku(verified_item["sku"])
+            if sku:
+                yield sku, seq, verified_item
+
+    def purchase_records():
+        if args.purchase_history:
+            purchases = iter_ga_purchase_dates(args.purchase_history)
+            for seq, (sku, parsed, iso_date) in enumerate(purchases):
+                yield sku, seq, parsed, iso_date
+
+    # (sku, seq, ...) tuples sort by SKU, then input order
+    sort = partial(external_sort, chunk_rows=args.chunk_rows, tmp_dir=args.tmp_dir)
+    groups = merge_sorted_groups(
+        (
+            sort(current_records()),
+            sort(verified_records()),
+            sort(purchase_records()),
+        ),
+        itemgetter(0),
+    )
+    stats = new_merge_stats()
+    state = {"valid": True, "keys": 0}
+
+    def merged_rows():
+        for sku, (current, verified, purchases) in groups:
+            index: Dict[str, Dict] = {}
+            for _sku, _seq, row in current:
+                index_current_row(index, sku, row)
+            state["keys"] += len(index)
+
+            # Latest GA date; max() keeps the first of equal dates, like the index
+            latest_ga_date = max(purchases, key=itemgetter(2))[3] if purchases else ""
+            key = make_dedupe_key(sku, VERIFIED_CONTRIBUTOR)
+            for _sku, _seq, verified_item in verified:
+                index[key] = merge_verified_item(
+                    index.get(key),
+                    verified_item,
+                    sku,
+                    latest_ga_date,
+                    stats,
+                    verbose=args.verbose,
+                )
+
+            rows = list(index.values())
+            if not validate_output(rows):
+                state["valid"] = False
+                return
+            yield from rows
+
+    print("Streaming merge (inputs external-sorted by SKU)...")
+    tmp_output = None if args.dry_run else f"{args.output}.tmp"
+    if tmp_output:
+        final_row_count = write_output_csv(tmp_output, merged_rows())
+    else:
+        final_row_count = sum(1 for _ in merged_rows())
+
+    print(f"  Read {counts['verified']} verified items")
+    print(f"  Read {counts['current']} current rows")
+    print(f"  Indexed {state['keys']} unique (SKU + contributor_id) pairs")
+    print(f"\n  Upserted (enriched): {stats['upserted']} rows")
+    print(f"  Inserted (new): {stats['inserted']} rows")
+
+    if not state["valid"]:
+        if tmp_output:
+            os.remove(tmp_output)
+        print("\n[X] Validation failed. Aborting.")
+        return 1
+
+    print(f"  [OK] Validation passed ({final_row_count} rows)")
+
+    if args.dry_run:
+        print("\n[DRY RUN] No files written")
+        return 0
+
+    os.replace(tmp_output, args.output)
+    print(f"  [OK] Output CSV written: {args.output}")
+
+    if args.audit:
+        print(f"\nGenerating audit log: {args.audit}")
+        write_audit_log(
+            args.audit,
+            args.current_csv,
+            args.verified_backup,
+            args.output,
+            counts["current"],
+            counts["verified"],
+            final_row_count,
+            stats,
+        )
+        print("  [OK] Audit log written")
+
+    print("\n[DONE] Merge complete!")
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Merge verified pennies backup into consolidated CSV"
@@ -418,9 +590,26 @@ def main():
         "--dry-run", action="store_true", help="Preview changes without writing output"
     )
     parser.add_argument("--verbose", action="store_true", help="Detailed logging")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Constant-memory merge via external sort (output ordered by SKU)",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=SORT_CHUNK_ROWS,
+        help=f"--stream: rows per in-memory sorted run (default {SORT_CHUNK_ROWS})",
+    )
+    parser.add_argument(
+        "--tmp-dir", default=None, help="--stream: directory for sorted runs"
+    )
 
     args = parser.parse_args()
 
+    if args.stream:
+        return stream_merge(args)
+
     print("Loading verified backup...")
     verified_items = load_verified_backup(args.verified_backup)
     print(f"  Loaded {len(verified_items)} verified items")
@@ -0,0 +1,311 @@
+"""
+Indexed merge helpers shared by the Penny List enrichment scripts.
+
+The scripts merge a few CSV/JSON sources keyed by SKU. Looking a SKU up by
+rescanning the output (and re-running the normalization regex per row) makes a
+merge O(sources x output); these helpers build each index once instead:
+
+- normalize_sku(): digits only, memoized (the same SKUs recur across sources)
+- SkuIndex: normalized SKU -> first row position, for O(1) "already in output?"
+  checks
+- FillRule / fill_blanks(): fill-blanks-only enrichment of a record from keyed
+  sources in one pass, counting what each rule filled
+
+For inputs too big to index in memory (large historical exports on a CI runner)
+the streaming helpers keep peak memory bounded instead:
+
+- external_sort(): stable sort that spills sorted runs to temporary files and
+  k-way merges them back, holding at most chunk_rows records at a time
+- merge_sorted_groups(): sorted-merge join of several SKU-sorted streams, one
+  SKU group at a time
+- iter_json_object(): (key, value) pairs of a top-level JSON object without
+  loading the whole file
+
+Usage:
+    index = SkuIndex("Home Depot SKU (6 or 10 digits)", output_rows)
+    rules = (FillRule("Image URL", ((enrichment, "image_url"),)),)
+    if sku not in index:
+        fill_blanks(record, sku, rules, counters)
+        index.add(record)
+
+    rows = external_sort((sku, seq, row) for ...)  # tuples sort by SKU, then order
+    for sku, (rows, backups) in merge_sorted_groups((rows, backup), itemgetter(0)):
+        ...
+"""
+
+import heapq
+import json
+import os
+import pickle
+import re
+import tempfile
+from functools import lru_cache
+from itertools import groupby, islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+@lru_cache(maxsize=1 << 20)
+def _digits(value: str) -> str:
+    return _NON_DIGITS.sub("", value)
+
+
+def normalize_sku(sku: Any) -> str:
+    """Normalize SKU to digits only."""
+    if not sku:
+        return ""
+    return _digits(str(sku))
+
+
+class SkuIndex:
+    """Normalized SKU -> position of the first row carrying it, built once."""
+
+    def __init__(self, sku_field: str, rows: Iterable[Mapping[str, Any]] = ()):
+        self.sku_field = sku_field
+        self.positions: Dict[str, int] = {}
+        self.size = 0
+        for row in rows:
+            self.add(row)
+
+    def add(self, row: Mapping[str, Any], sku: Optional[str] = None) -> str:
+        """Index the next row (sku: its already normalized SKU, if known)."""
+        if sku is None:
+            sku = normalize_sku(row.get(self.sku_field, ""))
+        self.positions.setdefault(sku, self.size)
+        self.size += 1
+        return sku
+
+    def __contains__(self, sku: str) -> bool:
+        return sku in self.positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def get(self, sku: str) -> Optional[int]:
+        return self.positions.get(sku)
+
+
+class FillRule(NamedTuple):
+    """Fill `field` when blank from the first source whose entry has a value.
+
+    sources: (lookup, key) pairs; lookup maps normalized SKU -> dict.
+    """
+
+    field: str
+    sources: Tuple[Tuple[Mapping[str, Mapping[str, Any]], str], ...]
+    counter: Optional[str] = None
+
+
+def fill_blanks(
+    record: Dict[str, Any],
+    sku: str,
+    rules: Iterable[FillRule],
+    counters: Optional[Dict[str, int]] = None,
+) -> int:
+    """
+    Apply fill-blanks-only rules to record in place; returns how many fields it filled.
+
+    Every rule's field is written back stripped, filled or not, so a record that
+    went through a rule always has a clean value for it.
+    """
+    filled = 0
+    for rule in rules:
+        value = (record.get(rule.field) or "").strip()
+        if not value:
+            for lookup, key in rule.sources:
+                entry = lookup.get(sku)
+                if entry is not None and entry.get(key):
+                    value = entry[key]
+                    filled += 1
+                    if counters is not None and rule.counter:
+                        counters[rule.counter] = counters.get(rule.counter, 0) + 1
+                    break
+        record[rule.field] = value
+    return filled
+
+
+# Streaming merge ------------------------------------------------------------
+
+SORT_CHUNK_ROWS = 100_000  # records held in memory per sorted run
+SORT_FAN_IN = 64  # runs merged at once (bounds open files and read buffers)
+_SPILL_BATCH = 1_000  # records per pickle frame in a run file
+_JSON_READ_SIZE = 1 << 16
+
+
+def _write_run(directory: str, records: Iterable[Any]) -> str:
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".run")
+    records = iter(records)
+    with os.fdopen(fd, "wb") as f:
+        while batch := list(islice(records, _SPILL_BATCH)):
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator[Any]:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def external_sort(
+    records: Iterable[Any],
+    key: Optional[Callable[[Any], Any]] = None,
+    chunk_rows: int = SORT_CHUNK_ROWS,
+    tmp_dir: Optional[str] = None,
+) -> Iterator[Any]:
+    """
+    Yield records sorted by key, holding at most chunk_rows of them in memory.
+
+    The sort is stable. Records must be picklable; sorted runs spill to a temporary
+    directory (under tmp_dir if given) that is removed once the generator finishes
+    or is closed. Inputs that fit in one chunk never touch disk.
+    """
+    chunk_rows = max(1, chunk_rows)
+    with tempfile.TemporaryDirectory(prefix="penny-sort-", dir=tmp_dir) as directory:
+        runs: List[str] = []
+        chunk: List[Any] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                chunk.sort(key=key)
+                runs.append(_write_run(directory, chunk))
+                chunk = []
+        chunk.sort(key=key)
+        if not runs:
+            yield from chunk
+            return
+        if chunk:
+            runs.append(_write_run(directory, chunk))
+            chunk = []
+
+        # Merge in passes of SORT_FAN_IN runs; runs stay in input order (stable)
+        while len(runs) > SORT_FAN_IN:
+            merged = []
+            for start in range(0, len(runs), SORT_FAN_IN):
+                group = runs[start : start + SORT_FAN_IN]
+                merged.append(
+                    _write_run(directory, heapq.merge(*map(_read_run, group), key=key))
+                )
+                for path in group:
+                    os.remove(path)
+            runs = merged
+        yield from heapq.merge(*map(_read_run, runs), key=key)
+
+
+def merge_sorted_groups(
+    streams: Sequence[Iterable[Any]], key: Callable[[Any], Any]
+) -> Iterator[Tuple[Any, List[List[Any]]]]:
+    """
+    Sorted-merge join: yield (key, [records from each stream]) per key, ascending.
+
+    Every stream must already be sorted by key. Only one key group per stream is
+    in memory at a time; a stream with no records for a key contributes [].
+    """
+    iters = [groupby(stream, key) for stream in streams]
+    heads = [next(it, None) for it in iters]
+    while True:
+        present = [head[0] for head in heads if head is not None]
+        if not present:
+            return
+        current = min(present)
+        groups: List[List[Any]] = []
+        for i, head in enumerate(heads):
+            if head is not None and head[0] == current:
+                groups.append(list(head[1]))
+                heads[i] = next(iters[i], None)
+            else:
+                groups.append([])
+        yield current, groups
+
+
+def iter_json_object(
+    path: str, read_size: int = _JSON_READ_SIZE
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (key, value) pairs of the top-level JSON object in path, in file order.
+
+    Memory is bounded by the largest single value rather than the file. Duplicate
+    keys are all yielded (json.load would keep the last one).
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def more() -> bool:
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            data = f.read(read_size)
+            if not data:
+                eof = True
+                return False
+            buf = buf[pos:] + data
+            pos = 0
+            return True
+
+        def skip_ws() -> None:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\n\r":
+                    pos += 1
+                if pos < len(buf) or not more():
+                    return
+
+        def expect(chars: str) -> str:
+            skip_ws()
+            if pos >= len(buf) or buf[pos] not in chars:
+                found = buf[pos : pos + 20] or "end of file"
+                raise ValueError(
+                    f"{path}: expected {chars!r} in JSON object, got {found!r}"
+                )
+            return buf[pos]
+
+        def decode() -> Any:
+            nonlocal pos
+            skip_ws()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if more():
+                        continue
+                    raise
+                # A number (or literal) ending at the buffer edge may continue
+                if end == len(buf) and more():
+                    continue
+                pos = end
+                return value
+
+        expect("{")
+        pos += 1
+        if expect('}"') == "}":
+            return
+        while True:
+            key = decode()
+            expect(":")
+            pos += 1
+            value = decode()
+            yield key, value
+            if expect(",}") == "}":
+                return
+            pos += 1
+            expect('"')
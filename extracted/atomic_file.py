@@ -0,0 +1,88 @@
+"""
+Atomic file writes: temp file in the target's directory + os.replace.
+
+Readers (collectors, the next run, a static host) never see a torn file. The temp
+file gets a unique name from tempfile.mkstemp, so two processes writing the same
+path never share or rename each other's temp file: the last os.replace wins.
+The result has the target's previous permissions, or the umask's for a new file.
+
+file_lock() serializes read-modify-write cycles on a shared file (queue workers
+on one box saving the same zip history), where last-rename-wins would drop the
+other writer's update.
+
+Usage:
+    atomic_write(".local/report.json", text)             # str or bytes
+    atomic_write(path, data, durable=True)               # fsync before the rename
+    with atomic_open(path, "wb") as f:                   # streamed writers
+        f.write(header)
+    with file_lock(path):                                # load, merge, save
+        ...
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; writes are still atomic
+    fcntl = None
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path: str) -> int:
+    try:
+        return os.stat(path).st_mode & 0o777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "w", durable: bool = False) -> Iterator[IO]:
+    """Open a temp file next to `path`; it replaces `path` when the block exits cleanly."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        encoding = None if "b" in mode else "utf-8"
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path: str, content: Union[str, bytes], durable: bool = False) -> None:
+    """Replace `path` with `content` in one rename."""
+    with atomic_open(path, "wb" if isinstance(content, bytes) else "w", durable) as f:
+        f.write(content)
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock on "<path>.lock" (a no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,284 @@
+"""
+Sharded, pre-compressed data artifacts for the penny list and the store directory.
+
+data/penny-list.json, data/stores/store_directory.master.json and
+data/home-depot-stores.json ship as single JSON files (the store files are ~1 MB
+each), so a client that needs one state still downloads every store. This stage
+splits each dataset into compact shards and writes pre-compressed variants:
+
+    <out>/<dataset>/all.json           every record, compact
+    <out>/<dataset>/state/<ST>.json    records for one state
+    <out>/penny-list/sku/<key>.json    penny-list items by SKU prefix (sku_shard_key)
+    <out>/index.json                   every artifact: records, bytes, sha256 and the
+                                       .gz / .br sizes
+
+Each artifact gets a .gz (always) and a .br (when the optional `brotli` package
+is installed; without it, .br files left by an earlier build are removed) next
+to it. Output is deterministic: records are sorted, keys are
+sorted, gzip headers carry no mtime, and files whose bytes did not change are
+not rewritten. Shards that no longer exist are removed.
+
+Penny-list items appear in the state shard of every state in their "locations";
+store records are sharded by their "state".
+
+Usage:
+    python extracted/data_artifacts.py --out-dir .local/artifacts
+    python extracted/data_artifacts.py --penny-list .local/penny-list/penny-list.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from atomic_file import atomic_write
+from penny_list_build import canonical_json
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without it
+    brotli = None
+
+DEFAULT_OUT_DIR = os.path.join(".local", "artifacts")
+PENNY_LIST_PATH = os.path.join("data", "penny-list.json")
+STORE_DIRECTORY_PATHS = {
+    "store-directory": os.path.join("data", "stores", "store_directory.master.json"),
+    "home-depot-stores": os.path.join("data", "home-depot-stores.json"),
+}
+INDEX_FILE = "index.json"
+NO_STATE = "_unknown"
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def compact_json(value: Any) -> bytes:
+    return canonical_json(value).encode("utf-8")
+
+
+def sku_shard_key(sku: str) -> str:
+    """
+    Shard key of a SKU: "<length>-<prefix>".
+
+    10-digit SKUs (100xxxxxxx / 101xxxxxxx) split on their first 5 digits, other
+    SKUs (6 digits) on their first 2, so shards stay a few thousand items at most.
+    """
+    sku = str(sku)
+    prefix = sku[:5] if len(sku) == 10 else sku[:2]
+    return f"{len(sku)}-{prefix}"
+
+
+def _state_key(value: Any) -> str:
+    state = str(value or "").strip().upper()
+    return state if state.isalpha() and len(state) == 2 else NO_STATE
+
+
+def penny_item_states(item: Dict[str, Any]) -> List[str]:
+    locations = item.get("locations")
+    if not isinstance(locations, dict):
+        return []
+    return sorted({_state_key(state) for state, n in locations.items() if n})
+
+
+def store_states(store: Dict[str, Any]) -> List[str]:
+    return [_state_key(store.get("state"))]
+
+
+def shard(
+    records: Iterable[Dict[str, Any]],
+    keys: Callable[[Dict[str, Any]], Iterable[str]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Group records under each of their keys (a record may land in several)."""
+    shards: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        for key in keys(record):
+            shards.setdefault(key, []).append(record)
+    return shards
+
+
+class ArtifactWriter:
+    """Writes artifacts (+ .gz / .br) under out_dir and collects index entries."""
+
+    def __init__(self, out_dir: str = DEFAULT_OUT_DIR):
+        self.out_dir = out_dir
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.written = 0  # files whose bytes changed
+
+    def _write_bytes(self, rel_path: str, data: bytes) -> None:
+        path = os.path.join(self.out_dir, rel_path)
+        try:
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return
+        except OSError:
+            pass
+        atomic_write(path, data)
+        self.written += 1
+
+    def write(self, rel_path: str, records: List[Any], **meta: Any) -> Dict[str, Any]:
+        data = compact_json(records)
+        entry = {
+            "path": rel_path,
+            "records": len(records),
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            **meta,
+        }
+        self._write_bytes(rel_path, data)
+        gz = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        self._write_bytes(rel_path + ".gz", gz)
+        entry["gzip_bytes"] = len(gz)
+        if brotli is not None:
+            br = brotli.compress(data, quality=BROTLI_QUALITY)
+            self._write_bytes(rel_path + ".br", br)
+            entry["brotli_bytes"] = len(br)
+        else:
+            # A .br from a build that had brotli would go stale next to the new data.
+            try:
+                os.remove(os.path.join(self.out_dir, rel_path + ".br"))
+            except FileNotFoundError:
+                pass
+        self.entries[rel_path] = entry
+        return entry
+
+    def write_dataset(
+        self,
+        name: str,
+        records: List[Dict[str, Any]],
+        states: Callable[[Dict[str, Any]], Iterable[str]],
+        sort_key: Callable[[Dict[str, Any]], Any],
+    ) -> None:
+        records = sorted(records, key=sort_key)
+        self.write(f"{name}/all.json", records, dataset=name, shard="all")
+        for state, group in sorted(shard(records, states).items()):
+            self.write(f"{name}/state/{state}.json", group, dataset=name, state=state)
+
+    def prune(self, previous: Dict[str, Any]) -> int:
+        """Remove artifacts listed in the previous index but not written now."""
+        removed = 0
+        for rel_path in previous:
+            if rel_path in self.entries:
+                continue
+            for suffix in ("", ".gz", ".br"):
+                try:
+                    os.remove(os.path.join(self.out_dir, rel_path + suffix))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def index(self) -> Dict[str, Any]:
+        entries = [self.entries[path] for path in sorted(self.entries)]
+        return {
+            "sku_shard_rule": "<len>-<prefix>: first 5 digits of 10-digit SKUs, "
+            "first 2 of others",
+            "compression": ["gzip"] + (["br"] if brotli is not None else []),
+            "totals": {
+                "files": len(entries),
+                "bytes": sum(e["bytes"] for e in entries),
+                "gzip_bytes": sum(e["gzip_bytes"] for e in entries),
+            },
+            "artifacts": entries,
+        }
+
+
+def load_json_array(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a JSON array")
+    return [record for record in data if isinstance(record, dict)]
+
+
+def _load_index(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return {entry["path"]: entry for entry in data["artifacts"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def build_artifacts(
+    out_dir: str = DEFAULT_OUT_DIR,
+    penny_list_path: Optional[str] = PENNY_LIST_PATH,
+    store_paths: Optional[Dict[str, str]] = None,
+) -> Tuple[Dict[str, Any], int, int]:
+    """Write every dataset's artifacts and index.json; returns (index, written, removed)."""
+    index_path = os.path.join(out_dir, INDEX_FILE)
+    previous = _load_index(index_path)
+    writer = ArtifactWriter(out_dir)
+
+    if penny_list_path:
+        items = [i for i in load_json_array(penny_list_path) if i.get("sku")]
+        writer.write_dataset(
+            "penny-list", items, penny_item_states, lambda i: str(i["sku"])
+        )
+        by_prefix = shard(items, lambda i: [sku_shard_key(i["sku"])])
+        for key, group in sorted(by_prefix.items()):
+            writer.write(
+                f"penny-list/sku/{key}.json",
+                group,
+                dataset="penny-list",
+                sku_prefix=key,
+            )
+
+    for name, path in (
+        STORE_DIRECTORY_PATHS if store_paths is None else store_paths
+    ).items():
+        stores = load_json_array(path)
+        writer.write_dataset(
+            name,
+            stores,
+            store_states,
+            lambda s: str(s.get("store_number") or s.get("number") or ""),
+        )
+
+    removed = writer.prune(previous)
+    index = writer.index()
+    os.makedirs(out_dir, exist_ok=True)
+    writer._write_bytes(INDEX_FILE, json.dumps(index, indent=2).encode("utf-8") + b"\n")
+    return index, writer.written, removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Shard and pre-compress penny-list / store directory JSON"
+    )
+    parser.add_argument(
+        "--out-dir", default=DEFAULT_OUT_DIR, help=f"default {DEFAULT_OUT_DIR}"
+    )
+    parser.add_argument(
+        "--penny-list",
+        default=PENNY_LIST_PATH,
+        help=f"penny-list JSON array (default {PENNY_LIST_PATH}; '' to skip)",
+    )
+    parser.add_argument(
+        "--no-stores", action="store_true", help="skip the store directory files"
+    )
+    args = parser.parse_args()
+
+    try:
+        index, written, removed = build_artifacts(
+            args.out_dir, args.penny_list or None, {} if args.no_stores else None
+        )
+    except (OSError, ValueError) as exc:
+        print(f"❌ {exc}")
+        sys.exit(1)
+
+    totals = index["totals"]
+    print(
+        f"✅ {totals['files']} artifacts in {args.out_dir} "
+        f"({totals['bytes']} bytes, {totals['gzip_bytes']} gzipped); "
+        f"{written} files written, {removed} stale removed"
+    )
+    if brotli is None:
+        print("   ⚠️  brotli not installed; .br variants skipped (pip install brotli)")
+    for entry in index["artifacts"]:
+        if entry.get("shard") == "all":
+            print(
+                f"   {entry['path']}: {entry['records']} records, "
+                f"{entry['bytes']} -> {entry['gzip_bytes']} bytes gzipped"
+            )
@@ -0,0 +1,191 @@
+"""
+Shared date parsing: format inferred once per column, results memoized per string.
+
+Purchase histories and scrape frames repeat the same few thousand date strings
+tens of thousands of times, and every call site used to re-run strptime (or a
+fresh pd.to_datetime inference) per row. A DateParser is meant to live for one
+column/file:
+
+- it tries the format that matched last time first (the column's inferred
+  format), then the rest of its list in order
+- each distinct string is parsed once (LRU cache per parser)
+- parse_many() / parse_date_series() parse the unique values of a batch and map
+  them back, so a column costs one parse per distinct string
+
+Formats are strptime patterns plus ISO ("fromisoformat"). Keep a parser's formats
+mutually exclusive (the defaults are): trying the inferred format first must not
+change which format wins for any string.
+
+Usage:
+    parser = DateParser()                  # ISO first, then US/slashed formats
+    parser.parse(" 01/31/2026 ")           # datetime(2026, 1, 31)
+    parser.parse_many(column)              # [datetime | None, ...]
+    df["penny_date"] = parse_date_series(df["dropped_at"])
+
+Benchmark against per-row strptime / pd.to_datetime:
+    python extracted/date_parse.py --bench 200000
+"""
+
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Sequence
+
+try:
+    import pandas as pd
+    from dateutil.tz import tzlocal  # a pandas dependency
+except ImportError:  # pandas is only needed for parse_date_series
+    pd = None
+
+ISO = "iso"  # datetime.fromisoformat (offsets, "T" times, "Z" on 3.11+)
+DATE_FORMATS = (ISO, "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d", "%m/%d/%Y %H:%M:%S")
+CACHE_SIZE = 1 << 16
+
+
+def _parse_with(text: str, fmt: str) -> datetime:
+    if fmt == ISO:
+        return datetime.fromisoformat(text)
+    return datetime.strptime(text, fmt)
+
+
+class DateParser:
+    """Memoized multi-format parser for one column/file; parse() returns None when
+    no format matches (blank and non-string values included)."""
+
+    def __init__(
+        self,
+        formats: Sequence[str] = DATE_FORMATS,
+        strip: bool = True,
+        cache_size: int = CACHE_SIZE,
+    ):
+        if not formats:
+            raise ValueError("DateParser needs at least one format")
+        self.formats = tuple(formats)
+        self.strip = strip
+        self.format: Optional[str] = None  # inferred: the format that matched last
+        self._cached = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _parse(self, value: str) -> Optional[datetime]:
+        text = value.strip() if self.strip else value
+        if not text:
+            return None
+        inferred = self.format
+        if inferred is not None:
+            try:
+                return _parse_with(text, inferred)
+            except ValueError:
+                pass
+        for fmt in self.formats:
+            if fmt == inferred:
+                continue
+            try:
+                parsed = _parse_with(text, fmt)
+            except ValueError:
+                continue
+            self.format = fmt
+            return parsed
+        return None
+
+    def parse(self, value: Any) -> Optional[datetime]:
+        if not isinstance(value, str):
+            return None
+        return self._cached(value)
+
+    def parse_many(self, values: Iterable[Any]) -> List[Optional[datetime]]:
+        """Parse a batch, one parse per distinct value."""
+        values = list(values)
+        parsed = {}
+        for value in values:
+            if value not in parsed:
+                parsed[value] = self.parse(value)
+        return [parsed[value] for value in values]
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+
+def _naive_local(value: datetime) -> datetime:
+    # Aware values (ISO offsets / "Z") become local wall time, so arithmetic with
+    # datetime.now() keeps working on the column.
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def parse_date_series(values, parser: Optional[DateParser] = None):
+    """
+    Parse a pandas column to naive local datetime64 (NaT where nothing parses).
+
+    Strings go through parser (a fresh DateParser() by default), once per distinct
+    value; strings none of its formats match (e.g. "Jan 31, 2026") fall back to
+    pd.to_datetime. Columns that are already datetimes or numbers keep
+    pd.to_datetime's handling. Aware values, string or datetime64, are converted
+    to local wall time like datetime.now().
+    """
+    if pd is None:
+        raise ImportError("parse_date_series requires pandas")
+    if not (
+        pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
+    ):
+        parsed = pd.to_datetime(values, errors="coerce")
+        if getattr(parsed.dt, "tz", None) is not None:
+            parsed = parsed.dt.tz_convert(tzlocal()).dt.tz_localize(None)
+        return parsed
+
+    parser = parser or DateParser()
+    lookup = {}
+    for value in values.dropna().unique():
+        parsed = parser.parse(value) if isinstance(value, str) else None
+        if parsed is None:
+            stamp = pd.to_datetime(value, errors="coerce")
+            parsed = None if pd.isna(stamp) else stamp.to_pydatetime()
+        lookup[value] = None if parsed is None else _naive_local(parsed)
+    return pd.to_datetime(values.map(lookup), errors="coerce")
+
+
+def _bench(n: int, distinct: int = 2_000) -> None:
+    import random
+
+    rng = random.Random(0)
+    pool = []
+    for _ in range(distinct):
+        d = datetime(2024, 1, 1).toordinal() + rng.randrange(730)
+        day = datetime.fromordinal(d)
+        pool.append(rng.choice([day.strftime("%Y-%m-%d"), day.strftime("%m/%d/%Y")]))
+    values = [rng.choice(pool) for _ in range(n)]
+
+    def per_row(value: str) -> Optional[datetime]:
+        for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d"):
+            try:
+                return datetime.strptime(value.strip(), fmt)
+            except ValueError:
+                continue
+        return None
+
+    t0 = time.perf_counter()
+    expected = [per_row(v) for v in values]
+    t1 = time.perf_counter()
+    got = DateParser(("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d")).parse_many(values)
+    t2 = time.perf_counter()
+    assert got == expected
+    print(f"{n} strings ({distinct} distinct)")
+    print(f"  per-row strptime:   {t1 - t0:.3f}s")
+    print(f"  DateParser batch:   {t2 - t1:.3f}s")
+
+    if pd is not None:
+        column = pd.Series(values, dtype=object)
+        t0 = time.perf_counter()
+        pd.to_datetime(column, errors="coerce", format="mixed")
+        t1 = time.perf_counter()
+        parse_date_series(column)
+        t2 = time.perf_counter()
+        print(f"  pd.to_datetime:     {t1 - t0:.3f}s (format='mixed')")
+        print(f"  parse_date_series:  {t2 - t1:.3f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bench":
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 200_000)
+    else:
+        print(__doc__)
@@ -0,0 +1,92 @@
+"""
+Tiny local HTTP endpoint for long-running jobs (the staging warmer daemon).
+
+    GET /healthz   JSON from health_fn(); 200 when its "status" is "ok", else 503
+    GET /metrics   Prometheus text from metrics_fn()
+
+Binds to 127.0.0.1 by default; it is meant for a local scraper / uptime check,
+not for exposure to the network. Runs on a daemon thread.
+
+Usage:
+    server = HealthServer(8787, health_fn=lambda: {"status": "ok"}).start()
+    ...
+    server.stop()
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+
+class HealthServer:
+    """Serve /healthz and /metrics from callbacks."""
+
+    def __init__(
+        self,
+        port: int,
+        health_fn: Callable[[], Dict[str, Any]],
+        metrics_fn: Optional[Callable[[], str]] = None,
+        host: str = "127.0.0.1",
+    ):
+        self.host = host
+        self.port = port
+        self.health_fn = health_fn
+        self.metrics_fn = metrics_fn
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "HealthServer":
+        handler = self._handler_class()
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        # Port 0 picks a free port; report the real one.
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="health-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                try:
+                    if path in ("/healthz", "/health", "/"):
+                        health = server.health_fn()
+                        status = 200 if health.get("status") == "ok" else 503
+                        body = json.dumps(health, indent=2, default=str) + "\n"
+                        self._send(status, body, "application/json")
+                    elif path == "/metrics" and server.metrics_fn is not None:
+                        self._send(
+                            200,
+                            server.metrics_fn(),
+                            "text/plain; version=0.0.4; charset=utf-8",
+                        )
+                    else:
+                        self._send(404, "not found\n", "text/plain")
+                except Exception as e:
+                    self._send(500, f"error: {type(e).__name__}\n", "text/plain")
+
+            def _send(self, status: int, body: str, content_type: str) -> None:
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # keep the warmer's stdout log readable
+
+        return Handler
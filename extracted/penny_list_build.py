@@ -0,0 +1,310 @@
+"""
+Incremental penny-list.json builder with per-SKU content hashes.
+
+data/penny-list.json used to be regenerated as one pretty-printed file, so any
+change rewrote (and re-shipped) every entry. This builder keeps, per SKU, a hash
+of the input record and the serialized entry it produced. A rebuild only
+normalizes and serializes entries whose input hash changed, and it writes a
+change manifest plus a delta that consumers can apply instead of refetching.
+
+Input: a JSON array of penny-list items (the snapshot fixture, csv-to-penny-json
+output, ...), each with a "sku". A later record for the same SKU wins.
+
+Output directory (default .local/penny-list/):
+    penny-list.json           compact, entries sorted by SKU, keys sorted; left
+                              untouched when its content did not change
+    penny-list.pretty.json    indent=2 variant, only with --pretty
+    penny-list.delta.json     {"base_sha256", "sha256", "upserts": [...], "removed": [...]}
+    penny-list.manifest.json  counts, sha256 of penny-list.json and the
+                              added / updated / removed SKU lists of this build
+    .build-state.json         {"version", "entries": {sku: [input_hash, entry_json]}}
+
+Usage:
+    builder = PennyListBuilder(".local/penny-list")
+    result = builder.build(items)          # BuildResult(added, updated, removed, ...)
+    builder.write(result, pretty=False)
+
+    python extracted/penny_list_build.py data/penny-list.json --out-dir .local/penny-list
+    python extracted/penny_list_build.py data/penny-list.json --search  # + search index
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from atomic_file import atomic_write
+
+DEFAULT_OUT_DIR = os.path.join(".local", "penny-list")
+LIST_FILE = "penny-list.json"
+PRETTY_FILE = "penny-list.pretty.json"
+DELTA_FILE = "penny-list.delta.json"
+MANIFEST_FILE = "penny-list.manifest.json"
+STATE_FILE = ".build-state.json"
+# Bump when build_entry() changes, so cached entries are rebuilt.
+BUILD_VERSION = 1
+
+
+def canonical_json(value: Any) -> str:
+    """Compact, key-sorted JSON: the same value always serializes the same way."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def input_hash(record: Dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_json(record).encode("utf-8")).hexdigest()[:16]
+
+
+def build_entry(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one input record into its penny-list entry."""
+    entry = dict(record)
+    sku = str(entry["sku"]).strip()
+    entry["sku"] = sku
+    if not entry.get("id"):
+        entry["id"] = sku
+    locations = entry.get("locations")
+    if isinstance(locations, dict):
+        # Drop empty/zero counts; canonical_json sorts the states
+        entry["locations"] = {state: n for state, n in locations.items() if state and n}
+    return entry
+
+
+def record_sku(record: Any) -> Optional[str]:
+    if not isinstance(record, dict):
+        return None
+    sku = record.get("sku")
+    if sku is None or isinstance(sku, (dict, list)):
+        return None
+    return str(sku).strip() or None
+
+
+class BuildResult(NamedTuple):
+    added: List[str]
+    updated: List[str]
+    removed: List[str]
+    unchanged: int
+    skipped: int  # records without a usable SKU
+    duplicates: int  # records shadowed by a later record for the same SKU
+    rebuilt: int  # entries normalized/serialized this build (the rest were cached)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+
+def _sha256_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class PennyListBuilder:
+    """Builds the penny list into out_dir, reusing the entries of the last build."""
+
+    def __init__(self, out_dir: str = DEFAULT_OUT_DIR):
+        self.out_dir = out_dir
+        # sku -> (input_hash, entry_json) of the last build
+        self.previous: Dict[str, Tuple[str, str]] = self._load_state()
+        self.entries: Dict[str, Tuple[str, str]] = dict(self.previous)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.out_dir, name)
+
+    def _load_state(self) -> Dict[str, Tuple[str, str]]:
+        """Read the last build's state; a missing, unreadable or stale one is empty."""
+        try:
+            with open(self.path(STATE_FILE), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != BUILD_VERSION:
+            return {}
+        entries = data.get("entries")
+        if not isinstance(entries, dict):
+            return {}
+        return {
+            sku: (value[0], value[1])
+            for sku, value in entries.items()
+            if isinstance(value, list) and len(value) == 2
+        }
+
+    def build(self, records: Iterable[Any]) -> BuildResult:
+        """Diff records against the last build; only changed inputs are rebuilt."""
+        latest: Dict[str, Dict[str, Any]] = {}
+        skipped = duplicates = 0
+        for record in records:
+            sku = record_sku(record)
+            if sku is None:
+                skipped += 1
+                continue
+            if sku in latest:
+                duplicates += 1
+            latest[sku] = record
+
+        entries: Dict[str, Tuple[str, str]] = {}
+        added: List[str] = []
+        updated: List[str] = []
+        rebuilt = unchanged = 0
+        for sku, record in latest.items():
+            digest = input_hash(record)
+            old = self.previous.get(sku)
+            if old is not None and old[0] == digest:
+                entries[sku] = old
+                unchanged += 1
+                continue
+            text = canonical_json(build_entry(record))
+            rebuilt += 1
+            entries[sku] = (digest, text)
+            if old is None:
+                added.append(sku)
+            elif old[1] != text:
+                updated.append(sku)
+            else:
+                # Input changed but the entry did not (e.g. only an empty state)
+                unchanged += 1
+
+        removed = sorted(set(self.previous) - set(entries))
+        self.entries = entries
+        return BuildResult(
+            added=sorted(added),
+            updated=sorted(updated),
+            removed=removed,
+            unchanged=unchanged,
+            skipped=skipped,
+            duplicates=duplicates,
+            rebuilt=rebuilt,
+        )
+
+    def list_json(self) -> str:
+        """The compact list: cached entry texts joined in SKU order."""
+        return (
+            "[" + ",".join(self.entries[sku][1] for sku in sorted(self.entries)) + "]"
+        )
+
+    def write(self, result: BuildResult, pretty: bool = False) -> Dict[str, Any]:
+        """Write the list (if it changed), delta, manifest and state; returns the manifest."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        list_path = self.path(LIST_FILE)
+        base_sha = _sha256_file(list_path)
+        text = self.list_json()
+        sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if sha != base_sha:
+            atomic_write(list_path, text)
+
+        if pretty:
+            items = [json.loads(self.entries[sku][1]) for sku in sorted(self.entries)]
+            pretty_text = json.dumps(
+                items, indent=2, sort_keys=True, ensure_ascii=False
+            )
+            atomic_write(self.path(PRETTY_FILE), pretty_text + "\n")
+
+        upserts = [
+            json.loads(self.entries[sku][1])
+            for sku in sorted(result.added + result.updated)
+        ]
+        atomic_write(
+            self.path(DELTA_FILE),
+            canonical_json(
+                {
+                    "base_sha256": base_sha,
+                    "sha256": sha,
+                    "upserts": upserts,
+                    "removed": result.removed,
+                }
+            ),
+        )
+
+        manifest = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "build_version": BUILD_VERSION,
+            "count": len(self.entries),
+            "bytes": len(text.encode("utf-8")),
+            "sha256": sha,
+            "base_sha256": base_sha,
+            "added": result.added,
+            "updated": result.updated,
+            "removed": result.removed,
+            "unchanged": result.unchanged,
+            "skipped": result.skipped,
+            "duplicates": result.duplicates,
+        }
+        atomic_write(
+            self.path(MANIFEST_FILE),
+            json.dumps(manifest, indent=2, sort_keys=True) + "\n",
+        )
+
+        state = {
+            "version": BUILD_VERSION,
+            "entries": {
+                sku: list(value) for sku, value in sorted(self.entries.items())
+            },
+        }
+        atomic_write(self.path(STATE_FILE), canonical_json(state))
+        self.previous = dict(self.entries)
+        return manifest
+
+
+def load_items(path: str) -> List[Any]:
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list):
+        raise ValueError(f"{path}: expected a JSON array of penny-list items")
+    return items
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incrementally build penny-list.json with a change manifest"
+    )
+    parser.add_argument("input", help="JSON array of penny-list items")
+    parser.add_argument(
+        "--out-dir", default=DEFAULT_OUT_DIR, help=f"default {DEFAULT_OUT_DIR}"
+    )
+    parser.add_argument(
+        "--pretty", action="store_true", help=f"also write {PRETTY_FILE}"
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="also update the search index (penny_search.SEARCH_FILE)",
+    )
+    args = parser.parse_args()
+
+    try:
+        items = load_items(args.input)
+    except (OSError, ValueError) as exc:
+        print(f"❌ {exc}")
+        sys.exit(1)
+
+    builder = PennyListBuilder(args.out_dir)
+    result = builder.build(items)
+    manifest = builder.write(result, pretty=args.pretty)
+    print(
+        f"✅ {manifest['count']} items -> {builder.path(LIST_FILE)} "
+        f"({manifest['bytes']} bytes, sha256 {manifest['sha256'][:12]})"
+    )
+    print(
+        f"   added {len(result.added)}, updated {len(result.updated)}, "
+        f"removed {len(result.removed)}, unchanged {result.unchanged} "
+        f"(rebuilt {result.rebuilt})"
+    )
+    if result.skipped or result.duplicates:
+        print(
+            f"   ⚠️  skipped {result.skipped} records without a SKU, "
+            f"{result.duplicates} duplicate SKUs (last one wins)"
+        )
+    if args.search:
+        from penny_search import SEARCH_FILE, SearchIndex
+
+        search_file = builder.path(SEARCH_FILE)
+        index = SearchIndex.load(search_file)
+        added, updated, removed = index.update_entries(builder.entries)
+        size = index.save(search_file)
+        print(
+            f"   search index: {size} bytes; added {added}, updated {updated}, "
+            f"removed {removed}"
+        )
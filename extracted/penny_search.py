@@ -0,0 +1,413 @@
+"""
+Precomputed search index for penny-list.json.
+
+Searching the penny list by name, brand, SKU or internet number used to mean a
+linear scan of every entry. SearchIndex keeps:
+
+- exact maps for "sku" and "internetNumber"
+- an inverted index over name/brand tokens (lowercase alphanumeric runs):
+  token -> doc ids
+- trigram -> token ids over that vocabulary, so a term matches every token that
+  contains it ("ryob" finds "ryobi"); terms under 3 characters match tokens by
+  prefix (binary search over the sorted vocabulary)
+
+A query returns the SKUs whose tokens match every term (or the exact SKU /
+internet number hit when the query is one). The index is saved as compact JSON
+next to the list (penny-list.search.json) and updated incrementally: each doc
+keeps the hash of the entry it was built from, and update() only re-tokenizes
+entries whose hash changed. Doc ids of removed SKUs are reused.
+
+Usage:
+    index = SearchIndex.load(".local/penny-list/penny-list.search.json")
+    index.update(items)                    # (added, updated, removed) SKU counts
+    index.save(".local/penny-list/penny-list.search.json")
+    index.search("ryobi drill")            # ["1001234567", ...]
+
+    python extracted/penny_search.py .local/penny-list/penny-list.json
+    python extracted/penny_search.py .local/penny-list/penny-list.json -q "glue"
+    python extracted/penny_search.py --bench 100000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from atomic_file import atomic_write
+from penny_list_build import input_hash, load_items, record_sku
+
+SEARCH_FILE = "penny-list.search.json"
+INDEX_VERSION = 1
+TEXT_FIELDS = ("name", "brand")
+DEFAULT_LIMIT = 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Any) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower()) if text else []
+
+
+def trigrams(token: str) -> Iterable[str]:
+    return (token[i : i + 3] for i in range(len(token) - 2))
+
+
+def entry_tokens(entry: Dict[str, Any]) -> Set[str]:
+    tokens = set()
+    for field in TEXT_FIELDS:
+        tokens.update(tokenize(entry.get(field)))
+    return tokens
+
+
+def _internet_number(entry: Dict[str, Any]) -> str:
+    value = entry.get("internetNumber")
+    return "" if value is None else str(value).strip()
+
+
+def search_path(list_path: str) -> str:
+    """penny-list.search.json next to list_path."""
+    return os.path.join(os.path.dirname(list_path), SEARCH_FILE)
+
+
+class SearchIndex:
+    """Inverted name/brand index plus exact SKU / internet number maps."""
+
+    def __init__(self):
+        # Per doc id (None for a free slot)
+        self.skus: List[Optional[str]] = []
+        self.hashes: List[Optional[str]] = []
+        self.internet_numbers: List[str] = []
+        self.doc_tokens: List[Tuple[int, ...]] = []
+        self.free: List[int] = []
+        self.by_sku: Dict[str, int] = {}
+        self.by_internet_number: Dict[str, Set[int]] = {}
+        # Vocabulary
+        self.vocab: List[str] = []
+        self.token_ids: Dict[str, int] = {}
+        self.postings: List[Set[int]] = []
+        self.trigram_tokens: Dict[str, Set[int]] = {}
+        self._sorted_vocab: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.by_sku)
+
+    # -- building --------------------------------------------------------------
+
+    def _token_id(self, token: str) -> int:
+        tid = self.token_ids.get(token)
+        if tid is None:
+            tid = self.token_ids[token] = len(self.vocab)
+            self.vocab.append(token)
+            self.postings.append(set())
+            for gram in trigrams(token):
+                self.trigram_tokens.setdefault(gram, set()).add(tid)
+            self._sorted_vocab = None
+        return tid
+
+    def _add(self, sku: str, digest: str, entry: Dict[str, Any]) -> None:
+        tids = tuple(sorted(self._token_id(t) for t in entry_tokens(entry)))
+        number = _internet_number(entry)
+        if self.free:
+            doc = self.free.pop()
+            self.skus[doc] = sku
+            self.hashes[doc] = digest
+            self.internet_numbers[doc] = number
+            self.doc_tokens[doc] = tids
+        else:
+            doc = len(self.skus)
+            self.skus.append(sku)
+            self.hashes.append(digest)
+            self.internet_numbers.append(number)
+            self.doc_tokens.append(tids)
+        self.by_sku[sku] = doc
+        if number:
+            self.by_internet_number.setdefault(number, set()).add(doc)
+        for tid in tids:
+            self.postings[tid].add(doc)
+
+    def _remove(self, sku: str) -> None:
+        doc = self.by_sku.pop(sku)
+        for tid in self.doc_tokens[doc]:
+            self.postings[tid].discard(doc)
+        number = self.internet_numbers[doc]
+        if number:
+            docs = self.by_internet_number[number]
+            docs.discard(doc)
+            if not docs:
+                del self.by_internet_number[number]
+        self.skus[doc] = self.hashes[doc] = None
+        self.internet_numbers[doc] = ""
+        self.doc_tokens[doc] = ()
+        self.free.append(doc)
+
+    def update(self, items: Iterable[Any]) -> Tuple[int, int, int]:
+        """Sync the index to items (a full list; a later SKU wins). Returns
+        (added, updated, removed)."""
+        latest = {}
+        for item in items:
+            sku = record_sku(item)
+            if sku is not None:
+                latest[sku] = item
+        return self.update_entries(
+            {sku: (input_hash(item), item) for sku, item in latest.items()}
+        )
+
+    def update_entries(
+        self, entries: Dict[str, Tuple[str, Any]]
+    ) -> Tuple[int, int, int]:
+        """
+        Sync the index to {sku: (hash, entry)}; entry may be a dict or its JSON
+        text (PennyListBuilder.entries), and is only read for SKUs whose hash
+        changed.
+        """
+        removed = [sku for sku in self.by_sku if sku not in entries]
+        for sku in removed:
+            self._remove(sku)
+        added = updated = 0
+        for sku, (digest, entry) in entries.items():
+            doc = self.by_sku.get(sku)
+            if doc is not None:
+                if self.hashes[doc] == digest:
+                    continue
+                self._remove(sku)
+                updated += 1
+            else:
+                added += 1
+            if isinstance(entry, str):
+                entry = json.loads(entry)
+            self._add(sku, digest, entry)
+        return added, updated, len(removed)
+
+    # -- querying --------------------------------------------------------------
+
+    def _matching_tokens(self, term: str) -> Iterable[int]:
+        if len(term) < 3:
+            if self._sorted_vocab is None:
+                self._sorted_vocab = sorted(
+                    t for t, tid in self.token_ids.items() if self.postings[tid]
+                )
+            vocab = self._sorted_vocab
+            i = bisect_left(vocab, term)
+            while i < len(vocab) and vocab[i].startswith(term):
+                yield self.token_ids[vocab[i]]
+                i += 1
+            return
+        grams = sorted(
+            (self.trigram_tokens.get(g, ()) for g in set(trigrams(term))), key=len
+        )
+        if not grams[0]:
+            return
+        candidates = set(grams[0]).intersection(*grams[1:])
+        if len(term) == 3:
+            yield from candidates
+            return
+        vocab = self.vocab
+        yield from (tid for tid in candidates if term in vocab[tid])
+
+    def _term_docs(self, term: str) -> Set[int]:
+        tids = list(self._matching_tokens(term))
+        if len(tids) == 1:
+            return self.postings[tids[0]]
+        docs: Set[int] = set()
+        for tid in tids:
+            docs.update(self.postings[tid])
+        return docs
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[str]:
+        """SKUs matching query, exact SKU / internet number hits first."""
+        text = str(query).strip()
+        exact: List[int] = []
+        if text in self.by_sku:
+            exact.append(self.by_sku[text])
+        exact.extend(sorted(self.by_internet_number.get(text, ())))
+        if exact:
+            return [self.skus[doc] for doc in exact[:limit]]
+
+        terms = sorted(set(tokenize(text)), key=len, reverse=True)
+        if not terms:
+            return []
+        docs = None
+        for term in terms:  # longest (most selective) first
+            term_docs = self._term_docs(term)
+            docs = set(term_docs) if docs is None else docs & term_docs
+            if not docs:
+                return []
+        if len(docs) > limit:
+            docs = sorted(docs)[:limit]
+        else:
+            docs = sorted(docs)
+        return [self.skus[doc] for doc in docs]
+
+    def lookup_sku(self, sku: Any) -> bool:
+        return str(sku).strip() in self.by_sku
+
+    def lookup_internet_number(self, number: Any) -> List[str]:
+        docs = self.by_internet_number.get(str(number).strip(), ())
+        return [self.skus[doc] for doc in sorted(docs)]
+
+    # -- persistence -----------------------------------------------------------
+
+    def to_json(self) -> Dict[str, Any]:
+        """Serializable form: live tokens only, postings delta-encoded."""
+        vocab = sorted(t for t, tid in self.token_ids.items() if self.postings[tid])
+        postings = []
+        for token in vocab:
+            docs = sorted(self.postings[self.token_ids[token]])
+            postings.append([b - a for a, b in zip([0] + docs, docs, strict=False)])
+        return {
+            "version": INDEX_VERSION,
+            "docs": len(self),
+            "skus": self.skus,
+            "hashes": self.hashes,
+            "internetNumbers": self.internet_numbers,
+            "vocab": vocab,
+            "postings": postings,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "SearchIndex":
+        index = cls()
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.skus = list(data["skus"])
+        index.hashes = list(data["hashes"])
+        index.internet_numbers = list(data["internetNumbers"])
+        doc_tokens: List[List[int]] = [[] for _ in index.skus]
+        for token, deltas in zip(data["vocab"], data["postings"], strict=True):
+            tid = index._token_id(token)
+            docs = index.postings[tid]
+            doc = 0
+            for delta in deltas:
+                doc += delta
+                docs.add(doc)
+                doc_tokens[doc].append(tid)
+        index.doc_tokens = [tuple(tids) for tids in doc_tokens]
+        for doc, sku in enumerate(index.skus):
+            if sku is None:
+                index.free.append(doc)
+                continue
+            index.by_sku[sku] = doc
+            number = index.internet_numbers[doc]
+            if number:
+                index.by_internet_number.setdefault(number, set()).add(doc)
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        """Load a saved index; a missing, unreadable or stale one is empty."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls.from_json(data)
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return cls()
+
+    def save(self, path: str) -> int:
+        """Write the index atomically; returns its size in bytes."""
+        text = json.dumps(self.to_json(), separators=(",", ":"), ensure_ascii=False)
+        atomic_write(path, text)
+        return len(text.encode("utf-8"))
+
+
+def _bench(n: int, queries: int = 2_000) -> None:
+    import random
+
+    rng = random.Random(0)
+    brands = [f"brand{i}" for i in range(300)]
+    words = [
+        "".join(rng.choice("abcdefghiklmnoprstuvw") for _ in range(7))
+        for _ in range(5_000)
+    ]
+    items = [
+        {
+            "sku": str(1_000_000_000 + i),
+            "internetNumber": str(300_000_000 + i),
+            "brand": rng.choice(brands),
+            "name": " ".join(rng.choice(words) for _ in range(rng.randint(3, 6)))
+            + f" {rng.randint(1, 64)} oz",
+        }
+        for i in range(n)
+    ]
+
+    t0 = time.perf_counter()
+    index = SearchIndex()
+    index.update(items)
+    t1 = time.perf_counter()
+    data = json.dumps(index.to_json(), separators=(",", ":"))
+    t2 = time.perf_counter()
+    index = SearchIndex.from_json(json.loads(data))
+    t3 = time.perf_counter()
+    changed = [dict(item, name=item["name"] + " clearance") for item in items[:100]]
+    index.update(changed + items[100:])
+    t4 = time.perf_counter()
+    print(f"{n} items: build {t1 - t0:.2f}s, index {len(data) / 1e6:.1f} MB")
+    print(f"  load {t3 - t2:.2f}s, incremental update (100 changed) {t4 - t3:.2f}s")
+
+    picks = [rng.choice(items) for _ in range(queries)]
+    cases = {
+        "sku": [item["sku"] for item in picks],
+        "internetNumber": [item["internetNumber"] for item in picks],
+        "one word": [item["name"].split()[0] for item in picks],
+        "two words": [" ".join(item["name"].split()[:2]) for item in picks],
+        "brand + partial": [
+            f"{item['brand']} {item['name'].split()[1][:4]}" for item in picks
+        ],
+        "2-char prefix": [item["name"][:2] for item in picks],
+    }
+    scan_query = cases["two words"][0].split()
+    t0 = time.perf_counter()
+    [
+        item["sku"]
+        for item in items
+        if all(w in item["name"].lower() for w in scan_query)
+    ]
+    scan_ms = (time.perf_counter() - t0) * 1000
+    print(f"  linear scan (one query): {scan_ms:.2f} ms")
+    for label, qs in cases.items():
+        times = []
+        for q in qs:
+            t0 = time.perf_counter()
+            hits = index.search(q)
+            times.append(time.perf_counter() - t0)
+            assert hits, q
+        times.sort()
+        print(
+            f"  {label:16s} p50 {times[len(times) // 2] * 1e6:7.1f} us  "
+            f"p99 {times[int(len(times) * 0.99)] * 1e6:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bench":
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(
+        description=f"Build / update {SEARCH_FILE} next to a penny-list JSON array"
+    )
+    parser.add_argument("list", help="penny-list JSON array")
+    parser.add_argument("-q", "--query", help="search the updated index")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    try:
+        items = load_items(args.list)
+    except (OSError, ValueError) as exc:
+        print(f"❌ {exc}")
+        sys.exit(1)
+
+    path = search_path(args.list)
+    index = SearchIndex.load(path)
+    added, updated, removed = index.update(items)
+    size = index.save(path)
+    print(
+        f"✅ {len(index)} docs -> {path} ({size} bytes); "
+        f"added {added}, updated {updated}, removed {removed}"
+    )
+    if args.query:
+        for sku in index.search(args.query, args.limit):
+            print(f"   {sku}")
@@ -0,0 +1,393 @@
+"""
+Direct Postgres ingest of staging rows: binary COPY into a temp table, one merge.
+
+The PostgREST paths (row upserts, the migration 034 bulk RPC) encode every row as
+JSON in Python and decode it again in Postgres. This backend connects to Postgres
+itself (psycopg 3, optional), streams the rows with COPY ... FROM STDIN (FORMAT
+BINARY) into a transaction-scoped temp table and merges them into
+enrichment_staging with one INSERT ... ON CONFLICT, under the same policy as
+ingest_enrichment_staging:
+
+- rows failing the enrichment_staging SKU CHECK are skipped (invalid_sku)
+- the first row per sku wins (duplicate)
+- a row whose internet_number is held by another sku, in the table or earlier in
+  the batch, is skipped (internet_number_conflict) instead of tripping the unique
+  idx_staging_internet_number index and failing the whole batch
+- a NULL retail_price never overwrites a stored one; identical rows are not rewritten
+
+ingest() returns the same {"counts": ..., "outcomes": [...]} shape as the RPC.
+
+The temp table is created and dropped inside each ingest transaction, so the
+connection may go through a transaction-mode pooler; prepared statements are off
+for the same reason.
+
+Usage:
+    with PgCopyIngest.connect(os.environ["WARMER_DATABASE_URL"]) as pg:
+        result = pg.ingest(rows)
+
+Benchmark against a scratch copy of enrichment_staging (local Postgres with
+migration 016 applied, or a Supabase database):
+    python extracted/pg_copy_ingest.py --dsn postgresql://... --rows 20000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List, Optional
+
+try:
+    import psycopg
+    from psycopg import sql
+except ImportError:  # only the COPY backend needs it
+    psycopg = None
+
+STAGING_TABLE = "enrichment_staging"
+BENCH_TABLE = "enrichment_staging_bench"
+LOAD_TABLE = "enrichment_staging_load"
+LOAD_COLUMNS = (
+    "ord",
+    "sku",
+    "internet_number",
+    "barcode_upc",
+    "item_name",
+    "brand",
+    "retail_price",
+    "image_url",
+    "product_link",
+)
+LOAD_TYPES = ("int4", "text", "int8", "text", "text", "text", "numeric", "text", "text")
+MAX_BIGINT = 2**63 - 1
+MAX_PRICE = 10_000_000  # NUMERIC(10,2) holds < 1e8; same bound as migration 034
+
+_CREATE_LOAD_SQL = """
+CREATE TEMP TABLE {load} (
+  ord INT NOT NULL,
+  sku TEXT,
+  internet_number BIGINT,
+  barcode_upc TEXT,
+  item_name TEXT,
+  brand TEXT,
+  retail_price NUMERIC,
+  image_url TEXT,
+  product_link TEXT
+) ON COMMIT DROP
+"""
+
+# Same statement as ingest_enrichment_staging (migration 034), reading the temp
+# table. Braces in the regexes are doubled for sql.SQL().format().
+_MERGE_SQL = """
+WITH ranked AS (
+  SELECT
+    l.*,
+    COALESCE(sku ~ '^[0-9]{{6}}$' OR sku ~ '^10[01][0-9]{{7}}$', FALSE) AS valid_sku,
+    row_number() OVER (PARTITION BY sku ORDER BY ord) AS sku_rank
+  FROM {load} l
+),
+ranked_internet AS (
+  SELECT
+    r.*,
+    row_number() OVER (
+      PARTITION BY (r.valid_sku AND r.sku_rank = 1), r.internet_number
+      ORDER BY r.ord
+    ) AS internet_rank
+  FROM ranked r
+),
+classified AS (
+  SELECT
+    r.*,
+    CASE
+      WHEN NOT r.valid_sku THEN 'invalid_sku'
+      WHEN r.sku_rank > 1 THEN 'duplicate'
+      WHEN r.internet_number IS NOT NULL AND (
+        r.internet_rank > 1
+        OR EXISTS (
+          SELECT 1
+          FROM {target} e
+          WHERE e.internet_number = r.internet_number AND e.sku <> r.sku
+        )
+      ) THEN 'internet_number_conflict'
+    END AS rejected
+  FROM ranked_internet r
+),
+written AS (
+  INSERT INTO {target} AS s (
+    sku, internet_number, barcode_upc, item_name, brand, retail_price, image_url, product_link
+  )
+  SELECT
+    sku, internet_number, barcode_upc, item_name, brand, retail_price, image_url, product_link
+  FROM classified
+  WHERE rejected IS NULL
+  ON CONFLICT (sku) DO UPDATE
+  SET internet_number = EXCLUDED.internet_number,
+      barcode_upc = EXCLUDED.barcode_upc,
+      item_name = EXCLUDED.item_name,
+      brand = EXCLUDED.brand,
+      retail_price = COALESCE(EXCLUDED.retail_price, s.retail_price),
+      image_url = EXCLUDED.image_url,
+      product_link = EXCLUDED.product_link
+  WHERE (s.internet_number, s.barcode_upc, s.item_name, s.brand, s.retail_price,
+         s.image_url, s.product_link)
+    IS DISTINCT FROM
+        (EXCLUDED.internet_number, EXCLUDED.barcode_upc, EXCLUDED.item_name,
+         EXCLUDED.brand, COALESCE(EXCLUDED.retail_price, s.retail_price),
+         EXCLUDED.image_url, EXCLUDED.product_link)
+  RETURNING s.sku, (xmax = 0) AS inserted
+)
+SELECT
+  COALESCE(
+    c.rejected,
+    CASE
+      WHEN w.sku IS NULL THEN 'unchanged'
+      WHEN w.inserted THEN 'inserted'
+      ELSE 'updated'
+    END
+  )
+FROM classified c
+LEFT JOIN written w ON c.rejected IS NULL AND w.sku = c.sku
+ORDER BY c.ord
+"""
+
+
+def _require_psycopg() -> None:
+    if psycopg is None:
+        raise RuntimeError(
+            "psycopg is not installed. Run: pip install 'psycopg[binary]'"
+        )
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def load_row(ord_: int, row: Dict[str, Any]) -> tuple:
+    """One COPY tuple; values the column types cannot hold become NULL."""
+    internet_number = row.get("internet_number")
+    if not isinstance(internet_number, int) or not 0 <= internet_number <= MAX_BIGINT:
+        internet_number = None
+    price = row.get("retail_price")
+    if isinstance(price, bool) or not isinstance(price, (int, float)):
+        price = None
+    elif not (math.isfinite(price) and 0 <= price < MAX_PRICE):
+        price = None
+    else:
+        # Half up, like Postgres round() and the NUMERIC(10,2) cast.
+        price = Decimal(str(price)).quantize(Decimal("0.01"), ROUND_HALF_UP)
+    return (
+        ord_,
+        _text(row.get("sku")),
+        internet_number,
+        _text(row.get("barcode_upc")),
+        _text(row.get("item_name")),
+        _text(row.get("brand")),
+        price,
+        _text(row.get("image_url")),
+        _text(row.get("product_link")),
+    )
+
+
+class PgCopyIngest:
+    """Binary COPY + set-wise merge of staging rows over one Postgres connection."""
+
+    def __init__(self, dsn: str, table: str = STAGING_TABLE):
+        _require_psycopg()
+        self.dsn = dsn
+        self.table = table
+        self.conn = None
+        load = sql.Identifier(LOAD_TABLE)
+        self._create_load = sql.SQL(_CREATE_LOAD_SQL).format(load=load)
+        self._analyze_load = sql.SQL("ANALYZE {load}").format(load=load)
+        self._copy = sql.SQL(
+            "COPY {load} ({columns}) FROM STDIN (FORMAT BINARY)"
+        ).format(
+            load=load, columns=sql.SQL(", ").join(map(sql.Identifier, LOAD_COLUMNS))
+        )
+        self._merge = sql.SQL(_MERGE_SQL).format(
+            load=load, target=sql.Identifier(table)
+        )
+
+    @classmethod
+    def connect(cls, dsn: str, table: str = STAGING_TABLE) -> "PgCopyIngest":
+        ingest = cls(dsn, table)
+        ingest._connection()
+        return ingest
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed or self.conn.broken:
+            self.conn = psycopg.connect(
+                self.dsn, autocommit=True, prepare_threshold=None
+            )
+        return self.conn
+
+    def ingest(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """COPY rows into the temp table and merge them; one transaction."""
+        conn = self._connection()
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute(self._create_load)
+            with cur.copy(self._copy) as copy:
+                copy.set_types(LOAD_TYPES)
+                for ord_, row in enumerate(rows, 1):
+                    copy.write_row(load_row(ord_, row))
+            # Temp tables are never auto-analyzed; without stats the merge plans
+            # nested loops over the whole batch.
+            cur.execute(self._analyze_load)
+            cur.execute(self._merge)
+            outcomes = [outcome for (outcome,) in cur.fetchall()]
+        return {"counts": dict(Counter(outcomes)), "outcomes": outcomes}
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self) -> "PgCopyIngest":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+def synthetic_rows(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Staging-shaped rows with distinct SKUs and internet numbers."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        sku = f"{100000 + i}" if i < 900000 else f"100{i:07d}"
+        rows.append(
+            {
+                "sku": sku,
+                "internet_number": 300000000 + i,
+                "barcode_upc": f"{rng.randrange(10**11, 10**12)}",
+                "item_name": f"Synthetic clearance item {i} with a realistic name",
+                "brand": rng.choice(("HUSKY", "RYOBI", "GLACIER BAY", "BEHR")),
+                "retail_price": round(rng.uniform(1, 500), 2)
+                if rng.random() < 0.8
+                else None,
+                "image_url": f"https://images.thdstatic.com/productImages/{i}/svn/x.jpg",
+                "product_link": f"https://www.homedepot.com/p/{300000000 + i}",
+            }
+        )
+    return rows
+
+
+def _postgrest_sql_upsert(
+    conn, table: str, rows: List[Dict[str, Any]], batch_size: int
+):
+    """The statement PostgREST runs for a JSON upsert, one round trip per batch."""
+    columns = [c for c in LOAD_COLUMNS if c != "ord"]
+    query = sql.SQL(
+        "INSERT INTO {t} ({cols}) SELECT {cols} FROM json_populate_recordset("
+        "NULL::{t}, %s::json) ON CONFLICT (sku) DO UPDATE SET {sets}"
+    ).format(
+        t=sql.Identifier(table),
+        cols=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        sets=sql.SQL(", ").join(
+            sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c))
+            for c in columns[1:]
+        ),
+    )
+    for i in range(0, len(rows), batch_size):
+        batch = [
+            {k: v for k, v in row.items() if not (k == "retail_price" and v is None)}
+            for row in rows[i : i + batch_size]
+        ]
+        conn.execute(query, [json.dumps(batch)])
+
+
+def _postgrest_http_upsert(table: str, rows: List[Dict[str, Any]], batch_size: int):
+    """The warmer's real row path: supabase-py upserts over HTTP."""
+    from supabase import create_client
+
+    client = create_client(
+        os.environ["NEXT_PUBLIC_SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"]
+    )
+    for i in range(0, len(rows), batch_size):
+        batch = [
+            {k: v for k, v in row.items() if not (k == "retail_price" and v is None)}
+            for row in rows[i : i + batch_size]
+        ]
+        client.table(table).upsert(batch, on_conflict="sku").execute()
+
+
+def benchmark(
+    dsn: str, n: int = 20000, batch_size: int = 50, http: bool = False
+) -> Dict[str, Any]:
+    """
+    Time COPY ingest against PostgREST-style upserts on a scratch copy of
+    enrichment_staging, cold (all inserts) and warm (same rows again).
+    """
+    _require_psycopg()
+    rows = synthetic_rows(n)
+    admin = psycopg.connect(dsn, autocommit=True, prepare_threshold=None)
+    bench = sql.Identifier(BENCH_TABLE)
+    results: Dict[str, Any] = {"rows": n, "batch_size": batch_size}
+
+    def reset() -> None:
+        admin.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(bench))
+        admin.execute(
+            sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING ALL)").format(
+                bench, sql.Identifier(STAGING_TABLE)
+            )
+        )
+
+    def timed(name: str, fn) -> None:
+        for phase in ("cold", "warm"):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            results[f"{name}_{phase}"] = {
+                "sec": round(elapsed, 3),
+                "rows_per_sec": int(n / elapsed) if elapsed else None,
+            }
+
+    try:
+        reset()
+        with PgCopyIngest.connect(dsn, table=BENCH_TABLE) as pg:
+            timed("copy", lambda: pg.ingest(rows))
+        reset()
+        timed(
+            "postgrest_sql",
+            lambda: _postgrest_sql_upsert(admin, BENCH_TABLE, rows, batch_size),
+        )
+        if http:
+            reset()
+            admin.execute("NOTIFY pgrst, 'reload schema'")
+            time.sleep(2)
+            timed(
+                "postgrest_http",
+                lambda: _postgrest_http_upsert(BENCH_TABLE, rows, batch_size),
+            )
+    finally:
+        admin.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(bench))
+        admin.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark COPY ingest vs PostgREST-style upserts."
+    )
+    parser.add_argument("--dsn", default=os.environ.get("WARMER_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument(
+        "--http",
+        action="store_true",
+        help="Also time supabase-py upserts (NEXT_PUBLIC_SUPABASE_URL / "
+        "SUPABASE_SERVICE_ROLE_KEY)",
+    )
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or WARMER_DATABASE_URL is required")
+    print(
+        json.dumps(
+            benchmark(args.dsn, args.rows, args.batch_size, http=args.http), indent=2
+        )
+    )
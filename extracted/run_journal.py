@@ -0,0 +1,188 @@
+"""
+Run journal: local checkpoints that make a staging-warmer run resumable.
+
+Layout under the journal directory (one run at a time; a new run replaces it):
+    state.json             phase, batch size, acknowledged batches, dedup stats
+    scrape.json.gz         scrape result (data, counts, zip_results)
+    unique_items.json.gz   deduped staging rows, in upsert order
+
+Phases: "started" -> "scraped" -> "upserting" -> "complete". A run that dies
+in "scraped" resumes at dedup; one that dies in "upserting" resumes at its
+first unacknowledged batch. Neither re-runs the scrape.
+
+Usage:
+    journal = RunJournal(".local/staging-warmer-journal").begin({"zip_codes": zips})
+    journal.save_scrape(scrape_result)
+    journal.save_unique_items(unique_items, batch_size=50, stats=stats)
+    for index in journal.pending_batches(total_batches):
+        ...upsert...
+        journal.ack_batch(index)
+    journal.complete()
+"""
+
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from atomic_file import atomic_write
+
+DEFAULT_JOURNAL_DIR = os.path.join(".local", "staging-warmer-journal")
+JOURNAL_VERSION = 1
+
+STATE_FILE = "state.json"
+SCRAPE_FILE = "scrape.json.gz"
+UNIQUE_ITEMS_FILE = "unique_items.json.gz"
+
+
+class RunJournal:
+    """Checkpoint state for one warmer run."""
+
+    def __init__(self, directory: str = DEFAULT_JOURNAL_DIR):
+        self.directory = directory
+        self.state: Dict[str, Any] = {}
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_JOURNAL_DIR) -> Optional["RunJournal"]:
+        """Open an existing journal, or None if there is none (or it is unreadable)."""
+        journal = cls(directory)
+        try:
+            with open(journal._path(STATE_FILE), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != JOURNAL_VERSION:
+            return None
+        journal.state = state
+        return journal
+
+    def begin(self, fingerprint: Optional[Dict[str, Any]] = None) -> "RunJournal":
+        """Start a new run, discarding whatever the previous run left behind."""
+        os.makedirs(self.directory, exist_ok=True)
+        for name in (SCRAPE_FILE, UNIQUE_ITEMS_FILE):
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        self.state = {
+            "version": JOURNAL_VERSION,
+            "run_id": uuid.uuid4().hex[:12],
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "fingerprint": fingerprint or {},
+            "phase": "started",
+            "batch_size": None,
+            "total_rows": 0,
+            "acked_batches": [],
+            "stats": {},
+        }
+        self._write_state()
+        return self
+
+    # --- state ---
+
+    @property
+    def phase(self) -> Optional[str]:
+        return self.state.get("phase")
+
+    @property
+    def run_id(self) -> Optional[str]:
+        return self.state.get("run_id")
+
+    @property
+    def batch_size(self) -> Optional[int]:
+        return self.state.get("batch_size")
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.state.get("stats") or {})
+
+    def save_scrape(self, scrape_result: Dict[str, Any]) -> None:
+        """Persist the scrape so a resumed run never calls the upstream API."""
+        payload = {
+            key: scrape_result.get(key)
+            for key in (
+                "data",
+                "raw_count",
+                "final_count",
+                "price_units",
+                "zip_results",
+            )
+        }
+        self._write_gz(SCRAPE_FILE, payload)
+        self.state["phase"] = "scraped"
+        self._write_state()
+
+    def load_scrape(self) -> Dict[str, Any]:
+        result = self._read_gz(SCRAPE_FILE)
+        result["ok"] = True
+        return result
+
+    def save_unique_items(
+        self, unique_items: List[dict], batch_size: int, stats: Dict[str, Any]
+    ) -> None:
+        """Persist the deduped rows; batch boundaries are fixed from here on."""
+        self._write_gz(UNIQUE_ITEMS_FILE, unique_items)
+        self.state.update(
+            {
+                "phase": "upserting",
+                "batch_size": batch_size,
+                "total_rows": len(unique_items),
+                "acked_batches": [],
+                "stats": dict(stats),
+            }
+        )
+        self._write_state()
+
+    def load_unique_items(self) -> List[dict]:
+        return self._read_gz(UNIQUE_ITEMS_FILE)
+
+    def pending_batches(self, total_batches: int) -> List[int]:
+        """Batch indexes not yet acknowledged, in order."""
+        acked = set(self.state.get("acked_batches") or [])
+        return [i for i in range(total_batches) if i not in acked]
+
+    def acked_rows(self) -> int:
+        """Rows covered by acknowledged batches."""
+        batch_size = self.batch_size or 0
+        total = self.state.get("total_rows") or 0
+        return sum(
+            max(0, min(batch_size, total - i * batch_size))
+            for i in self.state.get("acked_batches") or []
+        )
+
+    def ack_batch(self, index: int) -> None:
+        """Record that batch `index` was upserted."""
+        acked = self.state.setdefault("acked_batches", [])
+        if index not in acked:
+            acked.append(index)
+            acked.sort()
+        self.state["last_acked_batch"] = index
+        self._write_state()
+
+    def complete(self) -> None:
+        self.state["phase"] = "complete"
+        self.state["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self._write_state()
+
+    # --- files ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write_state(self) -> None:
+        atomic_write(self._path(STATE_FILE), json.dumps(self.state, indent=2) + "\n")
+
+    def _write_gz(self, name: str, payload: Any) -> None:
+        # Level 1: the point is to be back up in seconds, not to save disk.
+        body = json.dumps(payload, default=str, separators=(",", ":"))
+        atomic_write(
+            self._path(name),
+            gzip.compress(body.encode("utf-8"), compresslevel=1),
+            durable=True,
+        )
+
+    def _read_gz(self, name: str) -> Any:
+        with gzip.open(self._path(name), "rt", encoding="utf-8") as f:
+            return json.load(f)
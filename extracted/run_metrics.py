@@ -0,0 +1,311 @@
+"""
+Run metrics: lightweight per-stage spans for the scraper and staging warmer.
+
+Each stage records wall time, CPU time and bytes in/out, plus the tracemalloc
+peak while it was open when trace_memory is on (tracing slows allocation-heavy
+stages, so it is off by default). Stages may nest. The finished report is
+written as JSON (for trending) and, optionally, as a Prometheus textfile (for
+node_exporter's textfile collector).
+
+Usage:
+    metrics = RunMetrics("staging_warmer")
+    with metrics.stage("scrape") as span:
+        span.add_bytes_in(len(payload))
+    metrics.write_json(".local/staging-warmer-metrics.json")
+"""
+
+import json
+import math
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from atomic_file import atomic_write
+
+
+def payload_size(value: Any) -> int:
+    """Approximate wire size of a JSON-able payload in bytes."""
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return 0
+
+
+def percentile(sorted_values: List[int], pct: float) -> Optional[int]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class StageSpan:
+    """Measurements for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.memory_peak_bytes: Optional[int] = None
+        self.items = 0
+        self.error: Optional[str] = None
+
+    def add_bytes_in(self, n: int) -> None:
+        self.bytes_in += int(n or 0)
+
+    def add_bytes_out(self, n: int) -> None:
+        self.bytes_out += int(n or 0)
+
+    def add_items(self, n: int) -> None:
+        self.items += int(n or 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "wall_ms": round(self.wall_ms, 2),
+            "cpu_ms": round(self.cpu_ms, 2),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "memory_peak_bytes": self.memory_peak_bytes,
+            "items": self.items,
+            "error": self.error,
+        }
+
+
+class RunMetrics:
+    """Collects stage spans, zip fetch timings and counters for one run."""
+
+    def __init__(
+        self, run_name: str, trace_memory: bool = False, profiler: Optional[Any] = None
+    ):
+        self.run_name = run_name
+        self.trace_memory = trace_memory
+        # Optional stage_profiler.StageProfiler; samples are bucketed by the same stage names.
+        self.profiler = profiler
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.stages: List[StageSpan] = []
+        self.zip_results: List[Dict[str, Any]] = []
+        self.counters: Dict[str, Any] = {}
+        self._started_tracemalloc = False
+        # Constant labels on every Prometheus sample, e.g. {"worker": worker_id} so
+        # several workers' textfiles do not collide.
+        self.labels: Dict[str, str] = {}
+        # Peak so far of each open stage; tracemalloc has a single peak, which an
+        # inner stage resets on entry.
+        self._open_peaks: List[List[int]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageSpan]:
+        """Time a stage. Spans with the same name accumulate into one entry."""
+        span = self._get_or_create(name)
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            self._carry_peak()
+            tracemalloc.reset_peak()
+            mem_before, _ = tracemalloc.get_traced_memory()
+            open_peak = [mem_before]
+            self._open_peaks.append(open_peak)
+
+        profile_ctx = self.profiler.stage(name) if self.profiler else nullcontext()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with profile_ctx:
+                yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.wall_ms += (time.perf_counter() - wall_start) * 1000
+            span.cpu_ms += (time.process_time() - cpu_start) * 1000
+            if self.trace_memory and tracemalloc.is_tracing():
+                self._carry_peak()
+                stage_peak = max(0, open_peak[0] - mem_before)
+                span.memory_peak_bytes = max(span.memory_peak_bytes or 0, stage_peak)
+            if self.trace_memory:
+                self._open_peaks = [p for p in self._open_peaks if p is not open_peak]
+
+    def _carry_peak(self) -> None:
+        """Fold the current tracemalloc peak into every open stage's peak."""
+        _, peak = tracemalloc.get_traced_memory()
+        for open_peak in self._open_peaks:
+            open_peak[0] = max(open_peak[0], peak)
+
+    def record_stage(
+        self,
+        name: str,
+        wall_ms: float = 0.0,
+        cpu_ms: float = 0.0,
+        items: int = 0,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+    ) -> StageSpan:
+        """Record a stage measured elsewhere (e.g. on a background thread)."""
+        span = self._get_or_create(name)
+        span.wall_ms += wall_ms
+        span.cpu_ms += cpu_ms
+        span.add_items(items)
+        span.add_bytes_in(bytes_in)
+        span.add_bytes_out(bytes_out)
+        return span
+
+    def _get_or_create(self, name: str) -> StageSpan:
+        for span in self.stages:
+            if span.name == name:
+                return span
+        span = StageSpan(name)
+        self.stages.append(span)
+        return span
+
+    def add_zip_results(self, zip_results: List[Dict[str, Any]]) -> None:
+        """Fold scraper_core's per-zip fetch results into the report."""
+        self.zip_results.extend(zip_results or [])
+
+    def set_counters(self, counters: Dict[str, Any]) -> None:
+        self.counters.update(counters or {})
+
+    def finish(self) -> None:
+        if self.finished_at is None:
+            self.finished_at = datetime.now(timezone.utc)
+        if self._started_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _zip_summary(self) -> Dict[str, Any]:
+        elapsed = sorted(
+            int(r["elapsed_ms"])
+            for r in self.zip_results
+            if isinstance(r.get("elapsed_ms"), (int, float))
+        )
+        return {
+            "zips": len(self.zip_results),
+            "errors": sum(1 for r in self.zip_results if r.get("error")),
+            "hedged": sum(1 for r in self.zip_results if r.get("hedged")),
+            "hedge_won": sum(1 for r in self.zip_results if r.get("hedge_won")),
+            "items": sum(int(r.get("count") or 0) for r in self.zip_results),
+            "bytes_in": sum(int(r.get("bytes") or 0) for r in self.zip_results),
+            "elapsed_ms_total": sum(elapsed),
+            "elapsed_ms_p50": percentile(elapsed, 0.50),
+            "elapsed_ms_p95": percentile(elapsed, 0.95),
+            "elapsed_ms_max": elapsed[-1] if elapsed else None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        finished = self.finished_at or datetime.now(timezone.utc)
+        return {
+            "run": self.run_name,
+            "labels": self.labels,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": finished.isoformat(),
+            "duration_ms": round(
+                (finished - self.started_at).total_seconds() * 1000, 2
+            ),
+            "stages": [s.to_dict() for s in self.stages],
+            "zip_summary": self._zip_summary(),
+            "zips": [
+                {
+                    "zip_code": r.get("zip_code"),
+                    "elapsed_ms": r.get("elapsed_ms"),
+                    "count": r.get("count"),
+                    "bytes": r.get("bytes"),
+                    "status_code": r.get("status_code"),
+                    "error": r.get("error"),
+                    "timeout_sec": r.get("timeout_sec"),
+                    "hedged": r.get("hedged"),
+                    "hedge_won": r.get("hedge_won"),
+                }
+                for r in self.zip_results
+            ],
+            "counters": self.counters,
+        }
+
+    def write_json(self, path: str) -> None:
+        atomic_write(path, json.dumps(self.to_dict(), indent=2, default=str) + "\n")
+
+    def write_prometheus(self, path: str, prefix: str = "penny_warmer") -> None:
+        """Write a node_exporter textfile-collector compatible snapshot."""
+        atomic_write(path, self.to_prometheus(prefix))
+
+    def to_prometheus(self, prefix: str = "penny_warmer") -> str:
+        """Prometheus text exposition of the run (stages, zips, counters)."""
+        lines: List[str] = []
+
+        def gauge(name: str, help_text: str, samples: List[tuple]) -> None:
+            metric = f"{prefix}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_str = ",".join(
+                    f'{k}="{_escape_label(str(v))}"'
+                    for k, v in {**self.labels, **labels}.items()
+                )
+                lines.append(f"{metric}{{{label_str}}} {value}")
+
+        stages = self.stages
+        gauge(
+            "stage_wall_seconds",
+            "Wall-clock time per stage.",
+            [({"stage": s.name}, round(s.wall_ms / 1000, 4)) for s in stages],
+        )
+        gauge(
+            "stage_cpu_seconds",
+            "Process CPU time per stage.",
+            [({"stage": s.name}, round(s.cpu_ms / 1000, 4)) for s in stages],
+        )
+        gauge(
+            "stage_bytes_in",
+            "Bytes received per stage.",
+            [({"stage": s.name}, s.bytes_in) for s in stages],
+        )
+        gauge(
+            "stage_bytes_out",
+            "Bytes sent per stage.",
+            [({"stage": s.name}, s.bytes_out) for s in stages],
+        )
+        gauge(
+            "stage_memory_peak_bytes",
+            "tracemalloc peak above the stage's starting allocation.",
+            [({"stage": s.name}, s.memory_peak_bytes) for s in stages],
+        )
+        gauge(
+            "zip_elapsed_seconds",
+            "Fetch time per zip code.",
+            [
+                ({"zip": r.get("zip_code")}, round(r["elapsed_ms"] / 1000, 4))
+                for r in self.zip_results
+                if isinstance(r.get("elapsed_ms"), (int, float))
+            ],
+        )
+        gauge(
+            "stat",
+            "Run counters (see print_stats).",
+            [
+                ({"key": k}, v)
+                for k, v in self.counters.items()
+                if isinstance(v, (int, float)) and not isinstance(v, bool)
+            ],
+        )
+        finished = self.finished_at or datetime.now(timezone.utc)
+        gauge(
+            "last_run_timestamp_seconds",
+            "Unix time the run finished.",
+            [({"run": self.run_name}, int(finished.timestamp()))],
+        )
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -11,12 +11,174 @@ Output: {ok: bool, data: List[dict], error?: str, stage?: str}
 import json
 import os
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 import requests
 
+try:
+    from .date_parse import parse_date_series
+except ImportError:  # run from extracted/ (scripts put it on sys.path)
+    from date_parse import parse_date_series
+
+if TYPE_CHECKING:  # annotations only; neither module is needed to scrape
+    from store_join import StoreJoinIndex
+    from zip_latency import ZipLatency
+
+# Source price columns, in priority order.
+PRICE_COLUMNS = ["price", "current_price", "offer_price", "price_cents"]
+# NOTE: Upstream payloads sometimes mix snake_case and camelCase.
+# Avoid choosing a single "retail" column because that can leave many rows as NaN,
+# even when the row has a valid price under a different key.
+RETAIL_PRICE_COLUMNS = [
+    "retail_price",
+    "retailPrice",
+    "store_retail_price",
+    "storeRetailPrice",
+    "list_price",
+    "listPrice",
+    "msrp",
+    "MSRP",
+    "price_retail",
+]
+
+
+def _numeric_prices(values: pd.Series) -> np.ndarray:
+    """Parse a raw price column to float amounts (NaN where a value does not parse)."""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numeric = pd.to_numeric(values, errors="coerce")
+    else:
+        text = (
+            values.astype("string")
+            .str.replace("$", "", regex=False)
+            .str.replace(",", "", regex=False)
+            .str.strip()
+        )
+        numeric = pd.to_numeric(text, errors="coerce")
+    amounts = numeric.to_numpy(dtype=float, na_value=np.nan, copy=True)
+    # inf / absurd magnitudes would not fit the integer cents column.
+    amounts[~(np.abs(amounts) < 1e12)] = np.nan
+    return amounts
+
+
+def detect_price_unit(column: str, amounts: np.ndarray) -> str:
+    """
+    Decide once per column whether amounts are "cents" or "dollars".
+
+    Columns named *cents* are cents. A retail column (RETAIL_PRICE_COLUMNS) of
+    whole numbers whose median is above 1000 is also taken as cents (the old
+    per-value "> 1000 means cents" retail rule, applied to the column as a whole).
+    Every other column is dollars.
+    """
+    if "cents" in column.lower():
+        return "cents"
+    if column not in RETAIL_PRICE_COLUMNS:
+        return "dollars"
+    parsed = amounts[~np.isnan(amounts)]
+    if len(parsed) and np.all(parsed == np.round(parsed)) and np.median(parsed) > 1000:
+        return "cents"
+    return "dollars"
+
+
+def format_cents(cents: int) -> str:
+    """Display string for an integer cents amount, e.g. 1299 -> "$12.99"."""
+    return f"${cents / 100:.2f}"
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    return None if pd.isna(value) else int(value)
+
+
+def aggregate_by_sku(
+    df: pd.DataFrame, states: Optional[pd.Series] = None
+) -> List[Dict[str, Any]]:
+    """
+    Per-SKU summaries of a normalized frame, from one group-by.
+
+    Each summary: store_sku, item_name (first non-null), store_count (distinct
+    store_name), states (sorted distinct values of `states`, a column aligned with
+    df; [] without one), min_days_old and latest_penny_date (None when no row of
+    the SKU has a parsed date), total_stock (sum of the numeric display_stock
+    values; None when none are numeric), and the lowest price / highest
+    retail_price seen (*_value_cents plus display strings).
+    Sorted by store_count (most stores first), then SKU.
+    """
+    if df.empty or "store_sku" not in df.columns:
+        return []
+    sku = df["store_sku"].astype(str)
+    frame = pd.DataFrame(
+        {
+            "store_sku": sku,
+            "item_name": df["item_name"] if "item_name" in df.columns else None,
+            "store_name": df["store_name"] if "store_name" in df.columns else sku,
+            # days_old is 999 when the date did not parse; leave those out.
+            "days_old": pd.to_numeric(df["days_old"], errors="coerce").where(
+                df["penny_date"].notna()
+            ),
+            "penny_date": df["penny_date"],
+            "stock": pd.to_numeric(df["display_stock"], errors="coerce"),
+            "price": pd.to_numeric(df["price_value_cents"], errors="coerce"),
+            "retail": pd.to_numeric(df["retail_price_value_cents"], errors="coerce"),
+        },
+        index=df.index,
+    )
+    grouped = frame.groupby("store_sku", sort=False)
+    summary = pd.DataFrame(
+        {
+            "item_name": grouped["item_name"].first(),
+            "store_count": grouped["store_name"].nunique(),
+            "min_days_old": grouped["days_old"].min(),
+            "latest_penny_date": grouped["penny_date"].max(),
+            "total_stock": grouped["stock"].sum(min_count=1),
+            "best_price": grouped["price"].min(),
+            "best_retail": grouped["retail"].max(),
+        }
+    )
+    summary = summary.reset_index().sort_values(
+        ["store_count", "store_sku"], ascending=[False, True], kind="stable"
+    )
+
+    state_lists: Dict[str, List[str]] = {}
+    if states is not None:
+        pairs = (
+            pd.DataFrame({"store_sku": sku, "state": states}, index=df.index)
+            .dropna()
+            .drop_duplicates()
+            .sort_values("state", kind="stable")
+        )
+        # .agg(list) would run a Python call per group; pairs is already small
+        for key, state in zip(
+            pairs["store_sku"].tolist(), pairs["state"].tolist(), strict=True
+        ):
+            state_lists.setdefault(key, []).append(state)
+
+    summaries = []
+    for row in summary.itertuples(index=False):
+        price = _int_or_none(row.best_price)
+        retail = _int_or_none(row.best_retail)
+        summaries.append(
+            {
+                "store_sku": row.store_sku,
+                "item_name": None if pd.isna(row.item_name) else row.item_name,
+                "store_count": int(row.store_count),
+                "states": state_lists.get(row.store_sku, []),
+                "min_days_old": _int_or_none(row.min_days_old),
+                "latest_penny_date": (
+                    None if pd.isna(row.latest_penny_date) else row.latest_penny_date
+                ),
+                "total_stock": _int_or_none(row.total_stock),
+                "best_price_value_cents": price,
+                "best_price": None if price is None else format_cents(price),
+                "best_retail_price_value_cents": retail,
+                "best_retail_price": None if retail is None else format_cents(retail),
+            }
+        )
+    return summaries
+
 
 class PennyScraperCore:
     """Minimal scraper for penny-items API with normalize-on-parse."""
@@ -29,6 +191,11 @@ class PennyScraperCore:
         api_url: str = "https://pro.scouterdev.io/api/penny-items",
         timeout_sec: int = 15,
         rate_limit_sec: float = 1.2,
+        metrics: Optional[Any] = None,
+        deadline: Optional[float] = None,
+        latency: Optional["ZipLatency"] = None,
+        hedge: bool = False,
+        stores: Optional["StoreJoinIndex"] = None,
     ):
         """
         Initialize scraper with required credentials.
@@ -40,12 +207,29 @@ class PennyScraperCore:
             api_url: API endpoint (defaults to pro.scouterdev.io)
             timeout_sec: Request timeout in seconds
             rate_limit_sec: Sleep between requests in seconds
+            metrics: Optional run_metrics.RunMetrics; when set, fetch and normalize
+                are recorded as "scrape" and "normalize" stages
+            deadline: Optional time.monotonic() timestamp. Zips that would not finish
+                before it are not fetched and are reported in "deferred_zips".
+            latency: Optional zip_latency.ZipLatency. When set, each zip's timeout
+                comes from its observed p99 (timeout_sec until it has history),
+                every response time is recorded, and run() saves it.
+            hedge: With `latency`, send a second request for a zip once the first
+                has been pending longer than the zip's p95; the first response wins.
+            stores: Optional store_join.StoreJoinIndex. When set, every row gets the
+                store_number / store_state / store_city / store_zip / store_lat /
+                store_lng of its store_name, and run() returns a "store_join" report.
         """
         self.raw_cookie = raw_cookie
         self.guild_id = guild_id
         self.api_url = api_url
         self.timeout_sec = timeout_sec
         self.rate_limit_sec = rate_limit_sec
+        self.metrics = metrics
+        self.deadline = deadline
+        self.latency = latency
+        self.hedge = hedge
+        self.stores = stores
 
         # Default Georgia zip codes (same as original)
         self.zip_codes = zip_codes or [
@@ -64,13 +248,25 @@ class PennyScraperCore:
         ]
 
         self.session: Optional[requests.Session] = None
+        # Hedged requests use their own session; a losing request may still be
+        # in flight on the main one.
+        self.hedge_session: Optional[requests.Session] = None
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
         self.all_data: List[Dict[str, Any]] = []
         self.zip_results: List[Dict[str, Any]] = []
+        # Unit detected for each source price column on the last normalize.
+        self.price_units: Dict[str, str] = {}
+        self.deferred_zips: List[str] = []
 
     def _setup_session(self) -> None:
-        """Create and configure session with auth headers."""
-        self.session = requests.Session()
-        self.session.headers.update(
+        """Create and configure session with auth headers (kept across run() calls)."""
+        if self.session is not None:
+            return
+        self.session = self._new_session()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(
             {
                 "User-Agent": "Mozilla/5.0",
                 "Accept": "application/json,text/plain,*/*",
@@ -78,6 +274,108 @@ class PennyScraperCore:
                 "Cookie": self.raw_cookie,
             }
         )
+        return session
+
+    def close(self) -> None:
+        """Close the HTTP session(s); the next run() opens a new one."""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+        for session in (self.session, self.hedge_session):
+            if session is not None:
+                session.close()
+        self.session = None
+        self.hedge_session = None
+
+    def _stage(self, name: str):
+        """Return a metrics span for `name`, or a no-op context when metrics are off."""
+        if self.metrics is None:
+            return nullcontext(None)
+        return self.metrics.stage(name)
+
+    def _request_timeout(self, zip_code: Optional[str] = None) -> float:
+        """Per-request timeout (adaptive per zip), clipped to the deadline."""
+        timeout = self.timeout_sec
+        if self.latency is not None and zip_code is not None:
+            timeout = self.latency.timeout_for(zip_code, self.timeout_sec)
+        if self.deadline is None:
+            return timeout
+        return max(1.0, min(timeout, self.deadline - time.monotonic()))
+
+    def _get(
+        self, zip_code: str, params: Dict[str, str], zip_result: Dict[str, Any]
+    ) -> requests.Response:
+        """GET one zip, hedging it past the zip's p95 when enabled."""
+        timeout = self._request_timeout(zip_code)
+        zip_result["timeout_sec"] = round(timeout, 2)
+        hedge_after = (
+            self.latency.hedge_after(zip_code)
+            if self.hedge and self.latency is not None
+            else None
+        )
+        if hedge_after is None or hedge_after >= timeout:
+            return self.session.get(self.api_url, params=params, timeout=timeout)
+
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="hedge"
+            )
+        if self.hedge_session is None:
+            self.hedge_session = self._new_session()
+        started = time.monotonic()
+        primary = self._hedge_pool.submit(
+            self.session.get, self.api_url, params=params, timeout=timeout
+        )
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        # Same total budget for the hedge as for the original request.
+        hedge_timeout = max(1.0, timeout - (time.monotonic() - started))
+        zip_result["hedged"] = True
+        zip_result["hedge_after_ms"] = int(hedge_after * 1000)
+        hedge = self._hedge_pool.submit(
+            self.hedge_session.get, self.api_url, params=params, timeout=hedge_timeout
+        )
+        sessions = {primary: self.session, hedge: self.hedge_session}
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    zip_result["hedge_won"] = future is hedge
+                    for loser in pending:
+                        self._retire_session(loser, sessions[loser])
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _retire_session(self, future, session: requests.Session) -> None:
+        """
+        Stop using a session whose request is still in flight.
+
+        requests.Session is not thread-safe, so the next zip gets a fresh session
+        and the busy one is closed once its request finishes.
+        """
+        if session is self.session:
+            self.session = self._new_session()
+        elif session is self.hedge_session:
+            self.hedge_session = self._new_session()
+        future.add_done_callback(lambda _: session.close())
+
+    def _out_of_time(self) -> bool:
+        """True when the next zip is not expected to finish before the deadline."""
+        if self.deadline is None:
+            return False
+        elapsed = [
+            r["elapsed_ms"] / 1000
+            for r in self.zip_results
+            if isinstance(r.get("elapsed_ms"), (int, float))
+        ]
+        # Until one zip has been timed, try it: its request timeout is clipped anyway.
+        expected = max(elapsed) if elapsed else 0.0
+        return time.monotonic() + expected > self.deadline
 
     def _peek_text(self, response: requests.Response, limit: int = 220) -> str:
         """Return a small, safe-to-log snippet of the response body."""
@@ -114,23 +412,28 @@ class PennyScraperCore:
             "looks_like_html": None,
             "was_redirected": None,
             "error": None,
+            "bytes": 0,
+            "timeout_sec": None,
+            "hedged": False,
+            "hedge_won": None,
         }
 
         try:
-            r = self.session.get(
-                self.api_url,
-                params={
+            r = self._get(
+                zip_code,
+                {
                     "zip_code": zip_code,
                     "guildId": self.guild_id,
                     "experimental": "true",
                     "include_out_of_stock": "false",
                 },
-                timeout=self.timeout_sec,
+                zip_result,
             )
 
             zip_result["status_code"] = r.status_code
             zip_result["content_type"] = r.headers.get("content-type")
             zip_result["was_redirected"] = bool(r.history)
+            zip_result["bytes"] = len(r.content or b"")
 
             snippet = self._peek_text(r)
             snippet_lower = snippet.lstrip().lower()
@@ -153,6 +456,11 @@ class PennyScraperCore:
                 if not isinstance(data, list):
                     data = [data] if data else []
 
+                # Remember which zip surfaced each item (per-zip yield accounting).
+                for item in data:
+                    if isinstance(item, dict):
+                        item.setdefault("source_zip", zip_code)
+
                 self.all_data.extend(data)
                 zip_result["count"] = len(data)
                 return len(data)
@@ -171,6 +479,42 @@ class PennyScraperCore:
         finally:
             zip_result["elapsed_ms"] = int((time.time() - started) * 1000)
             self.zip_results.append(zip_result)
+            if self.latency is not None:
+                timed_out = (zip_result["error"] or "").endswith("Timeout")
+                # Only responses and timeouts say anything about the zip's latency.
+                if zip_result["status_code"] is not None or timed_out:
+                    self.latency.record(
+                        zip_code, zip_result["elapsed_ms"], timed_out=timed_out
+                    )
+
+    def _coalesce_prices(self, df: pd.DataFrame, columns: List[str]) -> tuple:
+        """
+        First parseable amount across `columns` (priority order) for each row.
+
+        Returns (cents, display): an object Series of int cents / None and the
+        matching display strings. Rows where no column parses keep the first
+        non-null raw value as text, or "N/A".
+        """
+        cents = np.full(len(df), np.nan)
+        first_raw = pd.Series(None, index=df.index, dtype=object)
+        for col in columns:
+            if col not in df.columns:
+                continue
+            amounts = _numeric_prices(df[col])
+            unit = detect_price_unit(col, amounts)
+            self.price_units[col] = unit
+            col_cents = np.rint(amounts if unit == "cents" else amounts * 100)
+            cents = np.where(np.isnan(cents), col_cents, cents)
+            first_raw = first_raw.where(first_raw.notna(), df[col])
+
+        has_cents = ~np.isnan(cents)
+        display = pd.Series("N/A", index=df.index, dtype=object)
+        display[has_cents] = [format_cents(int(c)) for c in cents[has_cents]]
+        fallback = ~has_cents & first_raw.notna().to_numpy()
+        display[fallback] = first_raw[fallback].astype(str)
+
+        cents_col = pd.Series(cents, index=df.index).astype("Int64").astype(object)
+        return cents_col.where(has_cents, None), display
 
     def _normalize_frame(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -210,10 +554,10 @@ class PennyScraperCore:
             None,
         )
         if date_col:
-            df["penny_date"] = pd.to_datetime(df[date_col], errors="coerce")
-            df["days_old"] = df["penny_date"].apply(
-                lambda d: int((datetime.now() - d).days) if pd.notna(d) else 999
-            )
+            # Mixed formats are fine: each distinct string is parsed once (ISO first)
+            df["penny_date"] = parse_date_series(df[date_col])
+            age = pd.Timestamp(datetime.now()) - df["penny_date"]
+            df["days_old"] = age.dt.days.fillna(999).astype(int)
         else:
             df["penny_date"] = pd.NaT
             df["days_old"] = 999
@@ -226,32 +570,6 @@ class PennyScraperCore:
         _upc_col = next(
             (c for c in ["upc", "barcode", "gtin"] if c in df.columns), None
         )
-        _price_col = next(
-            (
-                c
-                for c in ["price", "current_price", "offer_price", "price_cents"]
-                if c in df.columns
-            ),
-            None,
-        )
-        # NOTE: Upstream payloads sometimes mix snake_case and camelCase.
-        # Avoid choosing a single "retail" column because that can leave many rows as NaN,
-        # even when the row has a valid price under a different key.
-        _retail_cols = [
-            c
-            for c in [
-                "retail_price",
-                "retailPrice",
-                "store_retail_price",
-                "storeRetailPrice",
-                "list_price",
-                "listPrice",
-                "msrp",
-                "MSRP",
-                "price_retail",
-            ]
-            if c in df.columns
-        ]
         _img_col = next(
             (
                 c
@@ -276,46 +594,14 @@ class PennyScraperCore:
             else df.get("upc", "N/A")
         )
 
-        # --- PRICE FORMATTING HELPERS ---
-        def _format_price(v):
-            if pd.isna(v):
-                return "N/A"
-            try:
-                v = float(v)
-                if v > 1000:  # Assume cents
-                    return f"${v/100:.2f}"
-                return f"${v:.2f}"
-            except (ValueError, TypeError):
-                return str(v)
-
-        def _detect_price_row(row):
-            for c in ["price", "current_price", "offer_price", "price_cents"]:
-                if c in row and pd.notna(row[c]):
-                    v = row[c]
-                    if c == "price_cents":
-                        try:
-                            return f"${float(v)/100:.2f}"
-                        except Exception:
-                            return "N/A"
-                    try:
-                        return f"${float(v):.2f}"
-                    except Exception:
-                        return str(v)
-            return "N/A"
-
-        df["price"] = df.apply(_detect_price_row, axis=1)
-
-        def _detect_retail_row(row):
-            for c in _retail_cols:
-                if c in row and pd.notna(row[c]):
-                    return _format_price(row[c])
-            # Fallback: if the source already has a retail_price string column in some rows
-            # but we didn't detect it (unlikely), preserve it if present.
-            if "retail_price" in row and pd.notna(row["retail_price"]):
-                return _format_price(row["retail_price"])
-            return "N/A"
-
-        df["retail_price"] = df.apply(_detect_retail_row, axis=1)
+        # --- PRICE FIELDS ---
+        # "price" / "retail_price" stay display strings; "*_value_cents" carry the
+        # same amounts as integer cents (None when no source column parses).
+        self.price_units = {}
+        df["price_value_cents"], df["price"] = self._coalesce_prices(df, PRICE_COLUMNS)
+        df["retail_price_value_cents"], df["retail_price"] = self._coalesce_prices(
+            df, RETAIL_PRICE_COLUMNS
+        )
         df["image_link"] = (
             df[_img_col]
             if _img_col and _img_col in df.columns
@@ -339,31 +625,58 @@ class PennyScraperCore:
 
         return df
 
-    def run(self) -> Dict[str, Any]:
+    def run(self, zip_codes: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Execute the scrape: fetch, normalize, deduplicate, return as structured data.
 
+        The instance can be reused: each call starts from empty results but keeps the
+        HTTP session (connection pool, cookies). `zip_codes` overrides self.zip_codes
+        for this call only.
+
         Returns:
             {
                 "ok": bool,
                 "data": List[dict],  # Normalized rows (if ok=True)
+                "sku_summaries": List[dict],  # One per store_sku (aggregate_by_sku)
                 "error": str,        # Error message (if ok=False)
                 "stage": str,        # Where it failed (if ok=False)
                 "raw_count": int,    # Total items before dedup
                 "final_count": int,  # Total items after dedup
+                "price_units": dict, # Source price column -> "cents" | "dollars"
+                "deferred_zips": List[str],  # Not fetched because of the deadline
+                "store_join": dict | None,   # With `stores`: matched / unmatched /
+                                             # ambiguous store names
+                "zip_results": List[dict],   # Per zip: status, elapsed_ms, timeout_sec,
+                                             # hedged / hedge_won, error, ...
             }
         """
+        zip_codes = list(zip_codes) if zip_codes is not None else self.zip_codes
         try:
+            self.all_data = []
             self.zip_results = []
+            self.deferred_zips = []
             # Setup session
             self._setup_session()
 
             # Fetch all zip codes
             total_fetched = 0
-            for zip_code in self.zip_codes:
-                count = self._fetch_zip_code(zip_code)
-                total_fetched += count
-                time.sleep(self.rate_limit_sec)
+            with self._stage("scrape") as span:
+                for index, zip_code in enumerate(zip_codes):
+                    if self._out_of_time():
+                        self.deferred_zips = list(zip_codes[index:])
+                        break
+                    count = self._fetch_zip_code(zip_code)
+                    total_fetched += count
+                    time.sleep(self.rate_limit_sec)
+                if span is not None:
+                    span.add_items(total_fetched)
+                    span.add_bytes_in(sum(r.get("bytes", 0) for r in self.zip_results))
+
+            if self.latency is not None:
+                try:
+                    self.latency.save()
+                except OSError:
+                    pass  # only costs the next run its adaptive timeouts
 
             # Check if we got any data
             if not self.all_data:
@@ -406,31 +719,47 @@ class PennyScraperCore:
                     "final_count": 0,
                     "cloudflare_block": cloudflare_block,
                     "zip_results": self.zip_results,
+                    "deferred_zips": self.deferred_zips,
                 }
 
-            # Convert to DataFrame and deduplicate
-            df = pd.DataFrame(self.all_data)
-            raw_count = len(df)
+            with self._stage("normalize") as span:
+                # Convert to DataFrame and deduplicate
+                df = pd.DataFrame(self.all_data)
+                raw_count = len(df)
 
-            # Dedup by store_sku and store_name
-            if "store_sku" in df.columns and "store_name" in df.columns:
-                df = df.drop_duplicates(subset=["store_sku", "store_name"])
+                # Dedup by store_sku and store_name
+                if "store_sku" in df.columns and "store_name" in df.columns:
+                    df = df.drop_duplicates(subset=["store_sku", "store_name"])
 
-            final_count = len(df)
+                final_count = len(df)
 
-            # Normalize
-            df = self._normalize_frame(df)
+                # Normalize
+                df = self._normalize_frame(df)
 
-            # Convert to list of dicts (structured data)
-            result = df.to_dict(orient="records")
+                # Convert to list of dicts (structured data)
+                result = df.to_dict(orient="records")
+                store_join = None
+                states = df["state"] if "state" in df.columns else None
+                if self.stores is not None:
+                    store_join = self.stores.attach(result).to_dict()
+                    states = pd.Series(
+                        [row["store_state"] for row in result], index=df.index
+                    )
+                sku_summaries = aggregate_by_sku(df, states)
+                if span is not None:
+                    span.add_items(len(result))
 
             return {
                 "ok": True,
                 "data": result,
+                "sku_summaries": sku_summaries,
                 "raw_count": raw_count,
                 "final_count": final_count,
+                "price_units": dict(self.price_units),
+                "store_join": store_join,
                 "cloudflare_block": False,
                 "zip_results": self.zip_results,
+                "deferred_zips": self.deferred_zips,
             }
 
         except Exception as e:
@@ -442,6 +771,7 @@ class PennyScraperCore:
                 "final_count": 0,
                 "cloudflare_block": False,
                 "zip_results": self.zip_results,
+                "deferred_zips": self.deferred_zips,
             }
 
 
@@ -450,6 +780,11 @@ def run_scrape(
     guild_id: str,
     zip_codes: Optional[List[str]] = None,
     api_url: Optional[str] = None,
+    metrics: Optional[Any] = None,
+    deadline: Optional[float] = None,
+    latency: Optional["ZipLatency"] = None,
+    hedge: bool = False,
+    stores: Optional["StoreJoinIndex"] = None,
 ) -> Dict[str, Any]:
     """
     Convenience function: single entry point for scraping.
@@ -459,6 +794,11 @@ def run_scrape(
         guild_id: Guild ID (from env or secret store)
         zip_codes: Optional list of zip codes (defaults to GA zips)
         api_url: Optional override for the upstream API endpoint (defaults to pro.scouterdev.io)
+        metrics: Optional run_metrics.RunMetrics to record scrape/normalize stages
+        deadline: Optional time.monotonic() timestamp; later zips are deferred
+        latency: Optional ZipLatency for adaptive per-zip timeouts
+        hedge: Hedge requests that outlive the zip's p95 (needs `latency`)
+        stores: Optional StoreJoinIndex; joins store metadata onto each row
 
     Returns:
         {
@@ -473,14 +813,43 @@ def run_scrape(
         guild_id=guild_id,
         zip_codes=zip_codes,
         api_url=api_url or "https://pro.scouterdev.io/api/penny-items",
+        metrics=metrics,
+        deadline=deadline,
+        latency=latency,
+        hedge=hedge,
+        stores=stores,
     )
-    return scraper.run()
+    try:
+        return scraper.run()
+    finally:
+        scraper.close()
 
 
 # Backward compat: allow direct execution with env vars
 if __name__ == "__main__":
+    import argparse
     import sys
 
+    from run_metrics import RunMetrics
+    from stage_profiler import (
+        DEFAULT_PROFILE_DIR,
+        StageProfiler,
+        profile_enabled_from_env,
+    )
+
+    parser = argparse.ArgumentParser(description="Run the penny-items scrape")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample-profile the scrape/normalize stages (or set PENNY_PROFILE=1)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=os.environ.get("PENNY_PROFILE_DIR"),
+        help="Profile output directory (default: .local/profiles)",
+    )
+    args = parser.parse_args()
+
     # Try to load from env
     cookie = os.environ.get("PENNY_RAW_COOKIE")
     guild = os.environ.get("PENNY_GUILD_ID")
@@ -490,8 +859,30 @@ if __name__ == "__main__":
         print("   Set them and try again, or pass as arguments to run_scrape()")
         sys.exit(1)
 
+    profiler = None
+    metrics = None
+    if args.profile or profile_enabled_from_env():
+        profiler = StageProfiler(args.profile_dir or DEFAULT_PROFILE_DIR)
+        profiler.start()
+        # Stages reach the profiler through the metrics spans, as in the warmer.
+        metrics = RunMetrics("scraper_core", profiler=profiler)
+
     # Run
-    result = run_scrape(raw_cookie=cookie, guild_id=guild)
+    result = run_scrape(raw_cookie=cookie, guild_id=guild, metrics=metrics)
+
+    if profiler:
+        profiler.stop()
+        metrics.finish()
+        out_dir = profiler.write()
+        # stdout carries the JSON result; keep the profile summary on stderr.
+        print(profiler.format_summary(), file=sys.stderr)
+        for stage in metrics.stages:
+            print(
+                f"  {stage.name}: {stage.wall_ms:.0f} ms wall, "
+                f"{stage.cpu_ms:.0f} ms CPU, {stage.items} items",
+                file=sys.stderr,
+            )
+        print(f"Profile written to {out_dir}", file=sys.stderr)
 
     # Output as JSON
     print(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,253 @@
+"""
+Compact SKU sets: sorted int64 arrays instead of Python sets of strings.
+
+Every valid SKU is 6 digits or 10 digits starting with 100/101 (see
+staging-warmer.py validate_sku), so it maps losslessly onto an int64:
+6-digit SKUs land in [0, 999999] and 10-digit SKUs in [1000000000, 1019999999],
+and the two ranges never overlap. Internet numbers are already integers.
+
+A set stores its keys in a sorted int64 array (8 bytes/key) plus a small
+buffer of recent adds (plain ints) that is merged in once it grows. Membership for a whole
+column is one np.searchsorted call (contains_many).
+
+Benchmark against set[str] / set[int]:
+    python extracted/sku_set.py --bench 500000
+"""
+
+import re
+import sys
+from typing import Any, Iterable, Iterator, Optional, Set
+
+import numpy as np
+
+# ASCII digits only, like the enrichment_staging CHECK constraint in practice:
+# non-ASCII decimal digits would otherwise collide with their ASCII twins.
+SKU_RE = re.compile(r"[0-9]{6}|10[01][0-9]{7}")
+INT64_MAX = np.iinfo(np.int64).max
+# Adds stay in a plain int set until this many accumulate, so a per-run dedup set
+# (max_uniques is a few thousand) never pays for a searchsorted on each probe.
+MERGE_MIN = 65_536
+
+
+def sku_to_code(sku: Any) -> int:
+    """Encode a (stripped) SKU string as an int key, or -1 when it is not a valid SKU."""
+    if not isinstance(sku, str) or not SKU_RE.fullmatch(sku):
+        return -1
+    return int(sku)
+
+
+def code_to_sku(code: int) -> str:
+    """Decode an int key back to its SKU string (6-digit SKUs keep leading zeros)."""
+    return f"{code:06d}" if code < 1_000_000 else str(code)
+
+
+def encode_skus(values: Iterable[Any]) -> np.ndarray:
+    """Encode a column of SKU strings into int64 codes (-1 marks invalid SKUs).
+
+    Same rules as sku_to_code, evaluated with numpy string ops over the whole column.
+    """
+    # Only 6- and 10-character strings can be SKUs; blanking the rest first caps
+    # the fixed-width array at 10 code points per row, whatever junk a row holds.
+    strs = [v if isinstance(v, str) and len(v) in (6, 10) else "" for v in values]
+    codes = np.full(len(strs), -1, dtype=np.int64)
+    if not strs:
+        return codes
+    arr = np.array(strs, dtype=str)
+    lengths = np.char.str_len(arr)
+    # Work on the UCS-4 code points directly (padding past each string is 0).
+    width = arr.dtype.itemsize // 4
+    points = arr.view(np.uint32).reshape(len(arr), max(width, 1))
+    ascii_digits = np.char.isdecimal(arr) & (points.max(axis=1) < 128)
+    valid = ascii_digits & (
+        (lengths == 6)
+        | (
+            (lengths == 10)
+            & (np.char.startswith(arr, "100") | np.char.startswith(arr, "101"))
+        )
+    )
+    if not valid.any():
+        return codes
+
+    for n_digits in (6, 10):
+        rows = np.flatnonzero(valid & (lengths == n_digits))
+        if len(rows) == 0:
+            continue
+        digits = points[rows, :n_digits].astype(np.int64) - 48
+        powers = 10 ** np.arange(n_digits - 1, -1, -1, dtype=np.int64)
+        codes[rows] = digits @ powers
+    return codes
+
+
+class SkuSet:
+    """Set of non-negative integer keys (SKU codes or internet numbers)."""
+
+    __slots__ = ("_sorted", "_pending", "_overflow", "_merge_at")
+
+    def __init__(self, codes: Optional[Iterable[int]] = None):
+        if codes is None:
+            arr = np.empty(0, dtype=np.int64)
+        elif isinstance(codes, np.ndarray):
+            arr = codes.astype(np.int64, copy=False)
+        else:
+            arr = np.asarray(list(codes), dtype=np.int64)
+        self._sorted = np.unique(arr[arr >= 0])
+        self._pending: Set[int] = set()
+        # Ints that do not fit in int64 (garbage upstream values); kept exact.
+        self._overflow: Set[int] = set()
+        self._merge_at = max(MERGE_MIN, len(self._sorted) // 8)
+
+    @classmethod
+    def from_skus(cls, skus: Iterable[Any]) -> "SkuSet":
+        """Build from SKU strings; invalid SKUs are dropped (they can never match)."""
+        return cls(encode_skus(skus))
+
+    @staticmethod
+    def _code(key: Any) -> int:
+        if isinstance(key, str):
+            return sku_to_code(key)
+        if isinstance(key, (int, np.integer)) and not isinstance(key, bool):
+            return int(key)
+        return -1
+
+    def _compact(self) -> None:
+        if self._pending:
+            pending = np.fromiter(
+                self._pending, dtype=np.int64, count=len(self._pending)
+            )
+            self._sorted = np.union1d(self._sorted, pending)
+            self._pending.clear()
+            self._merge_at = max(MERGE_MIN, len(self._sorted) // 8)
+
+    def add(self, key: Any) -> None:
+        code = self._code(key)
+        if code < 0:
+            return
+        if code > INT64_MAX:
+            self._overflow.add(code)
+            return
+        if code in self:
+            return
+        self._pending.add(code)
+        if len(self._pending) >= self._merge_at:
+            self._compact()
+
+    def __contains__(self, key: Any) -> bool:
+        code = self._code(key)
+        if code < 0:
+            return False
+        if code > INT64_MAX:
+            return code in self._overflow
+        if code in self._pending:
+            return True
+        arr = self._sorted
+        if len(arr) == 0:
+            return False
+        i = int(np.searchsorted(arr, code))
+        return i < len(arr) and int(arr[i]) == code
+
+    def contains_many(self, codes: np.ndarray) -> np.ndarray:
+        """Vectorized membership for an int64 code column (negative codes -> False)."""
+        self._compact()
+        codes = np.asarray(codes, dtype=np.int64)
+        arr = self._sorted
+        if len(arr) == 0:
+            return np.zeros(len(codes), dtype=bool)
+        idx = np.searchsorted(arr, codes)
+        np.minimum(idx, len(arr) - 1, out=idx)
+        return (arr[idx] == codes) & (codes >= 0)
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._pending) + len(self._overflow)
+
+    def __iter__(self) -> Iterator[int]:
+        self._compact()
+        yield from (int(c) for c in self._sorted)
+        yield from self._overflow
+
+    def codes(self) -> np.ndarray:
+        """All in-range keys as a sorted int64 array."""
+        self._compact()
+        return self._sorted
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory footprint (array + pending buffer)."""
+        return int(self._sorted.nbytes) + 64 * (
+            len(self._pending) + len(self._overflow)
+        )
+
+
+def benchmark(n: int = 500_000, probes: int = 200_000, seed: int = 7) -> dict:
+    """Compare retained memory and membership throughput of set[str] vs SkuSet."""
+    import time
+    import tracemalloc
+
+    rng = np.random.default_rng(seed)
+    six = rng.integers(0, 1_000_000, n // 2)
+    ten = rng.integers(1_000_000_000, 1_020_000_000, n - n // 2)
+    codes = np.concatenate([six, ten]).tolist()
+    probe_skus = [code_to_sku(int(c)) for c in rng.integers(0, 1_000_000, probes)]
+
+    # Both builds start from fresh strings (as rows come off the wire), so the
+    # set[str] figure includes the strings it keeps alive.
+    def build_str_set():
+        return {code_to_sku(c) for c in codes}
+
+    def build_sku_set():
+        return SkuSet.from_skus(code_to_sku(c) for c in codes)
+
+    def timed(build):
+        started = time.perf_counter()
+        obj = build()
+        return obj, time.perf_counter() - started
+
+    def retained_bytes(build):
+        tracemalloc.start()
+        obj = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del obj
+        return size
+
+    str_set, str_build_s = timed(build_str_set)
+    sku_set, sku_build_s = timed(build_sku_set)
+    str_bytes = retained_bytes(build_str_set)
+    sku_bytes = retained_bytes(build_sku_set)
+
+    started = time.perf_counter()
+    str_hits = sum(1 for s in probe_skus if s in str_set)
+    str_probe_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    probe_codes = encode_skus(probe_skus)
+    encode_s = time.perf_counter() - started
+    started = time.perf_counter()
+    sku_hits = int(sku_set.contains_many(probe_codes).sum())
+    batch_probe_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scalar_hits = sum(1 for s in probe_skus if s in sku_set)
+    scalar_probe_s = time.perf_counter() - started
+
+    assert str_hits == sku_hits == scalar_hits
+    return {
+        "keys": len(str_set),
+        "probes": probes,
+        "set_str_bytes_per_key": round(str_bytes / len(str_set), 1),
+        "skuset_bytes_per_key": round(sku_bytes / len(sku_set), 1),
+        "set_str_build_s": round(str_build_s, 4),
+        "skuset_build_s": round(sku_build_s, 4),
+        "set_str_probe_s": round(str_probe_s, 4),
+        "skuset_encode_probes_s": round(encode_s, 4),
+        "skuset_batch_probe_s": round(batch_probe_s, 4),
+        "skuset_scalar_probe_s": round(scalar_probe_s, 4),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bench":
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+        for key, value in benchmark(n).items():
+            print(f"{key}: {value}")
+    else:
+        print("Usage: python extracted/sku_set.py --bench [N]")
@@ -0,0 +1,202 @@
+"""
+Stage profiler: low-overhead sampling profiler keyed by pipeline stage.
+
+A background thread samples the main thread's stack every few milliseconds while
+a stage is open (no tracing hooks, so the scraped code runs at full speed).
+Output per run:
+    <out_dir>/<stage>.folded   collapsed stacks (flamegraph.pl, speedscope, inferno)
+    <out_dir>/all.folded       every stage, stage name as the root frame
+    <out_dir>/summary.txt      top-N hot functions per stage (self and inclusive)
+    <out_dir>/summary.json     same, machine-readable
+
+Usage:
+    profiler = StageProfiler(".local/profiles")
+    profiler.start()
+    with profiler.stage("scrape"):
+        ...
+    profiler.stop()
+    profiler.write()
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Frame = Tuple[str, str, int]  # (filename, function, first line)
+
+DEFAULT_PROFILE_DIR = os.path.join(".local", "profiles")
+
+
+def profile_enabled_from_env() -> bool:
+    """PENNY_PROFILE=1/true/yes turns profiling on without a CLI flag."""
+    return os.environ.get("PENNY_PROFILE", "").strip().lower() in (
+        "1",
+        "true",
+        "yes",
+        "on",
+    )
+
+
+def _frame_label(frame: Frame) -> str:
+    filename, func, line = frame
+    return f"{func} ({os.path.basename(filename)}:{line})"
+
+
+class StageProfiler:
+    """Sample the calling thread's stack and bucket samples by active stage."""
+
+    def __init__(
+        self,
+        out_dir: str = DEFAULT_PROFILE_DIR,
+        interval_ms: float = 5.0,
+        top_n: int = 25,
+    ):
+        self.out_dir = os.path.join(out_dir, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.interval_sec = max(interval_ms, 0.5) / 1000
+        self.top_n = top_n
+        self.samples: Dict[str, Counter] = defaultdict(Counter)
+        self._stage: Optional[str] = None
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling the current thread."""
+        if self._sampler is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._run, name="stage-profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join(timeout=1)
+        self._sampler = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Attribute samples taken inside this block to `name`."""
+        previous = self._stage
+        self._stage = name
+        try:
+            yield None
+        finally:
+            self._stage = previous
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            stage = self._stage
+            if stage is None:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            stack: List[Frame] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples[stage][tuple(stack)] += 1
+
+    def _stage_summary(self, stacks: Counter) -> Dict[str, Any]:
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in stacks.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+
+        n_samples = sum(stacks.values())
+
+        def top(counts: Counter) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "function": _frame_label(frame),
+                    "samples": count,
+                    "pct": round(100 * count / n_samples, 1) if n_samples else 0.0,
+                    "est_seconds": round(count * self.interval_sec, 3),
+                }
+                for frame, count in counts.most_common(self.top_n)
+            ]
+
+        return {
+            "samples": n_samples,
+            "est_seconds": round(n_samples * self.interval_sec, 3),
+            "top_self": top(self_counts),
+            "top_inclusive": top(total_counts),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": round(self.interval_sec * 1000, 2),
+            "stages": {
+                stage: self._stage_summary(stacks)
+                for stage, stacks in self.samples.items()
+            },
+        }
+
+    def write(self) -> Optional[str]:
+        """Write folded stacks and summaries. Returns the output directory."""
+        if not self.samples:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        all_lines: List[str] = []
+        for stage, stacks in self.samples.items():
+            lines = []
+            for stack, count in stacks.most_common():
+                folded = ";".join(_frame_label(f) for f in stack)
+                lines.append(f"{folded} {count}")
+                all_lines.append(f"{stage};{folded} {count}")
+            safe_stage = "".join(c if c.isalnum() or c in "-_" else "_" for c in stage)
+            with open(
+                os.path.join(self.out_dir, f"{safe_stage}.folded"),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                f.write("\n".join(lines) + "\n")
+
+        with open(os.path.join(self.out_dir, "all.folded"), "w", encoding="utf-8") as f:
+            f.write("\n".join(all_lines) + "\n")
+
+        summary = self.summary()
+        with open(
+            os.path.join(self.out_dir, "summary.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(summary, f, indent=2)
+        with open(
+            os.path.join(self.out_dir, "summary.txt"), "w", encoding="utf-8"
+        ) as f:
+            f.write(self.format_summary(summary))
+
+        return self.out_dir
+
+    def format_summary(self, summary: Optional[Dict[str, Any]] = None) -> str:
+        summary = summary or self.summary()
+        out = [f"Sampling interval: {summary['interval_ms']} ms"]
+        for stage, data in summary["stages"].items():
+            out.append("")
+            out.append(
+                f"== {stage}: {data['samples']} samples (~{data['est_seconds']}s) =="
+            )
+            out.append("  Top self time:")
+            for row in data["top_self"]:
+                out.append(
+                    f"    {row['pct']:5.1f}%  {row['samples']:6d}  {row['function']}"
+                )
+            out.append("  Top inclusive time:")
+            for row in data["top_inclusive"]:
+                out.append(
+                    f"    {row['pct']:5.1f}%  {row['samples']:6d}  {row['function']}"
+                )
+        return "\n".join(out) + "\n"
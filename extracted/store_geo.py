@@ -0,0 +1,519 @@
+"""
+Compiled, memory-mapped store directory with radius / nearest-N lookups.
+
+Consumers of data/home-depot-stores.json / data/stores/store_directory.master.json
+parse ~1 MB of JSON (2007 stores with nested hours) before they can answer
+"which stores are near this zip". build_directory() compiles either file into one
+binary file that StoreDirectory opens with mmap (no parsing; columns are
+memoryview casts over the map):
+
+    number   u32[n]        store number
+    lat/lng  f64[n]        coordinates
+    zip      u32[n]        5-digit zip as an integer (0 = unknown)
+    strings  u32[n + 1]    offsets into a UTF-8 string table; a store's
+                           STRING_FIELDS are joined with \\x1f
+    by_num   u32[n]        store indexes ordered by number (get())
+    cells    u32[cells+1]  grid index: stores are sorted by CELL_DEG x CELL_DEG
+                           cell, cells[c]..cells[c + 1] are cell c's stores
+    zips     u32[z] + f64[z] + f64[z]
+                           sorted distinct store zips and their centroids
+
+within() scans the grid cells overlapping the search box and keeps stores inside
+the radius (haversine); nearest() widens a ring of cells until it holds N stores
+and then runs within() on the N-th distance, so it is exact. A zip resolves to the
+centroid of the stores in it, else of the stores in its 3-digit prefix (there is
+no separate zip database).
+
+Usage:
+    python extracted/store_geo.py build       # -> .local/store-directory.bin
+    python extracted/store_geo.py near --zip 30121 --radius 25
+    python extracted/store_geo.py near --point 33.75,-84.39 --nearest 5
+    python extracted/store_geo.py --bench
+
+    stores = StoreDirectory.open(".local/store-directory.bin")
+    for hit in stores.within_zip("30121", miles=25):
+        print(hit.distance_miles, stores.record(hit.index)["store_name"])
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from atomic_file import atomic_open
+
+STORE_DIRECTORY_PATH = os.path.join("data", "stores", "store_directory.master.json")
+DEFAULT_PATH = os.path.join(".local", "store-directory.bin")
+STRING_FIELDS = (
+    "store_name",
+    "address",
+    "city",
+    "state",
+    "phone",
+    "hours_weekday",
+    "hours_weekend",
+)
+CELL_DEG = 0.5
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEG = EARTH_RADIUS_MILES * math.pi / 180
+
+MAGIC = b"HDSG"
+FORMAT_VERSION = 1
+SECTIONS = (
+    "number",
+    "lat",
+    "lng",
+    "zip",
+    "strings_index",
+    "by_number",
+    "cells",
+    "zips",
+    "zip_lat",
+    "zip_lng",
+    "strings",
+)
+# magic, version, stores, zips, grid rows, grid cols, lat0, lng0, cell_deg,
+# then one u32 offset per section
+HEADER = struct.Struct(f"<4sHxxIIIIddd{len(SECTIONS)}I")
+
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((p2 - p1) / 2) ** 2
+        + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _field(store: Dict[str, Any], *names: str) -> Any:
+    for name in names:
+        value = store.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _store_row(store: Dict[str, Any]) -> Optional[Tuple[int, float, float, int, str]]:
+    """(number, lat, lng, zip, joined strings) from either directory schema."""
+    try:
+        number = int(str(_field(store, "store_number", "number")).strip())
+        lat = float(_field(store, "latitude", "lat"))
+        lng = float(_field(store, "longitude", "lng"))
+    except (TypeError, ValueError):
+        return None
+    zip_text = str(store.get("zip") or "").strip()[:5]
+    hours = store.get("hours") if isinstance(store.get("hours"), dict) else {}
+    values = {
+        "store_name": _field(store, "store_name", "name"),
+        "hours_weekday": hours.get("weekday"),
+        "hours_weekend": hours.get("weekend"),
+    }
+    strings = "\x1f".join(
+        str(values.get(f, store.get(f)) or "").replace("\x1f", " ")
+        for f in STRING_FIELDS
+    )
+    return number, lat, lng, int(zip_text) if zip_text.isdigit() else 0, strings
+
+
+def build_directory(
+    stores: Iterable[Dict[str, Any]],
+    path: str = DEFAULT_PATH,
+    cell_deg: float = CELL_DEG,
+) -> int:
+    """Compile store records (either directory schema) to path; returns bytes."""
+    rows = [row for row in map(_store_row, stores) if row is not None]
+    if not rows:
+        raise ValueError("no stores with a number and coordinates")
+    lat0 = math.floor(min(r[1] for r in rows) / cell_deg) * cell_deg
+    lng0 = math.floor(min(r[2] for r in rows) / cell_deg) * cell_deg
+    n_rows = int((max(r[1] for r in rows) - lat0) // cell_deg) + 1
+    n_cols = int((max(r[2] for r in rows) - lng0) // cell_deg) + 1
+
+    def cell(row) -> int:
+        r = int((row[1] - lat0) // cell_deg)
+        c = int((row[2] - lng0) // cell_deg)
+        return r * n_cols + c
+
+    rows.sort(key=lambda row: (cell(row), row[0]))
+    cells = [0] * (n_rows * n_cols + 1)
+    for row in rows:
+        cells[cell(row) + 1] += 1
+    for i in range(1, len(cells)):
+        cells[i] += cells[i - 1]
+
+    strings = bytearray()
+    strings_index = [0]
+    for row in rows:
+        strings += row[4].encode("utf-8")
+        strings_index.append(len(strings))
+
+    by_zip: Dict[int, List[Tuple[float, float]]] = {}
+    for row in rows:
+        if row[3]:
+            by_zip.setdefault(row[3], []).append((row[1], row[2]))
+    zips = sorted(by_zip)
+
+    n = len(rows)
+    sections = {
+        "number": struct.pack(f"<{n}I", *(r[0] for r in rows)),
+        "lat": struct.pack(f"<{n}d", *(r[1] for r in rows)),
+        "lng": struct.pack(f"<{n}d", *(r[2] for r in rows)),
+        "zip": struct.pack(f"<{n}I", *(r[3] for r in rows)),
+        "strings_index": struct.pack(f"<{n + 1}I", *strings_index),
+        "by_number": struct.pack(f"<{n}I", *sorted(range(n), key=lambda i: rows[i][0])),
+        "cells": struct.pack(f"<{len(cells)}I", *cells),
+        "zips": struct.pack(f"<{len(zips)}I", *zips),
+        "zip_lat": struct.pack(
+            f"<{len(zips)}d",
+            *(sum(p[0] for p in by_zip[z]) / len(by_zip[z]) for z in zips),
+        ),
+        "zip_lng": struct.pack(
+            f"<{len(zips)}d",
+            *(sum(p[1] for p in by_zip[z]) / len(by_zip[z]) for z in zips),
+        ),
+        "strings": bytes(strings),
+    }
+    offsets = []
+    position = HEADER.size
+    for name in SECTIONS:
+        position += -position % 8  # keep f64 columns aligned
+        offsets.append(position)
+        position += len(sections[name])
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        n,
+        len(zips),
+        n_rows,
+        n_cols,
+        lat0,
+        lng0,
+        cell_deg,
+        *offsets,
+    )
+
+    with atomic_open(path, "wb") as f:
+        f.write(header)
+        for name, offset in zip(SECTIONS, offsets, strict=True):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(sections[name])
+        size = f.tell()
+    return size
+
+
+class StoreHit(NamedTuple):
+    index: int  # pass to record() / number
+    store_number: int
+    distance_miles: float
+
+
+class StoreDirectory:
+    """Read-only view of a build_directory() file."""
+
+    def __init__(self, buffer):
+        self._buf = buffer
+        fields = HEADER.unpack_from(buffer, 0)
+        magic, version, self.n, self.n_zips, self.rows, self.cols = fields[:6]
+        self.lat0, self.lng0, self.cell_deg = fields[6:9]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(
+                "not a compiled store directory (or an older one); rebuild"
+            )
+        offsets = dict(zip(SECTIONS, fields[9:], strict=True))
+        view = memoryview(buffer)
+        n, z = self.n, self.n_zips
+
+        def column(name: str, fmt: str, count: int):
+            start = offsets[name]
+            size = struct.calcsize(fmt) * count
+            return view[start : start + size].cast(fmt)
+
+        self.number = column("number", "I", n)
+        self.lat = column("lat", "d", n)
+        self.lng = column("lng", "d", n)
+        self.zip = column("zip", "I", n)
+        self._strings_index = column("strings_index", "I", n + 1)
+        self._by_number = column("by_number", "I", n)
+        self._cells = column("cells", "I", self.rows * self.cols + 1)
+        self._zips = column("zips", "I", z)
+        self._zip_lat = column("zip_lat", "d", z)
+        self._zip_lng = column("zip_lng", "d", z)
+        self._strings = view[offsets["strings"] :]
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_PATH) -> "StoreDirectory":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self.n
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """The store as a store_directory.master.json record."""
+        start, end = self._strings_index[index], self._strings_index[index + 1]
+        values = dict(
+            zip(
+                STRING_FIELDS,
+                bytes(self._strings[start:end]).decode("utf-8").split("\x1f"),
+                strict=True,
+            )
+        )
+        zip_code = self.zip[index]
+        return {
+            "store_number": str(self.number[index]),
+            "store_name": values["store_name"],
+            "address": values["address"],
+            "city": values["city"],
+            "state": values["state"],
+            "zip": f"{zip_code:05d}" if zip_code else "",
+            "latitude": self.lat[index],
+            "longitude": self.lng[index],
+            "phone": values["phone"],
+            "hours": {
+                key: values[f"hours_{key}"]
+                for key in ("weekday", "weekend")
+                if values[f"hours_{key}"]
+            },
+        }
+
+    def get(self, store_number: Any) -> Optional[int]:
+        """Index of a store by number, or None."""
+        try:
+            number = int(str(store_number).strip())
+        except ValueError:
+            return None
+        by_number, numbers = self._by_number, self.number
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if numbers[by_number[mid]] < number:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n and numbers[by_number[lo]] == number:
+            return by_number[lo]
+        return None
+
+    def zip_point(self, zip_code: Any) -> Optional[Tuple[float, float]]:
+        """Centroid of the stores in zip_code, else in its 3-digit prefix."""
+        text = str(zip_code).strip()[:5]
+        if not text.isdigit():
+            return None
+        value = int(text)
+        zips = self._zips
+        i = bisect_left(zips, value)
+        if i < self.n_zips and zips[i] == value:
+            return self._zip_lat[i], self._zip_lng[i]
+        prefix = int(text[:3]) * 100
+        lo, hi = bisect_left(zips, prefix), bisect_right(zips, prefix + 99)
+        if lo == hi:
+            return None
+        count = hi - lo
+        lat = sum(self._zip_lat[lo:hi]) / count
+        lng = sum(self._zip_lng[lo:hi]) / count
+        return lat, lng
+
+    def _cell_range(self, lat: float, lng: float, miles: float):
+        """Grid rows/cols overlapping the box around (lat, lng) + miles."""
+        dlat = miles / MILES_PER_DEG
+        extreme = min(89.9, max(abs(lat - dlat), abs(lat + dlat)))
+        dlng = miles / (MILES_PER_DEG * math.cos(math.radians(extreme)))
+        r0 = max(0, int((lat - dlat - self.lat0) // self.cell_deg))
+        r1 = min(self.rows - 1, int((lat + dlat - self.lat0) // self.cell_deg))
+        if dlng >= 180:
+            c0, c1 = 0, self.cols - 1
+        else:
+            c0 = max(0, int((lng - dlng - self.lng0) // self.cell_deg))
+            c1 = min(self.cols - 1, int((lng + dlng - self.lng0) // self.cell_deg))
+        return r0, r1, c0, c1
+
+    def _scan(self, lat: float, lng: float, r0: int, r1: int, c0: int, c1: int):
+        cells, lats, lngs = self._cells, self.lat, self.lng
+        cos_lat = math.cos(math.radians(lat))
+        rlat, rlng = math.radians(lat), math.radians(lng)
+        for r in range(r0, r1 + 1):
+            base = r * self.cols
+            for i in range(cells[base + c0], cells[base + c1 + 1]):
+                p2 = math.radians(lats[i])
+                a = (
+                    math.sin((p2 - rlat) / 2) ** 2
+                    + cos_lat
+                    * math.cos(p2)
+                    * math.sin((math.radians(lngs[i]) - rlng) / 2) ** 2
+                )
+                yield i, 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+    def within(self, lat: float, lng: float, miles: float) -> List[StoreHit]:
+        """Stores within `miles` of (lat, lng), nearest first."""
+        if self.rows == 0 or miles < 0:
+            return []
+        hits = [
+            StoreHit(i, self.number[i], d)
+            for i, d in self._scan(lat, lng, *self._cell_range(lat, lng, miles))
+            if d <= miles
+        ]
+        hits.sort(key=lambda hit: (hit.distance_miles, hit.store_number))
+        return hits
+
+    def nearest(self, lat: float, lng: float, count: int = 10) -> List[StoreHit]:
+        """The `count` stores nearest to (lat, lng), nearest first."""
+        count = min(count, self.n)
+        if count <= 0:
+            return []
+        row = min(max(int((lat - self.lat0) // self.cell_deg), 0), self.rows - 1)
+        col = min(max(int((lng - self.lng0) // self.cell_deg), 0), self.cols - 1)
+        ring = 0
+        while True:
+            r0, r1 = max(0, row - ring), min(self.rows - 1, row + ring)
+            c0, c1 = max(0, col - ring), min(self.cols - 1, col + ring)
+            if (
+                self._cells[r1 * self.cols + c1 + 1] - self._cells[r0 * self.cols + c0]
+                >= count
+            ):
+                found = sorted(d for _i, d in self._scan(lat, lng, r0, r1, c0, c1))
+                if len(found) >= count:
+                    break
+            if r0 == 0 and c0 == 0 and r1 == self.rows - 1 and c1 == self.cols - 1:
+                found = sorted(d for _i, d in self._scan(lat, lng, r0, r1, c0, c1))
+                break
+            ring += 1
+        # The ring's count-th distance bounds the answer; within() is exact.
+        return self.within(lat, lng, found[count - 1] + 1e-9)[:count]
+
+    def within_zip(self, zip_code: Any, miles: float) -> List[StoreHit]:
+        point = self.zip_point(zip_code)
+        return [] if point is None else self.within(*point, miles)
+
+    def nearest_zip(self, zip_code: Any, count: int = 10) -> List[StoreHit]:
+        point = self.zip_point(zip_code)
+        return [] if point is None else self.nearest(*point, count)
+
+
+def load_store_directory(path: str = STORE_DIRECTORY_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        stores = json.load(f)
+    if not isinstance(stores, list):
+        raise ValueError(f"{path}: expected a JSON array of stores")
+    return stores
+
+
+def _bench(source: str = STORE_DIRECTORY_PATH, queries: int = 2_000) -> None:
+    import random
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stores.bin")
+        t0 = time.perf_counter()
+        stores = load_store_directory(source)
+        t1 = time.perf_counter()
+        size = build_directory(stores, path)
+        t2 = time.perf_counter()
+        directory = StoreDirectory.open(path)
+        t3 = time.perf_counter()
+        print(f"{len(directory)} stores, {size} bytes compiled")
+        print(f"  json.load:  {(t1 - t0) * 1000:8.2f} ms")
+        print(f"  build:      {(t2 - t1) * 1000:8.2f} ms")
+        print(f"  open:       {(t3 - t2) * 1000:8.3f} ms")
+
+        rng = random.Random(0)
+        points = [
+            (
+                float(s["latitude"]) + rng.uniform(-0.3, 0.3),
+                float(s["longitude"]) + rng.uniform(-0.3, 0.3),
+            )
+            for s in rng.choices(stores, k=queries)
+        ]
+
+        def linear(lat, lng, miles):
+            return sorted(
+                (d, int(s["store_number"]))
+                for s in stores
+                if (d := haversine_miles(lat, lng, s["latitude"], s["longitude"]))
+                <= miles
+            )
+
+        for label, run in (
+            ("within 25 mi", lambda p: directory.within(*p, 25)),
+            ("within 100 mi", lambda p: directory.within(*p, 100)),
+            ("nearest 10", lambda p: directory.nearest(*p, 10)),
+        ):
+            times = []
+            for p in points:
+                t0 = time.perf_counter()
+                run(p)
+                times.append(time.perf_counter() - t0)
+            times.sort()
+            print(
+                f"  {label:14s} p50 {times[len(times) // 2] * 1e6:7.1f} us  "
+                f"p99 {times[int(len(times) * 0.99)] * 1e6:7.1f} us"
+            )
+        t0 = time.perf_counter()
+        for p in points[:100]:
+            assert [
+                (round(h.distance_miles, 9), h.store_number)
+                for h in directory.within(*p, 25)
+            ] == [(round(d, 9), n) for d, n in linear(*p, 25)]
+        print(f"  linear scan    {(time.perf_counter() - t0) * 1e4:7.1f} us / query")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bench":
+        _bench(*sys.argv[2:3])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Compiled store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="compile a store directory JSON file")
+    build.add_argument("--stores", default=STORE_DIRECTORY_PATH)
+    build.add_argument("--out", default=DEFAULT_PATH)
+    near = sub.add_parser("near", help="stores near a zip or point")
+    near.add_argument("--path", default=DEFAULT_PATH)
+    where = near.add_mutually_exclusive_group(required=True)
+    where.add_argument("--zip")
+    where.add_argument("--point", help="lat,lng")
+    near.add_argument("--radius", type=float, help="miles")
+    near.add_argument("--nearest", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            size = build_directory(load_store_directory(args.stores), args.out)
+        except (OSError, ValueError) as exc:
+            print(f"❌ {exc}")
+            sys.exit(1)
+        print(
+            f"✅ {len(StoreDirectory.open(args.out))} stores -> {args.out} ({size} bytes)"
+        )
+        sys.exit(0)
+
+    try:
+        directory = StoreDirectory.open(args.path)
+    except (OSError, ValueError) as exc:
+        print(f"❌ {exc} (run: python extracted/store_geo.py build)")
+        sys.exit(1)
+    if args.zip:
+        point = directory.zip_point(args.zip)
+        if point is None:
+            print(f"❌ no stores near zip {args.zip}")
+            sys.exit(1)
+    else:
+        point = tuple(float(v) for v in args.point.split(","))
+    hits = (
+        directory.within(*point, args.radius)
+        if args.radius is not None
+        else directory.nearest(*point, args.nearest)
+    )
+    for hit in hits:
+        store = directory.record(hit.index)
+        print(
+            f"{hit.distance_miles:7.1f} mi  #{store['store_number']:<5} "
+            f"{store['store_name']} ({store['city']}, {store['state']} {store['zip']})"
+        )
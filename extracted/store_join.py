@@ -0,0 +1,415 @@
+"""
+Store-name -> store-directory join index for scraped items.
+
+Scraped rows carry only "store_name" (half of run()'s dedup key). This index
+links them to data/stores/store_directory.master.json: store number, state,
+city, zip and lat/lng, in O(1) per row.
+
+Keys are normalized once, at build time:
+    normalize_store_name("The Home Depot - Smyrna")   -> "smyrna"
+    a "#0121" (or an all-digit name)                 -> store number 121
+    a trailing ", GA"                                -> state hint
+
+and written to a compact binary file (an open-addressing hash table, fixed-width
+store records and a string table) that is memory-mapped, not parsed, on load.
+
+A name shared by several stores (111 of 2007 in the directory, e.g. "Auburn") is
+ambiguous. lookup() narrows it with the state hint and then the source zip's
+3-digit prefix; a name that is still ambiguous is not joined and is reported
+(StoreJoinIndex.ambiguous_names() lists them all at build time).
+
+Usage:
+    python extracted/store_join.py build        # -> .local/store-join.idx
+    python extracted/store_join.py lookup "Smyrna, GA"
+
+    index = StoreJoinIndex.open(".local/store-join.idx")
+    report = index.attach(result["data"])      # adds store_* fields in place
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from atomic_file import atomic_open
+
+STORE_DIRECTORY_PATH = os.path.join("data", "stores", "store_directory.master.json")
+DEFAULT_INDEX_PATH = os.path.join(".local", "store-join.idx")
+# Fields attach() adds to each row
+JOIN_FIELDS = (
+    "store_number",
+    "store_state",
+    "store_city",
+    "store_zip",
+    "store_lat",
+    "store_lng",
+)
+
+MAGIC = b"HDSJ"
+INDEX_VERSION = 1
+# magic, version, n_stores, n_slots, records_off, slots_off, lists_off, strings_off
+HEADER = struct.Struct("<4sHxxIIIIII")
+# number, lat, lng, zip, state, name (offset, length), city (offset, length)
+RECORD = struct.Struct("<Idd5s2sxIHIH")
+# key hash, key (offset, length), candidate count, record index or list offset
+SLOT = struct.Struct("<QIHHI")
+U32 = struct.Struct("<I")
+
+_BRAND_RE = re.compile(r"\b(?:the\s+)?home\s*depot\b(?:\s*,?\s*inc\b\.?)?", re.I)
+_NUMBER_RE = re.compile(r"#\s*(\d{1,5})\b")
+_STATE_SUFFIX_RE = re.compile(r",\s*([A-Za-z]{2})\s*$")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_store_name(name: Any) -> str:
+    """Lowercase alphanumeric words, '&' as 'and', without the Home Depot brand."""
+    text = _BRAND_RE.sub(" ", str(name or "")).lower().replace("&", " and ")
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+
+def parse_store_name(value: Any) -> Tuple[str, Optional[int], Optional[str]]:
+    """Split a raw store name into (normalized name, store number, state hint)."""
+    text = str(value or "").strip()
+    state = None
+    match = _STATE_SUFFIX_RE.search(text)
+    if match:
+        state = match.group(1).upper()
+        text = text[: match.start()]
+    number = None
+    match = _NUMBER_RE.search(text)
+    if match:
+        number = int(match.group(1))
+        text = text[: match.start()] + text[match.end() :]
+    name = normalize_store_name(text)
+    if number is None and name.isdigit():
+        number = int(name)
+    return name, number, state
+
+
+def _key_hash(key: str) -> int:
+    # Stable across processes (unlike hash()); 0 marks an empty slot
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+def _number_key(number: int) -> str:
+    return f"#{number}"
+
+
+def _name_key(name: str, state: Optional[str] = None) -> str:
+    return f"n:{name}|{state}" if state else f"n:{name}"
+
+
+class StoreMatch(NamedTuple):
+    store_number: str
+    state: str
+    city: str
+    zip: str
+    lat: float
+    lng: float
+    name: str
+
+
+class JoinReport(NamedTuple):
+    matched: int
+    unmatched: Dict[str, int]  # store name -> rows
+    ambiguous: Dict[str, List[str]]  # store name -> candidate store numbers
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def build_index(
+    stores: Iterable[Dict[str, Any]], path: str = DEFAULT_INDEX_PATH
+) -> int:
+    """Compile store directory records into the binary join index; returns bytes."""
+    strings = bytearray()
+    string_offsets: Dict[str, Tuple[int, int]] = {}
+
+    def intern(text: str) -> Tuple[int, int]:
+        ref = string_offsets.get(text)
+        if ref is None:
+            data = text.encode("utf-8")[:0xFFFF]
+            ref = string_offsets[text] = (len(strings), len(data))
+            strings.extend(data)
+        return ref
+
+    records = bytearray()
+    keys: Dict[str, List[int]] = {}
+    count = 0
+    for store in stores:
+        try:
+            number = int(str(store["store_number"]).strip())
+        except (KeyError, TypeError, ValueError):
+            continue
+        state = str(store.get("state") or "").strip().upper()[:2]
+        raw_name = str(store.get("store_name") or "")
+        name_ref = intern(raw_name)
+        city_ref = intern(str(store.get("city") or ""))
+        records += RECORD.pack(
+            number,
+            float(store.get("latitude") or 0.0),
+            float(store.get("longitude") or 0.0),
+            str(store.get("zip") or "").strip()[:5].encode("ascii", "replace"),
+            state.encode("ascii", "replace"),
+            *name_ref,
+            *city_ref,
+        )
+        name = normalize_store_name(raw_name)
+        store_keys = {_number_key(number)}
+        if name:
+            store_keys.update((_name_key(name), _name_key(name, state)))
+        for key in store_keys:
+            keys.setdefault(key, []).append(count)
+        count += 1
+
+    n_slots = 1
+    while n_slots < 2 * max(len(keys), 1):
+        n_slots *= 2
+    slots: List[Optional[Tuple[int, str, List[int]]]] = [None] * n_slots
+    for key, indexes in keys.items():
+        h = _key_hash(key)
+        i = h & (n_slots - 1)
+        while slots[i] is not None:
+            i = (i + 1) & (n_slots - 1)
+        slots[i] = (h, key, indexes)
+
+    lists = bytearray()
+    slot_bytes = bytearray()
+    for slot in slots:
+        if slot is None:
+            slot_bytes += SLOT.pack(0, 0, 0, 0, 0)
+            continue
+        h, key, indexes = slot
+        if len(indexes) == 1:
+            target = indexes[0]
+        else:
+            target = len(lists) // U32.size
+            for index in indexes:
+                lists += U32.pack(index)
+        slot_bytes += SLOT.pack(h, *intern(key), min(len(indexes), 0xFFFF), target)
+
+    records_off = HEADER.size
+    slots_off = records_off + len(records)
+    lists_off = slots_off + len(slot_bytes)
+    strings_off = lists_off + len(lists)
+    header = HEADER.pack(
+        MAGIC,
+        INDEX_VERSION,
+        count,
+        n_slots,
+        records_off,
+        slots_off,
+        lists_off,
+        strings_off,
+    )
+    with atomic_open(path, "wb") as f:
+        for part in (header, records, slot_bytes, lists, strings):
+            f.write(part)
+    return strings_off + len(strings)
+
+
+class StoreJoinIndex:
+    """Read-only, memory-mapped view of a build_index() file."""
+
+    def __init__(self, buffer):
+        self._buf = buffer
+        (
+            magic,
+            version,
+            self.n_stores,
+            self.n_slots,
+            self._records_off,
+            self._slots_off,
+            self._lists_off,
+            self._strings_off,
+        ) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != INDEX_VERSION:
+            raise ValueError("not a store join index (or an older version); rebuild it")
+        self._cache: Dict[Tuple[Any, Any], Tuple[Optional[StoreMatch], List[str]]] = {}
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_INDEX_PATH) -> "StoreJoinIndex":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self.n_stores
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_off + offset
+        return bytes(self._buf[start : start + length]).decode("utf-8")
+
+    def _record(self, index: int) -> StoreMatch:
+        number, lat, lng, zip_code, state, name_off, name_len, city_off, city_len = (
+            RECORD.unpack_from(self._buf, self._records_off + index * RECORD.size)
+        )
+        return StoreMatch(
+            store_number=str(number),
+            state=state.decode("ascii"),
+            city=self._string(city_off, city_len),
+            zip=zip_code.decode("ascii"),
+            lat=lat,
+            lng=lng,
+            name=self._string(name_off, name_len),
+        )
+
+    def _candidates(self, key: str) -> List[int]:
+        h = _key_hash(key)
+        mask = self.n_slots - 1
+        i = h & mask
+        while True:
+            slot_h, key_off, key_len, count, target = SLOT.unpack_from(
+                self._buf, self._slots_off + i * SLOT.size
+            )
+            if slot_h == 0:
+                return []
+            if slot_h == h and self._string(key_off, key_len) == key:
+                if count == 1:
+                    return [target]
+                start = self._lists_off + target * U32.size
+                return list(struct.unpack_from(f"<{count}I", self._buf, start))
+            i = (i + 1) & mask
+
+    def resolve(
+        self, store_name: Any, zip_hint: Any = None
+    ) -> Tuple[Optional[StoreMatch], List[str]]:
+        """
+        (match, []) for a unique store, (None, candidate store numbers) for an
+        ambiguous name, (None, []) for an unknown one. Memoized per
+        (name, zip prefix).
+        """
+        prefix = str(zip_hint or "").strip()[:3]
+        cache_key = (store_name, prefix)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        name, number, state = parse_store_name(store_name)
+        candidates: List[int] = []
+        if number is not None:
+            candidates = self._candidates(_number_key(number))
+        if not candidates and name:
+            candidates = self._candidates(
+                _name_key(name, state) if state else _name_key(name)
+            )
+        matches = [self._record(i) for i in candidates]
+        if len(matches) > 1 and prefix:
+            local = [m for m in matches if m.zip.startswith(prefix)]
+            matches = local or matches
+        if len(matches) == 1:
+            result = (matches[0], [])
+        else:
+            result = (None, sorted(m.store_number for m in matches))
+        self._cache[cache_key] = result
+        return result
+
+    def lookup(self, store_name: Any, zip_hint: Any = None) -> Optional[StoreMatch]:
+        return self.resolve(store_name, zip_hint)[0]
+
+    def attach(
+        self,
+        rows: List[Dict[str, Any]],
+        name_field: str = "store_name",
+        zip_field: str = "source_zip",
+    ) -> JoinReport:
+        """Add JOIN_FIELDS to each row in place (None when not joined)."""
+        matched = 0
+        unmatched: Dict[str, int] = {}
+        ambiguous: Dict[str, List[str]] = {}
+        for row in rows:
+            raw = row.get(name_field)
+            match, candidates = self.resolve(raw, row.get(zip_field))
+            if match is None:
+                row.update(dict.fromkeys(JOIN_FIELDS))
+                label = str(raw)
+                if candidates:
+                    ambiguous[label] = candidates
+                else:
+                    unmatched[label] = unmatched.get(label, 0) + 1
+                continue
+            matched += 1
+            row["store_number"] = match.store_number
+            row["store_state"] = match.state
+            row["store_city"] = match.city
+            row["store_zip"] = match.zip
+            row["store_lat"] = match.lat
+            row["store_lng"] = match.lng
+        return JoinReport(matched, unmatched, ambiguous)
+
+    def ambiguous_names(self) -> Dict[str, List[str]]:
+        """Every normalized store name that several stores share."""
+        names: Dict[str, List[str]] = {}
+        for i in range(self.n_slots):
+            _h, key_off, key_len, count, target = SLOT.unpack_from(
+                self._buf, self._slots_off + i * SLOT.size
+            )
+            if count < 2:
+                continue
+            key = self._string(key_off, key_len)
+            if key.startswith("n:") and "|" not in key:
+                start = self._lists_off + target * U32.size
+                indexes = struct.unpack_from(f"<{count}I", self._buf, start)
+                names[key[2:]] = sorted(
+                    f"{self._record(j).store_number} ({self._record(j).state})"
+                    for j in indexes
+                )
+        return dict(sorted(names.items()))
+
+
+def load_store_directory(path: str = STORE_DIRECTORY_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        stores = json.load(f)
+    if not isinstance(stores, list):
+        raise ValueError(f"{path}: expected a JSON array of stores")
+    return stores
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Store-name join index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="compile the store directory")
+    build.add_argument("--stores", default=STORE_DIRECTORY_PATH)
+    build.add_argument("--out", default=DEFAULT_INDEX_PATH)
+    build.add_argument(
+        "--list-ambiguous", action="store_true", help="print every ambiguous name"
+    )
+    lookup = sub.add_parser("lookup", help="resolve store names")
+    lookup.add_argument("names", nargs="+")
+    lookup.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    lookup.add_argument("--zip", help="source zip (disambiguates shared names)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            size = build_index(load_store_directory(args.stores), args.out)
+        except (OSError, ValueError) as exc:
+            print(f"❌ {exc}")
+            sys.exit(1)
+        index = StoreJoinIndex.open(args.out)
+        ambiguous = index.ambiguous_names()
+        print(f"✅ {len(index)} stores -> {args.out} ({size} bytes)")
+        print(f"   ⚠️  {len(ambiguous)} ambiguous names (need a state or zip hint)")
+        if args.list_ambiguous:
+            for name, stores in ambiguous.items():
+                print(f"   {name}: {', '.join(stores)}")
+    else:
+        try:
+            index = StoreJoinIndex.open(args.index)
+        except (OSError, ValueError) as exc:
+            print(f"❌ {exc} (run: python extracted/store_join.py build)")
+            sys.exit(1)
+        for name in args.names:
+            match, candidates = index.resolve(name, args.zip)
+            if match is not None:
+                print(f"{name}: #{match.store_number} {match.city}, {match.state}")
+            elif candidates:
+                print(f"{name}: ambiguous ({', '.join(candidates)})")
+            else:
+                print(f"{name}: no match")
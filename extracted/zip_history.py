@@ -0,0 +1,271 @@
+"""
+Per-zip history for the staging warmer, persisted between runs.
+
+One JSON object per zip code, e.g.
+    {"30301": {"runs": 12, "yield_ewma": 41.3, "last_new_skus": 38,
+               "last_items": 512, "last_scraped_at": "2026-10-19T09:00:00+00:00"}}
+
+"Yield" is the number of valid SKUs a zip returned that were not already fully
+enriched in the Penny List, i.e. what scraping it is worth to the warmer. The
+average is exponentially weighted so a zip that dried up sinks within a few runs.
+
+"Fresh drops" are distinct SKUs with days_old <= FRESH_DAYS. Each scrape sees the
+drops of the last FRESH_DAYS + 1 days, so fresh_ewma / FRESH_WINDOW_HOURS estimates
+a zip's drop rate per hour without tracking SKUs between visits. revisit_interval()
+scales the interval by 1/sqrt(rate), which for a fixed number of requests minimizes
+the average time a drop waits to be seen (clamped to [MIN_INTERVAL_SEC,
+MAX_INTERVAL_SEC]): hot zips are polled often, dead ones rarely.
+
+Usage:
+    history = ZipHistory.load(".local/staging-warmer-zips.json")
+    zips = history.prioritize(zips)
+    due = history.due_zips(zips, history.revisit_interval)
+    history.record_yield("30301", new_skus=38, items=512, fresh_drops=6)
+    history.save()
+
+Compare fixed vs adaptive revisits on synthetic zips:
+    python extracted/zip_history.py --simulate
+"""
+
+import json
+import math
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from atomic_file import atomic_open, file_lock
+
+DEFAULT_ZIP_HISTORY_PATH = os.path.join(".local", "staging-warmer-zips.json")
+YIELD_ALPHA = 0.3
+
+FRESH_DAYS = 2  # an item with days_old <= FRESH_DAYS is a fresh drop
+FRESH_WINDOW_HOURS = (FRESH_DAYS + 1) * 24  # days_old is whole days, so 0..2 is 3 days
+DEFAULT_INTERVAL_SEC = 3600.0  # zips with no freshness history yet
+REFERENCE_DROPS_PER_HOUR = 1.0  # a zip at this rate is revisited every default_sec
+MIN_INTERVAL_SEC = 900.0
+MAX_INTERVAL_SEC = 86400.0
+
+
+class ZipHistory:
+    """Per-zip counters keyed by zip code."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_ZIP_HISTORY_PATH):
+        self.path = path
+        self.zips: Dict[str, Dict[str, Any]] = {}
+        # record_yield() calls since the last save, replayed onto the file's contents.
+        self._unsaved: List[Tuple[str, int, int, datetime, Optional[int]]] = []
+
+    @classmethod
+    def load(cls, path: Optional[str] = DEFAULT_ZIP_HISTORY_PATH) -> "ZipHistory":
+        """Read the history file; a missing or unreadable file starts empty."""
+        history = cls(path)
+        if not path:
+            return history
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return history
+        if isinstance(data, dict):
+            history.zips = {
+                str(zip_code): entry
+                for zip_code, entry in data.items()
+                if isinstance(entry, dict)
+            }
+        return history
+
+    def entry(self, zip_code: str) -> Dict[str, Any]:
+        return self.zips.setdefault(zip_code, {"runs": 0})
+
+    def expected_yield(self, zip_code: str) -> Optional[float]:
+        entry = self.zips.get(zip_code)
+        if not entry or entry.get("yield_ewma") is None:
+            return None
+        return float(entry["yield_ewma"])
+
+    def drop_rate(self, zip_code: str) -> Optional[float]:
+        """Estimated fresh drops per hour, or None before the first recorded scrape."""
+        entry = self.zips.get(zip_code)
+        if not entry or entry.get("fresh_ewma") is None:
+            return None
+        return float(entry["fresh_ewma"]) / FRESH_WINDOW_HOURS
+
+    def last_scraped_at(self, zip_code: str) -> Optional[datetime]:
+        entry = self.zips.get(zip_code)
+        try:
+            return datetime.fromisoformat(entry["last_scraped_at"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def record_yield(
+        self,
+        zip_code: str,
+        new_skus: int,
+        items: int,
+        at: Optional[datetime] = None,
+        fresh_drops: Optional[int] = None,
+    ) -> None:
+        """Fold one scrape of `zip_code` into its history."""
+        at = at or datetime.now(timezone.utc)
+        if self.path:
+            self._unsaved.append((zip_code, new_skus, items, at, fresh_drops))
+        entry = self.entry(zip_code)
+        entry["yield_ewma"] = _ewma(entry.get("yield_ewma"), new_skus)
+        if fresh_drops is not None:
+            entry["fresh_ewma"] = _ewma(entry.get("fresh_ewma"), fresh_drops)
+            entry["last_fresh_drops"] = int(fresh_drops)
+        entry["runs"] = int(entry.get("runs") or 0) + 1
+        entry["last_new_skus"] = int(new_skus)
+        entry["last_items"] = int(items)
+        entry["last_scraped_at"] = at.isoformat()
+
+    def revisit_interval(
+        self,
+        zip_code: str,
+        default_sec: float = DEFAULT_INTERVAL_SEC,
+        min_sec: float = MIN_INTERVAL_SEC,
+        max_sec: float = MAX_INTERVAL_SEC,
+    ) -> float:
+        """
+        Seconds between scrapes of `zip_code`, from its fresh-drop rate.
+
+        default_sec * sqrt(REFERENCE_DROPS_PER_HOUR / rate): four times the drops
+        means twice as often. A zip with no fresh drops at all backs off to
+        max_sec. No history yet -> default_sec.
+        """
+        rate = self.drop_rate(zip_code)
+        if rate is None:
+            return default_sec
+        if rate <= 0:
+            return max_sec
+        interval = default_sec * math.sqrt(REFERENCE_DROPS_PER_HOUR / rate)
+        return min(max_sec, max(min_sec, interval))
+
+    def seconds_until_due(
+        self, zip_code: str, interval_sec: float, now: Optional[datetime] = None
+    ) -> float:
+        """0 when the zip is due (or was never scraped)."""
+        last = self.last_scraped_at(zip_code)
+        if last is None:
+            return 0.0
+        now = now or datetime.now(timezone.utc)
+        return max(0.0, interval_sec - (now - last).total_seconds())
+
+    def due_zips(
+        self,
+        zip_codes: Iterable[str],
+        interval_for: Callable[[str], float],
+        now: Optional[datetime] = None,
+    ) -> List[str]:
+        """The zips whose revisit interval has elapsed, in the caller's order."""
+        now = now or datetime.now(timezone.utc)
+        return [
+            z for z in zip_codes if self.seconds_until_due(z, interval_for(z), now) <= 0
+        ]
+
+    def prioritize(self, zip_codes: Iterable[str]) -> List[str]:
+        """
+        Order zips by expected yield, highest first.
+
+        Zips with no history go first: one scrape is the only way to learn
+        their yield. Ties keep the caller's order.
+        """
+        zip_codes = list(zip_codes)
+        unknown = [z for z in zip_codes if self.expected_yield(z) is None]
+        known = [z for z in zip_codes if self.expected_yield(z) is not None]
+        known.sort(key=lambda z: -(self.expected_yield(z) or 0.0))
+        return unknown + known
+
+    def save(self) -> None:
+        """
+        Merge the scrapes recorded since the last save into the file.
+
+        Queue workers on one box share the file, so it is re-read under a lock and
+        only this instance's new record_yield() calls are replayed onto it; the
+        merged state becomes this instance's view.
+        """
+        if not self.path:
+            return
+        with file_lock(self.path):
+            merged = ZipHistory.load(self.path)
+            for zip_code, new_skus, items, at, fresh_drops in self._unsaved:
+                merged.record_yield(zip_code, new_skus, items, at, fresh_drops)
+            with atomic_open(self.path) as f:
+                json.dump(merged.zips, f, indent=2, sort_keys=True)
+                f.write("\n")
+        self.zips = merged.zips
+        self._unsaved = []
+
+
+def _ewma(previous: Any, value: float) -> float:
+    if previous is None:
+        return round(float(value), 3)
+    return round(YIELD_ALPHA * value + (1 - YIELD_ALPHA) * float(previous), 3)
+
+
+def simulate(
+    days: int = 14,
+    rates_per_day: Iterable[float] = (48, 24, 12, 6, 3, 1, 0.5, 0.2, 0, 0),
+    seed: int = 7,
+) -> Dict[str, Any]:
+    """
+    Replay synthetic zips (Poisson drops at `rates_per_day`) under revisit_interval(),
+    under the fixed interval that spends the same number of requests, and under
+    DEFAULT_INTERVAL_SEC for every zip.
+
+    Reports, per policy, requests and how long a drop waited before a scrape saw it.
+    """
+    import random
+
+    rng = random.Random(seed)
+    horizon = days * 86400.0
+    zips = []
+    for per_day in rates_per_day:
+        # Start one window early so the first scrape sees a steady-state history.
+        drops, t = [], -FRESH_WINDOW_HOURS * 3600.0
+        while per_day > 0:
+            t += rng.expovariate(per_day / 86400.0)
+            if t >= horizon:
+                break
+            drops.append(t)
+        zips.append(drops)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    def run(interval_for: Optional[Callable[[ZipHistory, str], float]]):
+        history = ZipHistory(path=None)
+        requests, delays = 0, []
+        for index, drops in enumerate(zips):
+            zip_code = f"z{index:02d}"
+            pending = [d for d in drops if d >= 0]  # not yet seen, ascending
+            t = 0.0
+            while t < horizon:
+                requests += 1
+                fresh = [d for d in drops if t - FRESH_WINDOW_HOURS * 3600.0 < d <= t]
+                while pending and pending[0] <= t:
+                    delays.append(t - pending.pop(0))
+                at = datetime.fromtimestamp(start + t, timezone.utc)
+                history.record_yield(zip_code, 0, len(fresh), at, len(fresh))
+                t += interval_for(history, zip_code)
+        delays.sort()
+        return {
+            "requests": requests,
+            "drops_seen": len(delays),
+            "mean_delay_hours": round(sum(delays) / len(delays) / 3600, 2),
+            "p90_delay_hours": round(delays[int(len(delays) * 0.9)] / 3600, 2),
+        }
+
+    adaptive = run(lambda history, zip_code: history.revisit_interval(zip_code))
+    fixed_sec = math.ceil(horizon * len(zips) / adaptive["requests"])
+    fixed = run(lambda history, zip_code: fixed_sec)
+    fixed["interval_sec"] = fixed_sec
+    default = run(lambda history, zip_code: DEFAULT_INTERVAL_SEC)
+    default["interval_sec"] = DEFAULT_INTERVAL_SEC
+    return {"adaptive": adaptive, "fixed_same_budget": fixed, "fixed_default": default}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--simulate":
+        print(json.dumps(simulate(), indent=2))
+    else:
+        print("Usage: python extracted/zip_history.py --simulate")
@@ -0,0 +1,121 @@
+"""
+Per-zip request latency for scraper_core, persisted between runs.
+
+One JSON object per zip code with its most recent response times, e.g.
+    {"30301": {"samples_ms": [812, 1044, 790], "timeouts": 1}}
+
+A request that timed out is recorded at its timeout, so a zip that keeps timing
+out pushes its own p99 (and with it, its next timeout) up instead of vanishing
+from the statistics.
+
+From the last WINDOW samples of a zip:
+    timeout_for()  p99 * TIMEOUT_MARGIN, clamped to [MIN_TIMEOUT_SEC, max_sec]
+    hedge_after()  p95: when a request is still pending after this, send a second one
+
+Both fall back (to the fixed timeout / no hedge) until a zip has MIN_SAMPLES.
+
+Usage:
+    latency = ZipLatency.load(".local/scraper-zip-latency.json")
+    timeout = latency.timeout_for("30301", default_sec=15)
+    latency.record("30301", elapsed_ms=840)
+    latency.save()
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from atomic_file import atomic_open, file_lock
+from run_metrics import percentile
+
+DEFAULT_ZIP_LATENCY_PATH = os.path.join(".local", "scraper-zip-latency.json")
+WINDOW = 50
+MIN_SAMPLES = 5
+TIMEOUT_MARGIN = 1.5
+MIN_TIMEOUT_SEC = 2.0
+MIN_HEDGE_AFTER_SEC = 0.25
+
+
+class ZipLatency:
+    """Rolling response-time samples keyed by zip code."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_ZIP_LATENCY_PATH):
+        self.path = path
+        self.zips: Dict[str, Dict[str, Any]] = {}
+        # record() calls since the last save, replayed onto the file's contents.
+        self._unsaved: List[Tuple[str, int, bool]] = []
+
+    @classmethod
+    def load(cls, path: Optional[str] = DEFAULT_ZIP_LATENCY_PATH) -> "ZipLatency":
+        """Read the latency file; a missing or unreadable file starts empty."""
+        latency = cls(path)
+        if not path:
+            return latency
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return latency
+        if isinstance(data, dict):
+            latency.zips = {
+                str(zip_code): entry
+                for zip_code, entry in data.items()
+                if isinstance(entry, dict) and isinstance(entry.get("samples_ms"), list)
+            }
+        return latency
+
+    def record(self, zip_code: str, elapsed_ms: int, timed_out: bool = False) -> None:
+        """Add one response time (or, for a timeout, the timeout itself)."""
+        if self.path:
+            self._unsaved.append((zip_code, int(elapsed_ms), timed_out))
+        entry = self.zips.setdefault(zip_code, {"samples_ms": [], "timeouts": 0})
+        samples = entry["samples_ms"]
+        samples.append(int(elapsed_ms))
+        del samples[:-WINDOW]
+        if timed_out:
+            entry["timeouts"] = int(entry.get("timeouts") or 0) + 1
+
+    def percentile_ms(self, zip_code: str, pct: float) -> Optional[int]:
+        """Latency percentile over the window, or None below MIN_SAMPLES."""
+        entry = self.zips.get(zip_code)
+        samples = entry.get("samples_ms") if entry else None
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+        return percentile(sorted(samples), pct)
+
+    def timeout_for(
+        self, zip_code: str, default_sec: float, max_sec: Optional[float] = None
+    ) -> float:
+        """Request timeout from the zip's p99; default_sec until there is history."""
+        p99 = self.percentile_ms(zip_code, 0.99)
+        if p99 is None:
+            return default_sec
+        max_sec = max_sec if max_sec is not None else default_sec * 2
+        return min(max_sec, max(MIN_TIMEOUT_SEC, p99 / 1000 * TIMEOUT_MARGIN))
+
+    def hedge_after(self, zip_code: str) -> Optional[float]:
+        """Seconds after which a still-pending request is hedged (the zip's p95)."""
+        p95 = self.percentile_ms(zip_code, 0.95)
+        if p95 is None:
+            return None
+        return max(MIN_HEDGE_AFTER_SEC, p95 / 1000)
+
+    def save(self) -> None:
+        """
+        Merge the samples recorded since the last save into the file.
+
+        Other processes (queue workers) may have saved since this one loaded, so
+        the file is re-read under a lock and only this instance's new samples are
+        added; the merged state becomes this instance's view.
+        """
+        if not self.path:
+            return
+        with file_lock(self.path):
+            merged = ZipLatency.load(self.path)
+            for zip_code, elapsed_ms, timed_out in self._unsaved:
+                merged.record(zip_code, elapsed_ms, timed_out)
+            with atomic_open(self.path) as f:
+                json.dump(merged.zips, f, sort_keys=True, separators=(",", ":"))
+                f.write("\n")
+        self.zips = merged.zips
+        self._unsaved = []
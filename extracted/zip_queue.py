@@ -0,0 +1,463 @@
+"""
+Shared zip work queue: lets several staging-warmer processes split one scrape.
+
+A "run" is a set of zip codes enqueued once (by a coordinator); workers claim
+shards of them under a lease, keep the lease alive with heartbeats while they
+scrape and upsert, then complete each zip. A worker that dies simply stops
+heartbeating: its lease expires and the zips go to the next claimer (up to
+MAX_ATTEMPTS claims per zip). Workers also report their cumulative stats, which
+summary() sums across workers.
+
+Backends (same interface):
+    SqliteZipQueue     one file, for workers on one box ("sqlite:.local/zip-queue.db")
+    SupabaseZipQueue   zip_work_queue tables + RPCs from migration 033, for
+                       workers on several machines ("supabase")
+
+Usage:
+    queue = open_zip_queue("sqlite:.local/zip-queue.db")
+    queue.enqueue("2026-10-19", store_directory_zips())
+    zips = queue.claim("2026-10-19", worker_id, limit=10, lease_sec=300)
+    queue.heartbeat("2026-10-19", worker_id, zips, lease_sec=300)
+    queue.complete("2026-10-19", worker_id, {"30301": {"count": 512, "error": None}})
+    queue.report_stats("2026-10-19", worker_id, stats)
+    print(queue.summary("2026-10-19"))
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List
+
+DEFAULT_SQLITE_PATH = os.path.join(".local", "zip-queue.db")
+DEFAULT_STORE_DIRECTORY = os.path.join("data", "stores", "store_directory.master.json")
+MAX_ATTEMPTS = 3
+
+STATUSES = ("pending", "leased", "done", "failed")
+
+
+def new_worker_id() -> str:
+    """host:pid:random, unique per worker process and readable in summaries."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def store_directory_zips(path: str = DEFAULT_STORE_DIRECTORY) -> List[str]:
+    """Distinct 5-digit store zips from the store directory, ordered by state then zip."""
+    with open(path, encoding="utf-8") as f:
+        stores = json.load(f)
+    zips = {}
+    for store in stores:
+        zip_code = str(store.get("zip") or "").strip()[:5]
+        if len(zip_code) == 5 and zip_code.isdigit():
+            zips.setdefault(zip_code, str(store.get("state") or ""))
+    return sorted(zips, key=lambda z: (zips[z], z))
+
+
+def merge_stats(per_worker: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum numeric counters across workers (non-numeric values are dropped)."""
+    merged: Dict[str, Any] = {}
+    for stats in per_worker:
+        for key, value in (stats or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+class SqliteZipQueue:
+    """Zip queue in a local SQLite file; safe across processes on one machine."""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection per thread: the heartbeat runs on its own thread.
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS zip_work_queue (
+                    run_id TEXT NOT NULL,
+                    zip_code TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (run_id, zip_code)
+                );
+                CREATE INDEX IF NOT EXISTS idx_zip_work_queue_claim
+                    ON zip_work_queue (run_id, status, position);
+                CREATE TABLE IF NOT EXISTS zip_work_workers (
+                    run_id TEXT NOT NULL,
+                    worker_id TEXT NOT NULL,
+                    stats TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (run_id, worker_id)
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql_fn):
+        """Run sql_fn(conn) in one BEGIN IMMEDIATE transaction (one writer at a time)."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = sql_fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def enqueue(self, run_id: str, zip_codes: Iterable[str]) -> int:
+        """Add zips to a run (already-queued zips are left alone). Returns zips added."""
+        zip_codes = list(dict.fromkeys(zip_codes))
+        now = time.time()
+
+        def insert(conn):
+            start = conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM zip_work_queue"
+                " WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()[0]
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO zip_work_queue"
+                " (run_id, zip_code, position, updated_at) VALUES (?, ?, ?, ?)",
+                [(run_id, z, start + i, now) for i, z in enumerate(zip_codes)],
+            )
+            return conn.total_changes - before
+
+        return self._write(insert)
+
+    def claim(
+        self,
+        run_id: str,
+        worker_id: str,
+        limit: int,
+        lease_sec: float,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> List[str]:
+        """Lease up to `limit` pending (or lease-expired) zips, in enqueue order."""
+        now = time.time()
+
+        def lease(conn):
+            # Expired leases that used up their attempts are given up on.
+            conn.execute(
+                "UPDATE zip_work_queue SET status = 'failed', lease_owner = NULL,"
+                " result = ?, updated_at = ?"
+                " WHERE run_id = ? AND status = 'leased' AND lease_expires_at < ?"
+                " AND attempts >= ?",
+                (
+                    json.dumps({"error": "lease_expired"}),
+                    now,
+                    run_id,
+                    now,
+                    max_attempts,
+                ),
+            )
+            rows = conn.execute(
+                "SELECT zip_code FROM zip_work_queue WHERE run_id = ?"
+                " AND (status = 'pending'"
+                "      OR (status = 'leased' AND lease_expires_at < ?))"
+                " ORDER BY position LIMIT ?",
+                (run_id, now, int(limit)),
+            ).fetchall()
+            zips = [r[0] for r in rows]
+            conn.executemany(
+                "UPDATE zip_work_queue SET status = 'leased', lease_owner = ?,"
+                " lease_expires_at = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE run_id = ? AND zip_code = ?",
+                [(worker_id, now + lease_sec, now, run_id, z) for z in zips],
+            )
+            return zips
+
+        return self._write(lease)
+
+    def heartbeat(
+        self, run_id: str, worker_id: str, zip_codes: Iterable[str], lease_sec: float
+    ) -> int:
+        """Extend this worker's leases on `zip_codes`. Returns leases still held."""
+        now = time.time()
+
+        def extend(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE zip_work_queue SET lease_expires_at = ?, updated_at = ?"
+                " WHERE run_id = ? AND zip_code = ? AND status = 'leased'"
+                " AND lease_owner = ?",
+                [(now + lease_sec, now, run_id, z, worker_id) for z in zip_codes],
+            )
+            return conn.total_changes - before
+
+        return self._write(extend)
+
+    def complete(
+        self,
+        run_id: str,
+        worker_id: str,
+        results: Dict[str, Dict[str, Any]],
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> int:
+        """
+        Finish leased zips: {zip: {"count": n, "error": str | None}}.
+
+        A zip with an error goes back to pending until it has been tried
+        max_attempts times, then it is failed. Zips whose lease this worker lost
+        are not touched. Returns zips updated.
+        """
+        now = time.time()
+
+        def finish(conn):
+            before = conn.total_changes
+            for zip_code, result in results.items():
+                failed = bool((result or {}).get("error"))
+                conn.execute(
+                    "UPDATE zip_work_queue SET"
+                    " status = CASE WHEN ? = 0 THEN 'done'"
+                    "   WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                    " lease_owner = NULL, lease_expires_at = NULL,"
+                    " result = ?, updated_at = ?"
+                    " WHERE run_id = ? AND zip_code = ? AND status = 'leased'"
+                    " AND lease_owner = ?",
+                    (
+                        int(failed),
+                        max_attempts,
+                        json.dumps(result, default=str),
+                        now,
+                        run_id,
+                        zip_code,
+                        worker_id,
+                    ),
+                )
+            return conn.total_changes - before
+
+        return self._write(finish)
+
+    def report_stats(self, run_id: str, worker_id: str, stats: Dict[str, Any]) -> None:
+        """Store this worker's cumulative stats for the run (replaces the last report)."""
+        payload = json.dumps(stats, default=str)
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO zip_work_workers (run_id, worker_id, stats, updated_at)"
+                " VALUES (?, ?, ?, ?) ON CONFLICT (run_id, worker_id) DO UPDATE"
+                " SET stats = excluded.stats, updated_at = excluded.updated_at",
+                (run_id, worker_id, payload, time.time()),
+            )
+        )
+
+    def summary(self, run_id: str) -> Dict[str, Any]:
+        """Zip counts by status, live leases, and stats merged across workers."""
+        conn = self._connect()
+        now = time.time()
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, n in conn.execute(
+            "SELECT status, COUNT(*) FROM zip_work_queue WHERE run_id = ?"
+            " GROUP BY status",
+            (run_id,),
+        ):
+            counts[status] = n
+        live = conn.execute(
+            "SELECT COUNT(*) FROM zip_work_queue WHERE run_id = ?"
+            " AND status = 'leased' AND lease_expires_at >= ?",
+            (run_id, now),
+        ).fetchone()[0]
+        workers = {
+            worker_id: json.loads(stats or "{}")
+            for worker_id, stats in conn.execute(
+                "SELECT worker_id, stats FROM zip_work_workers WHERE run_id = ?",
+                (run_id,),
+            )
+        }
+        return _summary(run_id, counts, live, workers)
+
+    def close(self) -> None:
+        """Close the calling thread's connection (each thread opens its own)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SupabaseZipQueue:
+    """Zip queue in Postgres (migration 033) through the Supabase client."""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def _rpc(self, name: str, params: Dict[str, Any]) -> Any:
+        return self.supabase.rpc(name, params).execute().data
+
+    def enqueue(self, run_id: str, zip_codes: Iterable[str]) -> int:
+        zip_codes = list(dict.fromkeys(zip_codes))
+        return int(
+            self._rpc(
+                "enqueue_zip_work", {"p_run_id": run_id, "p_zip_codes": zip_codes}
+            )
+            or 0
+        )
+
+    def claim(
+        self,
+        run_id: str,
+        worker_id: str,
+        limit: int,
+        lease_sec: float,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> List[str]:
+        rows = self._rpc(
+            "claim_zip_work",
+            {
+                "p_run_id": run_id,
+                "p_worker_id": worker_id,
+                "p_limit": int(limit),
+                "p_lease_sec": int(lease_sec),
+                "p_max_attempts": max_attempts,
+            },
+        )
+        return [r["zip_code"] if isinstance(r, dict) else str(r) for r in rows or []]
+
+    def heartbeat(
+        self, run_id: str, worker_id: str, zip_codes: Iterable[str], lease_sec: float
+    ) -> int:
+        return int(
+            self._rpc(
+                "heartbeat_zip_work",
+                {
+                    "p_run_id": run_id,
+                    "p_worker_id": worker_id,
+                    "p_zip_codes": list(zip_codes),
+                    "p_lease_sec": int(lease_sec),
+                },
+            )
+            or 0
+        )
+
+    def complete(
+        self,
+        run_id: str,
+        worker_id: str,
+        results: Dict[str, Dict[str, Any]],
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> int:
+        return int(
+            self._rpc(
+                "complete_zip_work",
+                {
+                    "p_run_id": run_id,
+                    "p_worker_id": worker_id,
+                    "p_results": results,
+                    "p_max_attempts": max_attempts,
+                },
+            )
+            or 0
+        )
+
+    def report_stats(self, run_id: str, worker_id: str, stats: Dict[str, Any]) -> None:
+        self.supabase.table("zip_work_workers").upsert(
+            {
+                "run_id": run_id,
+                "worker_id": worker_id,
+                "stats": json.loads(json.dumps(stats, default=str)),
+            },
+            on_conflict="run_id,worker_id",
+        ).execute()
+
+    def summary(self, run_id: str) -> Dict[str, Any]:
+        data = self._rpc("zip_work_summary", {"p_run_id": run_id}) or {}
+        counts = {s: int((data.get("counts") or {}).get(s) or 0) for s in STATUSES}
+        return _summary(
+            run_id, counts, int(data.get("live_leases") or 0), data.get("workers") or {}
+        )
+
+    def close(self) -> None:
+        pass
+
+
+def _summary(
+    run_id: str, counts: Dict[str, int], live_leases: int, workers: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "run_id": run_id,
+        "zips": sum(counts.values()),
+        **counts,
+        "live_leases": live_leases,
+        # Pending zips, plus leased ones that someone is still working on or that
+        # will come back when their lease expires.
+        "outstanding": counts["pending"] + counts["leased"],
+        "workers": len(workers),
+        "stats": merge_stats(workers.values()),
+        "per_worker": workers,
+    }
+
+
+def open_zip_queue(spec: str, supabase=None):
+    """ "sqlite:<path>" (or "sqlite") -> SqliteZipQueue; "supabase" -> SupabaseZipQueue."""
+    kind, _, rest = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind == "sqlite":
+        return SqliteZipQueue(rest or DEFAULT_SQLITE_PATH)
+    if kind in ("supabase", "postgres"):
+        if supabase is None:
+            raise ValueError("The supabase zip queue needs a Supabase client")
+        return SupabaseZipQueue(supabase)
+    raise ValueError(f"Unknown zip queue {spec!r} (use sqlite:<path> or supabase)")
+
+
+class LeaseHeartbeat:
+    """Keeps a worker's leases alive on a background thread while it works."""
+
+    def __init__(
+        self, queue, run_id: str, worker_id: str, zip_codes: List[str], lease_sec: float
+    ):
+        self.queue = queue
+        self.run_id = run_id
+        self.worker_id = worker_id
+        self.zip_codes = list(zip_codes)
+        self.lease_sec = lease_sec
+        self.lost = (
+            False  # set when a heartbeat found leases gone (expired + reclaimed)
+        )
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="zip-lease-heartbeat", daemon=True
+        )
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(self.lease_sec / 3):
+                try:
+                    held = self.queue.heartbeat(
+                        self.run_id, self.worker_id, self.zip_codes, self.lease_sec
+                    )
+                except Exception:
+                    continue  # try again next tick; the lease still has 2/3 left
+                if held < len(self.zip_codes):
+                    self.lost = True
+        finally:
+            # SqliteZipQueue opened a connection for this thread; close it here
+            # rather than leave it to the thread-local's teardown.
+            self.queue.close()
@@ -9,6 +9,13 @@
  *   npm run warm:staging
  *   npm run warm:staging -- --zip-codes 30301,30303,30305,30308,30309
  *   npm run warm:staging -- --max-uniques 6000 --batch-size 50
+ *   npm run warm:staging -- --profile
+ *   npm run warm:staging -- --resume
+ *   npm run warm:staging -- --deadline 1500
+ *   npm run warm:staging -- --daemon --interval 3600
+ *   npm run warm:staging -- --due-only
+ *   npm run warm:staging -- --queue sqlite:.local/zip-queue.db --enqueue --all-stores
+ *   npm run warm:staging -- --queue sqlite:.local/zip-queue.db --worker
  *
  * Required env vars (from `.env.local` or your shell):
  *   - PENNY_RAW_COOKIE
@@ -31,6 +38,18 @@ function parseArgs(argv) {
     maxUniques: undefined,
     batchSize: undefined,
     apiUrl: undefined,
+    profile: false,
+    resume: false,
+    deadline: undefined,
+    daemon: false,
+    interval: undefined,
+    dueOnly: false,
+    queue: undefined,
+    queueRun: undefined,
+    enqueue: false,
+    allStores: false,
+    worker: false,
+    queueStatus: false,
   }
 
   for (let i = 0; i < argv.length; i++) {
@@ -74,6 +93,58 @@ function parseArgs(argv) {
       i++
       continue
     }
+    if (a === "--profile") {
+      args.profile = true
+      continue
+    }
+    if (a === "--resume") {
+      args.resume = true
+      continue
+    }
+    if (a === "--deadline") {
+      args.deadline = argv[i + 1]
+      i++
+      continue
+    }
+    if (a === "--daemon") {
+      args.daemon = true
+      continue
+    }
+    if (a === "--interval") {
+      args.interval = argv[i + 1]
+      i++
+      continue
+    }
+    if (a === "--due-only") {
+      args.dueOnly = true
+      continue
+    }
+    if (a === "--queue") {
+      args.queue = argv[i + 1]
+      i++
+      continue
+    }
+    if (a === "--queue-run") {
+      args.queueRun = argv[i + 1]
+      i++
+      continue
+    }
+    if (a === "--enqueue") {
+      args.enqueue = true
+      continue
+    }
+    if (a === "--all-stores") {
+      args.allStores = true
+      continue
+    }
+    if (a === "--worker") {
+      args.worker = true
+      continue
+    }
+    if (a === "--queue-status") {
+      args.queueStatus = true
+      continue
+    }
   }
 
   return args
@@ -128,6 +199,14 @@ function printHelp() {
   console.log("  npm run warm:staging -- --zip-pool 30301,10001,60601 --zip-sample 5 --zip-seed 20260201")
   console.log("  npm run warm:staging -- --max-uniques 6000 --batch-size 50")
   console.log("  npm run warm:staging -- --api-url https://pro.scouterdev.io/api/penny-items")
+  console.log("  npm run warm:staging -- --profile   (per-stage profile in .local/profiles)")
+  console.log("  npm run warm:staging -- --resume    (finish the last failed run, no re-scrape)")
+  console.log("  npm run warm:staging -- --deadline 1500   (finish within 1500s, flushing partial results)")
+  console.log("  npm run warm:staging -- --daemon --interval 3600   (stay up; health on 127.0.0.1:8787)")
+  console.log("  npm run warm:staging -- --due-only  (only zips whose fresh-drop revisit interval elapsed)")
+  console.log("  npm run warm:staging -- --queue sqlite:.local/zip-queue.db --enqueue --all-stores   (fill the work queue)")
+  console.log("  npm run warm:staging -- --queue sqlite:.local/zip-queue.db --worker   (run one worker; start several)")
+  console.log("  npm run warm:staging -- --queue sqlite:.local/zip-queue.db --queue-status")
   console.log("")
   console.log("Required env vars (in .env.local or your shell):")
   console.log(
@@ -213,10 +292,17 @@ async function main() {
   process.env.MAX_UNIQUES = args.maxUniques || process.env.MAX_UNIQUES || "6000"
   process.env.BATCH_SIZE = args.batchSize || process.env.BATCH_SIZE || "50"
   if (args.apiUrl) process.env.PENNY_API_URL = args.apiUrl
+  if (args.profile) process.env.PENNY_PROFILE = "1"
+  if (args.deadline) process.env.WARMER_DEADLINE_SEC = args.deadline
+  if (args.interval) process.env.WARMER_INTERVAL_SEC = args.interval
+  if (args.queue) process.env.WARMER_QUEUE = args.queue
+  if (args.queueRun) process.env.WARMER_QUEUE_RUN = args.queueRun
 
+  // A resumed run replays its journaled scrape and a queue coordinator never
+  // scrapes, so both only need Supabase.
+  const coordinatorOnly = (args.enqueue || args.queueStatus) && !args.worker
   const required = [
-    "PENNY_RAW_COOKIE",
-    "PENNY_GUILD_ID",
+    ...(args.resume || coordinatorOnly ? [] : ["PENNY_RAW_COOKIE", "PENNY_GUILD_ID"]),
     "NEXT_PUBLIC_SUPABASE_URL",
     "SUPABASE_SERVICE_ROLE_KEY",
   ]
@@ -241,7 +327,17 @@ async function main() {
   const py = pickPythonCommand()
   const child = spawn(
     py.cmd,
-    [...py.args, resolve(process.cwd(), "scripts", "staging-warmer.py")],
+    [
+      ...py.args,
+      resolve(process.cwd(), "scripts", "staging-warmer.py"),
+      ...(args.resume ? ["--resume"] : []),
+      ...(args.daemon ? ["--daemon"] : []),
+      ...(args.dueOnly ? ["--due-only"] : []),
+      ...(args.enqueue ? ["--enqueue"] : []),
+      ...(args.allStores ? ["--all-stores"] : []),
+      ...(args.worker ? ["--worker"] : []),
+      ...(args.queueStatus ? ["--queue-status"] : []),
+    ],
     { stdio: "inherit", env: process.env }
   )
 
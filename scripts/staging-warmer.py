@@ -18,14 +18,81 @@ Environment variables:
 - SUPABASE_SERVICE_ROLE_KEY: Supabase service role key (required)
 - MAX_UNIQUES: Maximum unique items to process (default: 6000)
 - BATCH_SIZE: Batch size for DB upserts (default: 50)
+- WARMER_INGEST: "rows" (default; PostgREST upserts of BATCH_SIZE rows), "bulk"
+  (one ingest_enrichment_staging RPC per WARMER_BULK_ROWS rows; migration 034) or
+  "copy" (binary COPY + merge straight into Postgres; needs psycopg and
+  WARMER_DATABASE_URL, see extracted/pg_copy_ingest.py)
+- WARMER_BULK_ROWS: Rows per bulk or copy ingest call (default: 5000)
+- WARMER_DATABASE_URL: Postgres connection string for WARMER_INGEST=copy
+- WARMER_CONFLICT_POLICY: What to do with a row whose internet_number is already
+  staged under another SKU, checked before any batch is sent: "skip" (default;
+  drop the new row), "replace" (delete the staged row, stage the new one) or
+  "report" (drop it and list it in WARMER_CONFLICT_REPORT)
+- WARMER_CONFLICT_REPORT: Conflict list for the report policy
+  (default: .local/staging-warmer-conflicts.json)
+- PRUNE_MODE: "chunked" (default), "background" (chunked, overlapping the scrape)
+  or "single" (one unbounded DELETE, the original behavior)
+- PRUNE_CHUNK_SIZE: Rows deleted per prune chunk (default: 500)
+- PRUNE_TIME_BUDGET_SEC: Stop pruning after this many seconds (default: 30)
 - PENNY_ZIP_CODES: Comma-separated zip codes to scrape (optional)
+- WARMER_METRICS_JSON: Per-stage metrics report path
+  (default: .local/staging-warmer-metrics.json; set to "off" to disable)
+- WARMER_METRICS_PROM: Prometheus textfile path for the same metrics (optional)
+  (--worker inserts its worker id before the extension of both report paths)
+- WARMER_TRACEMALLOC: Set to 1 to track per-stage memory peaks with tracemalloc
+  (same as --trace-memory; off by default, it slows allocation-heavy stages)
+- PENNY_PROFILE: Set to 1 to sample-profile each stage (same as --profile)
+- PENNY_PROFILE_DIR: Profile output directory (default: .local/profiles)
+- WARMER_JOURNAL_DIR: Run journal for --resume
+  (default: .local/staging-warmer-journal; set to "off" to disable)
+- WARMER_DEADLINE_SEC: Wall-clock budget for the whole run (same as --deadline)
+- WARMER_ZIP_HISTORY: Per-zip yield and fresh-drop history, used to order zips
+  under a deadline and to schedule revisits
+  (default: .local/staging-warmer-zips.json; set to "off" to disable)
+- WARMER_INTERVAL_SEC: Revisit interval for zips without fresh-drop history, and
+  the reference interval adaptive scheduling scales from (default: 3600)
+- WARMER_ADAPTIVE_INTERVALS: Scale each zip's interval by its fresh-drop rate
+  (default: 1; 0 uses WARMER_INTERVAL_SEC for every zip)
+- WARMER_MIN_INTERVAL_SEC / WARMER_MAX_INTERVAL_SEC: Adaptive interval bounds
+  (default: 900 / 86400)
+- WARMER_ZIP_INTERVALS: Fixed per-zip intervals, e.g. "30301=900,30303=7200"
+- WARMER_DUE_ONLY: Set to 1 to scrape only due zips (same as --due-only)
+- WARMER_ZIP_LATENCY: Per-zip response times; timeouts follow each zip's p99
+  (default: .local/scraper-zip-latency.json; set to "off" for a fixed 15s)
+- WARMER_HEDGE: Set to 1 to re-send a zip request still pending past its p95
+- WARMER_QUEUE: Shared zip work queue for --enqueue / --worker / --queue-status,
+  "sqlite:<path>" (one box) or "supabase" (migration 033; several machines)
+- WARMER_QUEUE_RUN: Work-queue run id (default: today's UTC date)
+- WARMER_QUEUE_CLAIM: Zips a worker claims at a time (default: 10)
+- WARMER_QUEUE_LEASE_SEC: Lease length; heartbeats renew it every third (default: 300)
+- WARMER_SKIP_SET_REFRESH_SEC: Daemon skip-set refresh interval (default: 21600)
+- WARMER_PRUNE_INTERVAL_SEC: Daemon prune interval (default: 21600)
+- WARMER_HEALTH_PORT: Daemon /healthz + /metrics port on 127.0.0.1
+  (default: 8787; 0 disables)
+
+Flags:
+- --resume: Continue the last unfinished run from its journal (no re-scrape)
+- --deadline SECONDS: Finish (flushing partial results) within SECONDS
+- --daemon: Stay up and re-scrape zips as they come due (see WarmerDaemon)
+- --due-only: One-shot run over the zips whose revisit interval has elapsed
+- --enqueue [--all-stores]: Fill the work queue (PENNY_ZIP_CODES, or every store
+  zip in data/stores/store_directory.master.json) and prune staging once
+- --worker: Claim zips from the work queue, scrape and upsert them until it drains
+- --queue-status: Print the run's progress and stats merged across workers
 """
 
+import argparse
+import json
 import os
 import re
+import signal
 import sys
+import threading
 import time
-from typing import Any, Optional, Set
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import numpy as np
 
 # Load environment variables from .env.local
 try:
@@ -38,13 +105,38 @@ except ImportError:
 # Add extracted/ to path for scraper_core import
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "extracted"))
 
-from scraper_core import run_scrape  # noqa: E402
+from atomic_file import atomic_open  # noqa: E402
+from health_server import HealthServer  # noqa: E402
+from pg_copy_ingest import PgCopyIngest  # noqa: E402
+from run_journal import DEFAULT_JOURNAL_DIR, RunJournal  # noqa: E402
+from run_metrics import RunMetrics, payload_size  # noqa: E402
+from scraper_core import PennyScraperCore, run_scrape  # noqa: E402
+from sku_set import INT64_MAX, SkuSet, encode_skus, sku_to_code  # noqa: E402
+from stage_profiler import (  # noqa: E402
+    DEFAULT_PROFILE_DIR,
+    StageProfiler,
+    profile_enabled_from_env,
+)
+from zip_history import (  # noqa: E402
+    DEFAULT_ZIP_HISTORY_PATH,
+    FRESH_DAYS,
+    MAX_INTERVAL_SEC,
+    MIN_INTERVAL_SEC,
+    ZipHistory,
+)
+from zip_latency import DEFAULT_ZIP_LATENCY_PATH, ZipLatency  # noqa: E402
+from zip_queue import (  # noqa: E402
+    LeaseHeartbeat,
+    merge_stats,
+    new_worker_id,
+    open_zip_queue,
+    store_directory_zips,
+)
 
 try:
     from supabase import create_client
-except ImportError:
-    print("ERROR: supabase package not installed. Run: pip install supabase")
-    sys.exit(1)
+except ImportError:  # importable without it (tests/); main() requires it
+    create_client = None
 
 
 # Default Atlanta metro zip codes for large-net scraping
@@ -62,8 +154,117 @@ DEFAULT_ATLANTA_ZIPS = [
 ]
 
 
-def get_config() -> dict:
-    """Load and validate configuration from environment variables."""
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """Parse CLI flags. Everything else is configured through env vars."""
+    parser = argparse.ArgumentParser(
+        description="Fill enrichment_staging from a scraper_core scrape"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample-profile each stage and write flamegraph input (or PENNY_PROFILE=1)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record per-stage tracemalloc peaks in the metrics report "
+        "(or WARMER_TRACEMALLOC=1)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=os.environ.get("PENNY_PROFILE_DIR") or DEFAULT_PROFILE_DIR,
+        help="Profile output directory (default: .local/profiles)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the last unfinished run from its journal without re-scraping",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Wall-clock budget; skip-set, scrape and upsert are cut to fit "
+        "(or WARMER_DEADLINE_SEC)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run continuously, re-scraping each zip on its interval",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Daemon re-scrape interval per zip (or WARMER_INTERVAL_SEC)",
+    )
+    parser.add_argument(
+        "--due-only",
+        action="store_true",
+        help="Scrape only the zips that are due per their revisit interval "
+        "(or WARMER_DUE_ONLY=1)",
+    )
+    parser.add_argument(
+        "--queue",
+        default=os.environ.get("WARMER_QUEUE") or None,
+        metavar="SPEC",
+        help='Zip work queue: "sqlite:<path>" or "supabase" (or WARMER_QUEUE)',
+    )
+    parser.add_argument(
+        "--queue-run",
+        default=os.environ.get("WARMER_QUEUE_RUN") or None,
+        metavar="ID",
+        help="Work-queue run id (default: today's UTC date)",
+    )
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Add this run's zips to the work queue (coordinator)",
+    )
+    parser.add_argument(
+        "--all-stores",
+        action="store_true",
+        help="With --enqueue: every store zip in the store directory",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Scrape and upsert zips claimed from the work queue until it drains",
+    )
+    parser.add_argument(
+        "--queue-status",
+        action="store_true",
+        help="Print work-queue progress and merged worker stats, then exit",
+    )
+    parser.add_argument(
+        "--check-parity",
+        action="store_true",
+        help="Scrape, compare batch vs per-item extraction, and exit without upserting",
+    )
+    return parser.parse_args(argv)
+
+
+def parse_zip_intervals(value: str) -> dict[str, float]:
+    """Parse "30301=900,30303=7200" into {zip: seconds}; bad entries are ignored."""
+    intervals = {}
+    for part in value.split(","):
+        zip_code, _, seconds = part.partition("=")
+        try:
+            intervals[zip_code.strip()] = float(seconds)
+        except ValueError:
+            if part.strip():
+                print(f"WARNING: Ignoring WARMER_ZIP_INTERVALS entry {part.strip()!r}")
+    return {z: sec for z, sec in intervals.items() if z and sec > 0}
+
+
+def get_config(resume: bool = False, scrape: bool = True) -> dict:
+    """Load and validate configuration from environment variables.
+
+    A resumed run replays its journaled scrape, and a work-queue coordinator
+    (scrape=False) never scrapes, so both only need Supabase credentials.
+    """
     config = {
         "cookie": os.environ.get("PENNY_RAW_COOKIE"),
         "guild": os.environ.get("PENNY_GUILD_ID"),
@@ -71,9 +272,78 @@ def get_config() -> dict:
         "supabase_key": os.environ.get("SUPABASE_SERVICE_ROLE_KEY"),
         "max_uniques": int(os.environ.get("MAX_UNIQUES", "6000")),
         "batch_size": int(os.environ.get("BATCH_SIZE", "50")),
+        "ingest_mode": os.environ.get("WARMER_INGEST", "rows").strip().lower(),
+        "bulk_rows": int(os.environ.get("WARMER_BULK_ROWS", "5000")),
+        "database_url": os.environ.get("WARMER_DATABASE_URL") or None,
+        "conflict_policy": os.environ.get("WARMER_CONFLICT_POLICY", "skip")
+        .strip()
+        .lower(),
+        "conflict_report_path": os.environ.get(
+            "WARMER_CONFLICT_REPORT", ".local/staging-warmer-conflicts.json"
+        ),
         "zip_codes": None,
+        "prune_mode": os.environ.get("PRUNE_MODE", "chunked").strip().lower(),
+        "prune_chunk_size": int(os.environ.get("PRUNE_CHUNK_SIZE", "500")),
+        "prune_time_budget_sec": float(os.environ.get("PRUNE_TIME_BUDGET_SEC", "30")),
+        "metrics_json": os.environ.get(
+            "WARMER_METRICS_JSON", ".local/staging-warmer-metrics.json"
+        ),
+        "metrics_prom": os.environ.get("WARMER_METRICS_PROM") or None,
+        "trace_memory": os.environ.get("WARMER_TRACEMALLOC", "0") == "1",
+        "journal_dir": os.environ.get("WARMER_JOURNAL_DIR", DEFAULT_JOURNAL_DIR),
+        "resume": resume,
+        "deadline_sec": float(os.environ.get("WARMER_DEADLINE_SEC") or 0) or None,
+        "zip_history_path": os.environ.get(
+            "WARMER_ZIP_HISTORY", DEFAULT_ZIP_HISTORY_PATH
+        ),
+        "interval_sec": float(os.environ.get("WARMER_INTERVAL_SEC", "3600")),
+        "adaptive_intervals": os.environ.get("WARMER_ADAPTIVE_INTERVALS", "1") != "0",
+        "min_interval_sec": float(
+            os.environ.get("WARMER_MIN_INTERVAL_SEC") or MIN_INTERVAL_SEC
+        ),
+        "max_interval_sec": float(
+            os.environ.get("WARMER_MAX_INTERVAL_SEC") or MAX_INTERVAL_SEC
+        ),
+        "due_only": os.environ.get("WARMER_DUE_ONLY", "0") == "1",
+        "zip_latency_path": os.environ.get(
+            "WARMER_ZIP_LATENCY", DEFAULT_ZIP_LATENCY_PATH
+        ),
+        "hedge": os.environ.get("WARMER_HEDGE", "0") == "1",
+        "queue_claim_size": int(os.environ.get("WARMER_QUEUE_CLAIM", "10")),
+        "queue_lease_sec": float(os.environ.get("WARMER_QUEUE_LEASE_SEC", "300")),
+        "zip_intervals": parse_zip_intervals(
+            os.environ.get("WARMER_ZIP_INTERVALS", "")
+        ),
+        "skip_set_refresh_sec": float(
+            os.environ.get("WARMER_SKIP_SET_REFRESH_SEC", "21600")
+        ),
+        "prune_interval_sec": float(
+            os.environ.get("WARMER_PRUNE_INTERVAL_SEC", "21600")
+        ),
+        "health_port": int(os.environ.get("WARMER_HEALTH_PORT", "8787")),
     }
 
+    if config["metrics_json"].strip().lower() in ("", "0", "off", "false"):
+        config["metrics_json"] = None
+    if config["journal_dir"].strip().lower() in ("", "0", "off", "false"):
+        config["journal_dir"] = None
+    if config["zip_history_path"].strip().lower() in ("", "0", "off", "false"):
+        config["zip_history_path"] = None
+    if config["zip_latency_path"].strip().lower() in ("", "0", "off", "false"):
+        config["zip_latency_path"] = None
+    if config["ingest_mode"] not in ("rows", "bulk", "copy"):
+        print(f"WARNING: Unknown WARMER_INGEST={config['ingest_mode']!r}; using rows")
+        config["ingest_mode"] = "rows"
+    if config["conflict_policy"] not in CONFLICT_POLICIES:
+        print(
+            f"WARNING: Unknown WARMER_CONFLICT_POLICY={config['conflict_policy']!r}; "
+            "using skip"
+        )
+        config["conflict_policy"] = "skip"
+    if config["prune_mode"] not in ("chunked", "background", "single"):
+        print(f"WARNING: Unknown PRUNE_MODE={config['prune_mode']!r}; using chunked")
+        config["prune_mode"] = "chunked"
+
     # Parse optional zip codes
     zip_env = os.environ.get("PENNY_ZIP_CODES", "")
     if zip_env.strip():
@@ -81,14 +351,16 @@ def get_config() -> dict:
 
     # Validate required config
     missing = []
-    if not config["cookie"]:
+    if not config["cookie"] and scrape and not resume:
         missing.append("PENNY_RAW_COOKIE")
-    if not config["guild"]:
+    if not config["guild"] and scrape and not resume:
         missing.append("PENNY_GUILD_ID")
     if not config["supabase_url"]:
         missing.append("NEXT_PUBLIC_SUPABASE_URL")
     if not config["supabase_key"]:
         missing.append("SUPABASE_SERVICE_ROLE_KEY")
+    if config["ingest_mode"] == "copy" and not config["database_url"] and scrape:
+        missing.append("WARMER_DATABASE_URL")
 
     if missing:
         print(f"ERROR: Missing required environment variables: {', '.join(missing)}")
@@ -97,17 +369,16 @@ def get_config() -> dict:
     return config
 
 
+# ASCII digits only (re's \d also matches e.g. Arabic-Indic digits, which the
+# enrichment_staging CHECK constraint rejects and which would fail the whole batch).
+_SKU_PATTERN = re.compile(r"^(?:[0-9]{6}|10[01][0-9]{7})$")
+
+
 def validate_sku(sku: str) -> bool:
     """Validate SKU format: 6-digit store SKU or 10-digit internet SKU (100/101 prefix)."""
     if not sku:
         return False
-    # 6-digit store SKU
-    if re.match(r"^\d{6}$", sku):
-        return True
-    # 10-digit internet SKU starting with 100 or 101
-    if re.match(r"^10[01]\d{7}$", sku):
-        return True
-    return False
+    return _SKU_PATTERN.match(sku) is not None
 
 
 def parse_price(val: Any) -> Optional[float]:
@@ -128,6 +399,15 @@ def parse_price(val: Any) -> Optional[float]:
     return None
 
 
+def cents_to_price(value: Any) -> Optional[float]:
+    """Convert scraper_core's integer cents (retail_price_value_cents) to dollars."""
+    if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if value != value or value <= 0:  # NaN, free, or negative
+        return None
+    return round(value) / 100
+
+
 def has_non_empty_text(value: Any) -> bool:
     """Return True when value is non-empty text after trim."""
     return isinstance(value, str) and value.strip() != ""
@@ -162,103 +442,217 @@ def is_fully_enriched_penny_row(row: dict) -> bool:
     )
 
 
+# Raw scrape field aliases, in priority order.
+SKU_KEYS = ("store_sku", "storeSku", "sku", "sku_number")
+INTERNET_KEYS = ("internet_sku", "internetNumber", "internet_number")
+UPC_KEYS = ("upc", "barcode", "gtin")
+NAME_KEYS = ("item_name", "name", "title")
+# Typed retail price from scraper_core (integer cents); preferred over the aliases.
+RETAIL_CENTS_KEY = "retail_price_value_cents"
+RETAIL_PRICE_KEYS = (
+    "retail_price",
+    "retailPrice",
+    "store_retail_price",
+    "storeRetailPrice",
+    "list_price",
+    "listPrice",
+    "msrp",
+    "MSRP",
+)
+IMAGE_KEYS = ("image_link", "image_url", "imageUrl", "image")
+PRODUCT_LINK_KEYS = (
+    "home_depot_url",
+    "homeDepotUrl",
+    "productUrl",
+    "product_link",
+    "product_url",
+)
+STAGING_FIELDS = (
+    "sku",
+    "internet_number",
+    "barcode_upc",
+    "item_name",
+    "brand",
+    "retail_price",
+    "image_url",
+    "product_link",
+)
+
+
+def _first_truthy(item: dict, keys: tuple, default: Any = None) -> Any:
+    """Equivalent of item.get(k1) or item.get(k2) or ... or default."""
+    for key in keys:
+        value = item.get(key)
+        if value:
+            return value
+    return default
+
+
+def _clean_text(value: Any) -> Any:
+    """Trim truthy values to text (empty after trim -> None); falsy values pass through."""
+    if value:
+        return str(value).strip() or None
+    return value
+
+
+def _coerce_internet_number(value: Any) -> Optional[int]:
+    """Positive int internet number, or None."""
+    if not value:
+        return None
+    try:
+        internet_number = int(value)
+    except (ValueError, TypeError):
+        return None
+    return internet_number if internet_number > 0 else None
+
+
 def extract_staging_row(item: dict) -> dict:
     """Extract staging fields from raw scrape item with field name flexibility."""
     # SKU: try multiple field names
-    sku = str(
-        item.get("store_sku")
-        or item.get("storeSku")
-        or item.get("sku")
-        or item.get("sku_number")
-        or ""
-    ).strip()
+    sku = str(_first_truthy(item, SKU_KEYS, "")).strip()
 
     # Internet number: try multiple field names
-    internet_raw = (
-        item.get("internet_sku")
-        or item.get("internetNumber")
-        or item.get("internet_number")
-    )
-    internet_number = None
-    if internet_raw:
-        try:
-            internet_number = int(internet_raw)
-            if internet_number <= 0:
-                internet_number = None
-        except (ValueError, TypeError):
-            internet_number = None
-
-    # UPC/barcode
-    barcode_upc = item.get("upc") or item.get("barcode") or item.get("gtin") or None
-    if barcode_upc:
-        barcode_upc = str(barcode_upc).strip() or None
-
-    # Item name
-    item_name = item.get("item_name") or item.get("name") or item.get("title") or None
-    if item_name:
-        item_name = str(item_name).strip() or None
-
-    # Brand
-    brand = item.get("brand")
-    if brand:
-        brand = str(brand).strip() or None
-
-    # Retail price
-    retail_price = None
-    # Important: do NOT use `or` chaining here.
-    # `scraper_core` normalization sometimes writes "N/A" into `retail_price` even when
-    # the raw payload contains a real price under a different key (e.g. `retailPrice`).
-    # "N/A" is truthy, which would short-circuit and incorrectly drop the real price.
-    for k in [
-        "retail_price",
-        "retailPrice",
-        "store_retail_price",
-        "storeRetailPrice",
-        "list_price",
-        "listPrice",
-        "msrp",
-        "MSRP",
-    ]:
-        retail_price = parse_price(item.get(k))
-        if retail_price is not None:
-            break
+    internet_number = _coerce_internet_number(_first_truthy(item, INTERNET_KEYS))
 
-    # Image URL
-    image_url = (
-        item.get("image_link")
-        or item.get("image_url")
-        or item.get("imageUrl")
-        or item.get("image")
-        or None
-    )
-    if image_url:
-        image_url = str(image_url).strip() or None
-
-    # Product link (Home Depot URL)
-    product_link = (
-        item.get("home_depot_url")
-        or item.get("homeDepotUrl")
-        or item.get("productUrl")
-        or item.get("product_link")
-        or item.get("product_url")
-        or None
-    )
-    if product_link:
-        product_link = str(product_link).strip() or None
+    # Retail price: scraper_core rows carry it as integer cents, already coalesced
+    # across the retail aliases. Other sources fall back to parsing the aliases.
+    retail_price = None
+    if RETAIL_CENTS_KEY in item:
+        retail_price = cents_to_price(item[RETAIL_CENTS_KEY])
+    else:
+        # Important: do NOT use `or` chaining here.
+        # A display value like "N/A" is truthy, which would short-circuit and
+        # incorrectly drop a real price stored under a later key (e.g. `retailPrice`).
+        for k in RETAIL_PRICE_KEYS:
+            retail_price = parse_price(item.get(k))
+            if retail_price is not None:
+                break
 
     return {
         "sku": sku,
         "internet_number": internet_number,
-        "barcode_upc": barcode_upc,
-        "item_name": item_name,
-        "brand": brand,
+        "barcode_upc": _clean_text(_first_truthy(item, UPC_KEYS)),
+        "item_name": _clean_text(_first_truthy(item, NAME_KEYS)),
+        "brand": _clean_text(item.get("brand")),
         "retail_price": retail_price,
-        "image_url": image_url,
-        "product_link": product_link,
+        "image_url": _clean_text(_first_truthy(item, IMAGE_KEYS)),
+        "product_link": _clean_text(_first_truthy(item, PRODUCT_LINK_KEYS)),
+    }
+
+
+_MISSING = object()
+
+
+def _map_cached(func, values: list) -> list:
+    """list(map(func, values)), computing func once per distinct (type, value)."""
+    cache: dict = {}
+    out = []
+    append = out.append
+    for value in values:
+        try:
+            key = (type(value), value)
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = cache[key] = func(value)
+        except TypeError:
+            result = func(value)
+        append(result)
+    return out
+
+
+def _present_keys(items: list) -> set:
+    present: set = set()
+    for item in items:
+        present.update(item.keys())
+    return present
+
+
+def _coalesce_column(items: list, keys: tuple, present: set, default: Any = None):
+    """Column form of _first_truthy: only keys present in the batch are read, and
+    each later alias is only read for rows still missing a truthy value."""
+    keys = [k for k in keys if k in present]
+    if not keys:
+        return [default] * len(items)
+    column = [item.get(keys[0]) for item in items]
+    for key in keys[1:]:
+        missing = [i for i, v in enumerate(column) if not v]
+        if not missing:
+            break
+        for i in missing:
+            column[i] = items[i].get(key)
+    return [v if v else default for v in column]
+
+
+def extract_key_columns(items: list, present: Optional[set] = None) -> dict:
+    """
+    The columns dedup decides on: "sku" (stripped text), "sku_code" (int64 array,
+    -1 where validate_sku fails) and "internet_number".
+    """
+    if present is None:
+        present = _present_keys(items)
+    skus = _map_cached(
+        lambda v: str(v).strip(), _coalesce_column(items, SKU_KEYS, present, "")
+    )
+    return {
+        "sku": skus,
+        "sku_code": encode_skus(skus),
+        "internet_number": _map_cached(
+            _coerce_internet_number, _coalesce_column(items, INTERNET_KEYS, present)
+        ),
     }
 
 
-def prune_stale_staging(supabase, retention_days: int = 60):
+def extract_staging_columns(items: list) -> dict:
+    """
+    Batch form of extract_staging_row: one pass per field over a list of items.
+
+    Alias lookups skip keys that no item carries (scraper_core rows all share the
+    DataFrame's columns), and price / internet-number / text coercion runs once per
+    distinct raw value. Produces exactly the values extract_staging_row would.
+    Returns {field: list} for STAGING_FIELDS plus "sku_code".
+    """
+    present = _present_keys(items)
+    columns = extract_key_columns(items, present)
+
+    for field, keys in (
+        ("barcode_upc", UPC_KEYS),
+        ("item_name", NAME_KEYS),
+        ("image_url", IMAGE_KEYS),
+        ("product_link", PRODUCT_LINK_KEYS),
+    ):
+        columns[field] = _map_cached(
+            _clean_text, _coalesce_column(items, keys, present)
+        )
+    # Brand is a single key and keeps falsy values as-is (no `or None`).
+    columns["brand"] = _map_cached(_clean_text, [item.get("brand") for item in items])
+
+    # Retail price: the typed cents column where present, otherwise the first alias
+    # whose parse_price is not None (not first truthy).
+    retail: list = [None] * len(items)
+    pending = list(range(len(items)))
+    if RETAIL_CENTS_KEY in present:
+        untyped = []
+        for i in pending:
+            if RETAIL_CENTS_KEY in items[i]:
+                retail[i] = cents_to_price(items[i][RETAIL_CENTS_KEY])
+            else:
+                untyped.append(i)
+        pending = untyped
+    for key in RETAIL_PRICE_KEYS:
+        if key not in present:
+            continue
+        parsed = _map_cached(parse_price, [items[i].get(key) for i in pending])
+        for i, value in zip(pending, parsed, strict=True):
+            retail[i] = value
+        pending = [i for i in pending if retail[i] is None]
+        if not pending:
+            break
+    columns["retail_price"] = retail
+
+    return columns
+
+
+def prune_stale_staging(supabase, retention_days: int = 60, span=None):
     """Delete staging rows older than retention period."""
     from datetime import datetime, timedelta
 
@@ -272,6 +666,9 @@ def prune_stale_staging(supabase, retention_days: int = 60):
             .execute()
         )
         deleted_count = len(result.data) if result.data else 0
+        if span is not None:
+            span.add_items(deleted_count)
+            span.add_bytes_in(payload_size(result.data))
         if deleted_count > 0:
             print(
                 f"Pruned {deleted_count} stale staging rows (> {retention_days} days old)"
@@ -282,15 +679,164 @@ def prune_stale_staging(supabase, retention_days: int = 60):
         return 0
 
 
-def get_fully_enriched_skus(supabase) -> Set[str]:
+def _is_missing_rpc_error(error: Exception, rpc_name: str) -> bool:
+    """
+    True when the RPC is not deployed yet: PostgREST PGRST202, or Postgres 42883
+    (undefined function) naming rpc_name itself. Any other error that merely
+    mentions the RPC (timeouts, constraint violations inside it) is not.
+    """
+    code = getattr(error, "code", None)
+    if code is None and error.args and isinstance(error.args[0], dict):
+        code = error.args[0].get("code")
+    code = str(code or "")
+    if code == "PGRST202":
+        return True
+    return code == "42883" and rpc_name in str(getattr(error, "message", error))
+
+
+def _prune_chunk_via_table(supabase, cutoff: str, chunk_size: int) -> int:
+    """Fallback chunk delete for databases without migration 032 (sku list out, count back)."""
+    result = (
+        supabase.table("enrichment_staging")
+        .select("sku")
+        .lt("created_at", cutoff)
+        .order("created_at")
+        .limit(chunk_size)
+        .execute()
+    )
+    skus = [row["sku"] for row in (result.data or []) if row.get("sku")]
+    if not skus:
+        return 0
+    deleted = (
+        supabase.table("enrichment_staging")
+        .delete(count="exact", returning="minimal")
+        .in_("sku", skus)
+        .execute()
+    )
+    return deleted.count if deleted.count is not None else len(skus)
+
+
+def prune_stale_staging_chunked(
+    supabase,
+    retention_days: int = 60,
+    chunk_size: int = 500,
+    time_budget_sec: float = 30.0,
+) -> dict:
+    """
+    Delete stale staging rows in bounded, oldest-first chunks and return counts only.
+
+    Each chunk is its own short transaction (prune_enrichment_staging_chunk RPC), so
+    consume RPCs touching enrichment_staging are never queued behind one long DELETE.
+    Stops when a chunk comes back short or the time budget runs out; whatever is
+    left is picked up by the next run.
+    """
+    from datetime import datetime, timedelta
+
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    started = time.monotonic()
+    result = {
+        "deleted": 0,
+        "chunks": 0,
+        "complete": False,
+        "elapsed_ms": 0,
+        "error": None,
+    }
+    use_rpc = True
+
+    try:
+        while time.monotonic() - started < time_budget_sec:
+            if use_rpc:
+                try:
+                    response = supabase.rpc(
+                        "prune_enrichment_staging_chunk",
+                        {"p_cutoff": cutoff, "p_limit": chunk_size},
+                    ).execute()
+                    deleted = int(response.data or 0)
+                except Exception as e:
+                    if not _is_missing_rpc_error(e, "prune_enrichment_staging_chunk"):
+                        raise
+                    use_rpc = False
+                    continue
+            else:
+                deleted = _prune_chunk_via_table(supabase, cutoff, chunk_size)
+
+            result["chunks"] += 1
+            result["deleted"] += deleted
+            if deleted < chunk_size:
+                result["complete"] = True
+                break
+    except Exception as e:
+        print(f"WARNING: Failed to prune staging: {e}")
+        result["error"] = str(e)
+
+    result["elapsed_ms"] = int((time.monotonic() - started) * 1000)
+    if result["deleted"] > 0 or not (result["complete"] or result["error"]):
+        print(
+            f"Pruned {result['deleted']} stale staging rows (> {retention_days} days old) "
+            f"in {result['chunks']} chunks"
+            + ("" if result["complete"] else " — stopped early, rest deferred")
+        )
+    return result
+
+
+class BackgroundPrune:
+    """Run prune_stale_staging_chunked on its own client/thread while the scrape runs."""
+
+    def __init__(self, config: dict, retention_days: int = 60):
+        self.config = config
+        self.retention_days = retention_days
+        self.result: Optional[dict] = None
+        self.cpu_ms = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="staging-prune", daemon=True
+        )
+
+    def start(self) -> "BackgroundPrune":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        cpu_start = time.thread_time()
+        try:
+            # Separate client: the main thread keeps using its own session.
+            supabase = create_client(
+                self.config["supabase_url"], self.config["supabase_key"]
+            )
+            self.result = prune_stale_staging_chunked(
+                supabase,
+                retention_days=self.retention_days,
+                chunk_size=self.config["prune_chunk_size"],
+                time_budget_sec=self.config["prune_time_budget_sec"],
+            )
+        except Exception as e:
+            print(f"WARNING: Background prune failed: {e}")
+        finally:
+            self.cpu_ms = (time.thread_time() - cpu_start) * 1000
+
+    def join(self) -> Optional[dict]:
+        """Wait for the prune (bounded by its time budget) and return its counts."""
+        self._thread.join(timeout=self.config["prune_time_budget_sec"] + 30)
+        return self.result
+
+
+def get_fully_enriched_skus(
+    supabase, span=None, deadline: Optional[float] = None, stats: Optional[dict] = None
+) -> SkuSet:
     """
     Fetch Penny List SKUs that are already fully enriched.
 
     Important behavior: we do NOT skip all existing Penny List SKUs.
     Only fully enriched rows are skipped so partial/unenriched SKUs stay eligible
     for Item Cache refresh/backfill.
+
+    Returned as a SkuSet (sorted int64 codes) so a Penny List of hundreds of
+    thousands of rows costs 8 bytes per SKU instead of a string per SKU.
+
+    With a deadline (time.monotonic()), paging stops there and the partial set is
+    returned; stats["skip_set_partial"] is set to 1. A partial skip set only means
+    some already-enriched SKUs get re-staged.
     """
-    skip_skus: Set[str] = set()
+    code_chunks = []
 
     try:
         page_size = 1000
@@ -307,148 +853,222 @@ def get_fully_enriched_skus(supabase) -> Set[str]:
             )
 
             rows = result.data or []
+            if span is not None:
+                span.add_bytes_in(payload_size(rows))
             if not rows:
                 break
 
+            page_skus = []
             for row in rows:
                 sku = row.get("home_depot_sku_6_or_10_digits")
                 if not sku:
                     continue
                 if is_fully_enriched_penny_row(row):
-                    skip_skus.add(str(sku).strip())
+                    page_skus.append(str(sku).strip())
+            code_chunks.append(encode_skus(page_skus))
 
             if len(rows) < page_size:
                 break
             offset += page_size
 
+            if deadline is not None and time.monotonic() >= deadline:
+                print(
+                    f"WARNING: Skip-set fetch hit its deadline after {offset} rows; "
+                    "continuing with a partial skip set"
+                )
+                if stats is not None:
+                    stats["skip_set_partial"] = 1
+                break
+
+        if span is not None:
+            span.add_items(sum(len(chunk) for chunk in code_chunks))
+
     except Exception as e:
         print(f"WARNING: Failed to fetch Penny List skip set: {e}")
         # Continue anyway - we'll only skip based on per-run dedup.
 
-    return skip_skus
+    return SkuSet(np.concatenate(code_chunks) if code_chunks else None)
 
 
-def main():
-    print("=" * 60)
-    print("ENRICHMENT STAGING WARMER")
-    print("=" * 60)
+def new_stats() -> dict:
+    """Counters reported by print_stats and the run metrics report."""
+    return {
+        "fetched_total": 0,
+        "valid_total": 0,
+        "deduped_uniques": 0,
+        "skipped_invalid_key": 0,
+        "skipped_fully_enriched_in_penny_list": 0,
+        "upserted_to_staging": 0,
+        "error_count": 0,
+    }
 
-    # Load config
-    config = get_config()
-    print(
-        f"Config: max_uniques={config['max_uniques']}, batch_size={config['batch_size']}"
-    )
 
-    # Initialize Supabase client
-    supabase = create_client(config["supabase_url"], config["supabase_key"])
-    print("Connected to Supabase")
+def report_scrape_failure(scrape_result: dict) -> None:
+    """Print scrape failure details and per-zip fetch diagnostics."""
+    stage = scrape_result.get("stage", "unknown")
+    error = scrape_result.get("error", "Unknown error")
+    cloudflare_block = bool(scrape_result.get("cloudflare_block"))
+
+    # GitHub Actions annotation (does not include secrets)
+    print(f"::error title=Staging warmer scrape failed ({stage})::{error}")
+    print(f"ERROR: Scrape failed at stage '{stage}'")
+    print(f"  Error: {error}")
+    print(f"cloudflare_block={'true' if cloudflare_block else 'false'}")
+
+    zip_results = scrape_result.get("zip_results") or []
+    if zip_results:
+        print("\nFetch diagnostics (per zip):")
+        for r in zip_results:
+            zip_code = r.get("zip_code", "?")
+            status = r.get("status_code")
+            count = r.get("count")
+            content_type = r.get("content_type")
+            looks_like_html = r.get("looks_like_html")
+            was_redirected = r.get("was_redirected")
+            err = r.get("error")
+            elapsed_ms = r.get("elapsed_ms")
 
-    # Prune stale staging rows before adding new ones
-    print("\nPruning stale staging rows...")
-    prune_stale_staging(supabase, retention_days=60)
+            print(
+                "  FETCH_DIAGNOSTICS "
+                + f"zip={zip_code} status={status} count={count} "
+                + f"content_type={content_type} looks_like_html={looks_like_html} "
+                + f"redirected={was_redirected} error={err} elapsed_ms={elapsed_ms}"
+            )
 
-    # Get fully enriched Penny List SKUs (to skip).
-    print("\nFetching fully enriched SKUs from Penny List...")
-    fully_enriched_skus = get_fully_enriched_skus(supabase)
-    print(f"Found {len(fully_enriched_skus)} fully enriched SKUs in Penny List")
+            snippet = r.get("response_snippet")
+            if isinstance(snippet, str) and snippet.strip():
+                safe_snippet = snippet.strip()[:200]
+                print(f"    snippet: {safe_snippet}")
 
-    # Determine zip codes
-    zip_codes = config["zip_codes"] or DEFAULT_ATLANTA_ZIPS
-    print(f"Using {len(zip_codes)} zip codes: {', '.join(zip_codes[:5])}...")
 
-    # Run scraper
-    print("\nRunning scraper_core...")
-    scrape_result = run_scrape(
-        raw_cookie=config["cookie"],
-        guild_id=config["guild"],
-        zip_codes=zip_codes,
-        api_url=os.environ.get("PENNY_API_URL") or None,
-    )
+def _first_unique_rows(
+    sku_codes: np.ndarray, internets: list, candidates: np.ndarray
+) -> Optional[list[int]]:
+    """Rows kept by the SKU-then-internet_number dedup, or None when it needs a scan.
 
-    if not scrape_result.get("ok"):
-        stage = scrape_result.get("stage", "unknown")
-        error = scrape_result.get("error", "Unknown error")
-        cloudflare_block = bool(scrape_result.get("cloudflare_block"))
+    Keeps the first candidate row of each SKU. That is exactly the sequential
+    result when those rows carry distinct internet numbers; otherwise a dropped
+    row can let a later row of the same SKU through, so the caller falls back to
+    _first_unique_rows_sequential.
+    """
+    _, first = np.unique(sku_codes[candidates], return_index=True)
+    rows = candidates[np.sort(first)]
+    numbers = [internets[i] for i in rows.tolist()]
+    present = [n for n in numbers if n]
+    if any(n > INT64_MAX for n in present):
+        return None
+    if len(np.unique(np.asarray(present, dtype=np.int64))) != len(present):
+        return None
+    return rows.tolist()
+
+
+def _first_unique_rows_sequential(
+    sku_codes: np.ndarray, internets: list, candidates: np.ndarray, max_uniques: int
+) -> list[int]:
+    """Row-by-row form of _first_unique_rows for scrapes with internet_number clashes."""
+    seen_skus = SkuSet()
+    seen_internet = SkuSet()
+    kept: list[int] = []
+    for i in candidates.tolist():
+        sku_code = int(sku_codes[i])
+        if sku_code in seen_skus:
+            continue
+        internet = internets[i]
+        if internet and internet in seen_internet:
+            continue
+        seen_skus.add(sku_code)
+        if internet:
+            seen_internet.add(internet)
+        kept.append(i)
+        if len(kept) >= max(max_uniques, 1):
+            break
+    return kept
 
-        # GitHub Actions annotation (does not include secrets)
-        print(f"::error title=Staging warmer scrape failed ({stage})::{error}")
-        print(f"ERROR: Scrape failed at stage '{stage}'")
-        print(f"  Error: {error}")
-        print(f"cloudflare_block={'true' if cloudflare_block else 'false'}")
 
-        zip_results = scrape_result.get("zip_results") or []
-        if zip_results:
-            print("\nFetch diagnostics (per zip):")
-            for r in zip_results:
-                zip_code = r.get("zip_code", "?")
-                status = r.get("status_code")
-                count = r.get("count")
-                content_type = r.get("content_type")
-                looks_like_html = r.get("looks_like_html")
-                was_redirected = r.get("was_redirected")
-                err = r.get("error")
-                elapsed_ms = r.get("elapsed_ms")
+def dedupe_items(
+    items: list,
+    fully_enriched_skus: SkuSet,
+    max_uniques: int,
+    stats: dict,
+    keys: Optional[dict] = None,
+) -> list[dict]:
+    """Extract staging rows, drop invalid/fully enriched SKUs, dedup by SKU then internet_number.
 
-                print(
-                    "  FETCH_DIAGNOSTICS "
-                    + f"zip={zip_code} status={status} count={count} "
-                    + f"content_type={content_type} looks_like_html={looks_like_html} "
-                    + f"redirected={was_redirected} error={err} elapsed_ms={elapsed_ms}"
-                )
+    `keys` may be passed in when extract_key_columns(items) was already computed.
+    """
+    if keys is None:
+        keys = extract_key_columns(items)
+
+    # SKU validation and the skip-set lookup run once over the whole column.
+    sku_codes = keys["sku_code"]
+    valid = sku_codes >= 0
+    enriched = fully_enriched_skus.contains_many(sku_codes)
+    candidates = np.flatnonzero(valid & ~enriched)
+    internets = keys["internet_number"]
+
+    kept = _first_unique_rows(sku_codes, internets, candidates)
+    if kept is None:
+        kept = _first_unique_rows_sequential(
+            sku_codes, internets, candidates, max_uniques
+        )
 
-                snippet = r.get("response_snippet")
-                if isinstance(snippet, str) and snippet.strip():
-                    safe_snippet = snippet.strip()[:200]
-                    print(f"    snippet: {safe_snippet}")
+    # The per-item scan stops at the row that fills max_uniques (it always keeps
+    # one); stats only count rows up to it.
+    limit = max(max_uniques, 1)
+    scanned = len(items)
+    if len(kept) >= limit:
+        kept = kept[:limit]
+        scanned = kept[-1] + 1
+        print(f"Reached max_uniques limit ({max_uniques})")
+    stats["skipped_invalid_key"] += int(np.count_nonzero(~valid[:scanned]))
+    stats["valid_total"] += int(np.count_nonzero(valid[:scanned]))
+    stats["skipped_fully_enriched_in_penny_list"] += int(
+        np.count_nonzero(enriched[:scanned])
+    )
 
-        sys.exit(1)
+    # The remaining fields are only extracted for kept items.
+    columns = extract_staging_columns([items[i] for i in kept])
+    unique_items: list[dict] = []
+    for values in zip(*(columns[field] for field in STAGING_FIELDS), strict=True):
+        row = dict(zip(STAGING_FIELDS, values, strict=True))
 
-    items = scrape_result.get("data", [])
-    raw_count = scrape_result.get("raw_count", len(items))
-    final_count = scrape_result.get("final_count", len(items))
-    print(
-        f"Scraper returned {len(items)} items (raw: {raw_count}, deduped: {final_count})"
-    )
+        # Avoid degrading coverage: don't overwrite an existing non-null retail_price with NULL.
+        # (Upstream sometimes returns no retail value for a SKU on a given run.)
+        if row.get("retail_price") is None:
+            row.pop("retail_price", None)
 
-    # Initialize stats
-    stats = {
-        "fetched_total": len(items),
-        "valid_total": 0,
-        "deduped_uniques": 0,
-        "skipped_invalid_key": 0,
-        "skipped_fully_enriched_in_penny_list": 0,
-        "upserted_to_staging": 0,
-        "error_count": 0,
-    }
+        unique_items.append(row)
 
-    # Dedup by SKU, then internet_number
-    seen_skus: Set[str] = set()
-    seen_internet: Set[int] = set()
+    stats["deduped_uniques"] = len(unique_items)
+    return unique_items
+
+
+def dedupe_items_per_item(
+    items: list, fully_enriched_skus: SkuSet, max_uniques: int, stats: dict
+) -> list[dict]:
+    """Reference per-item path (extract_staging_row + validate_sku); see --check-parity."""
+    seen_skus = SkuSet()
+    seen_internet = SkuSet()
     unique_items: list[dict] = []
 
-    print("\nProcessing and deduplicating items...")
     for item in items:
         row = extract_staging_row(item)
         sku = row["sku"]
         internet = row["internet_number"]
 
-        # Validate SKU format
         if not validate_sku(sku):
             stats["skipped_invalid_key"] += 1
             continue
 
         stats["valid_total"] += 1
 
-        # Skip only rows already fully enriched in Penny List.
         if sku in fully_enriched_skus:
             stats["skipped_fully_enriched_in_penny_list"] += 1
             continue
 
-        # Dedup by SKU
         if sku in seen_skus:
             continue
 
-        # Dedup by internet_number (if present)
         if internet and internet in seen_internet:
             continue
 
@@ -456,41 +1076,455 @@ def main():
         if internet:
             seen_internet.add(internet)
 
-        # Avoid degrading coverage: don't overwrite an existing non-null retail_price with NULL.
-        # (Upstream sometimes returns no retail value for a SKU on a given run.)
         if row.get("retail_price") is None:
             row.pop("retail_price", None)
 
         unique_items.append(row)
 
-        if len(unique_items) >= config["max_uniques"]:
-            print(f"Reached max_uniques limit ({config['max_uniques']})")
+        if len(unique_items) >= max_uniques:
             break
 
     stats["deduped_uniques"] = len(unique_items)
-    print(f"Deduped to {len(unique_items)} unique items")
+    return unique_items
 
-    if not unique_items:
-        print("\nNo new items to upsert. Exiting.")
-        print_stats(stats)
-        return
 
-    # Batch upsert to staging
-    print(
-        f"\nUpserting {len(unique_items)} items in batches of {config['batch_size']}..."
+def check_dedupe_parity(
+    items: list, fully_enriched_skus: SkuSet, max_uniques: int
+) -> bool:
+    """Run the batch and per-item paths on the same scrape; report any difference."""
+    batch_stats, item_stats = new_stats(), new_stats()
+    batch_rows = dedupe_items(items, fully_enriched_skus, max_uniques, batch_stats)
+    item_rows = dedupe_items_per_item(
+        items, fully_enriched_skus, max_uniques, item_stats
+    )
+
+    ok = True
+    if batch_stats != item_stats:
+        ok = False
+        print(f"PARITY MISMATCH (stats): batch={batch_stats} per_item={item_stats}")
+    if batch_rows != item_rows:
+        ok = False
+        for n, (a, b) in enumerate(zip(batch_rows, item_rows, strict=False)):
+            if a != b:
+                print(f"PARITY MISMATCH (row {n}): batch={a} per_item={b}")
+                break
+        if len(batch_rows) != len(item_rows):
+            print(
+                f"PARITY MISMATCH (rows): batch={len(batch_rows)} per_item={len(item_rows)}"
+            )
+    if ok:
+        print(f"Parity OK: {len(batch_rows)} rows, stats identical")
+    return ok
+
+
+def count_zip_yields(
+    items: list, keys: dict, fully_enriched_skus: SkuSet
+) -> dict[str, tuple[int, int]]:
+    """Per source_zip: (distinct valid, not-yet-enriched SKUs, distinct fresh drops).
+
+    A fresh drop is a valid SKU with days_old <= zip_history.FRESH_DAYS, enriched
+    or not; it drives the zip's revisit interval (see ZipHistory.revisit_interval).
+    """
+    enriched = fully_enriched_skus.contains_many(keys["sku_code"]).tolist()
+    new_skus: dict[str, set] = {}
+    fresh: dict[str, set] = {}
+    for item, code, is_enriched in zip(
+        items, keys["sku_code"].tolist(), enriched, strict=True
+    ):
+        zip_code = item.get("source_zip")
+        if not zip_code:
+            continue
+        zip_code = str(zip_code)
+        bucket = new_skus.setdefault(zip_code, set())
+        fresh_bucket = fresh.setdefault(zip_code, set())
+        if code < 0:
+            continue
+        if not is_enriched:
+            bucket.add(code)
+        days_old = item.get("days_old")
+        if (
+            isinstance(days_old, (int, float, np.number))
+            and 0 <= days_old <= FRESH_DAYS
+        ):
+            fresh_bucket.add(code)
+    return {
+        zip_code: (len(codes), len(fresh[zip_code]))
+        for zip_code, codes in new_skus.items()
+    }
+
+
+CONFLICT_POLICIES = ("skip", "replace", "report")
+CONFLICT_QUERY_CHUNK = 300  # internet numbers per IN (...) filter, keeps URLs short
+
+
+def find_internet_number_owners(
+    supabase, internet_numbers: list[int], span=None
+) -> dict[int, str]:
+    """internet_number -> staged sku, with one IN query per CONFLICT_QUERY_CHUNK."""
+    owners: dict[int, str] = {}
+    for i in range(0, len(internet_numbers), CONFLICT_QUERY_CHUNK):
+        chunk = internet_numbers[i : i + CONFLICT_QUERY_CHUNK]
+        result = (
+            supabase.table("enrichment_staging")
+            .select("sku,internet_number")
+            .in_("internet_number", chunk)
+            .execute()
+        )
+        if span is not None:
+            span.add_bytes_in(payload_size(result.data))
+        for row in result.data or []:
+            if row.get("internet_number") is not None and row.get("sku"):
+                owners[int(row["internet_number"])] = row["sku"]
+    return owners
+
+
+def write_conflict_report(path: str, conflicts: list[dict]) -> None:
+    with atomic_open(path) as f:
+        json.dump(
+            {
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "conflicts": conflicts,
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def resolve_internet_number_conflicts(
+    supabase, rows: list[dict], config: dict, stats: dict, span=None
+) -> set:
+    """
+    Pre-flight check of the rows' internet numbers against enrichment_staging.
+
+    The unique idx_staging_internet_number index fails a whole upsert batch when
+    one row's internet_number is already staged under another SKU (dedupe_items
+    only catches duplicates within the run). Conflicts are found with a few IN
+    queries and handled by config["conflict_policy"]:
+
+        skip     drop the incoming row
+        replace  delete the staged row, so the incoming one takes its place
+                 (falls back to skip when the delete fails)
+        report   drop the incoming row and list it in conflict_report_path
+
+    Returns the SKUs to drop from `rows`. If the check itself fails, nothing is
+    dropped and the upsert behaves as it would without it.
+    """
+    numbers = sorted(
+        {row["internet_number"] for row in rows if row.get("internet_number")}
+    )
+    if not numbers:
+        return set()
+    try:
+        owners = find_internet_number_owners(supabase, numbers, span=span)
+    except Exception as e:
+        print(f"WARNING: internet_number pre-flight check failed: {e}")
+        return set()
+    conflicts = [
+        {
+            "internet_number": row["internet_number"],
+            "sku": row["sku"],
+            "staged_sku": owners[row["internet_number"]],
+        }
+        for row in rows
+        if row.get("internet_number") in owners
+        and owners[row["internet_number"]] != row["sku"]
+    ]
+    stats["internet_number_conflicts"] = stats.get(
+        "internet_number_conflicts", 0
+    ) + len(conflicts)
+    policy = config["conflict_policy"]
+    if conflicts:
+        print(
+            f"  {len(conflicts)} rows have an internet_number staged under another "
+            f"SKU ({policy})"
+        )
+
+    if policy == "replace":
+        staged_skus = sorted({c["staged_sku"] for c in conflicts})
+        deleted: set = set()
+        try:
+            for i in range(0, len(staged_skus), CONFLICT_QUERY_CHUNK):
+                chunk = staged_skus[i : i + CONFLICT_QUERY_CHUNK]
+                supabase.table("enrichment_staging").delete(returning="minimal").in_(
+                    "sku", chunk
+                ).execute()
+                deleted.update(chunk)
+        except Exception as e:
+            print(
+                f"WARNING: Failed to delete conflicting staged rows: {e}; "
+                "skipping the rows whose staged row is still there"
+            )
+        stats["replaced_staged_rows"] = stats.get("replaced_staged_rows", 0) + len(
+            deleted
+        )
+        # Rows whose staged owner was not deleted would still fail their batch.
+        conflicts = [c for c in conflicts if c["staged_sku"] not in deleted]
+        if not conflicts:
+            return set()
+
+    if policy == "report" and config["conflict_report_path"]:
+        try:
+            write_conflict_report(config["conflict_report_path"], conflicts)
+        except OSError as e:
+            print(f"WARNING: Failed to write conflict report: {e}")
+    stats["skipped_internet_number_conflict"] = stats.get(
+        "skipped_internet_number_conflict", 0
+    ) + len(conflicts)
+    return {c["sku"] for c in conflicts}
+
+
+def record_zip_history(
+    config: dict,
+    items: list,
+    keys: dict,
+    fully_enriched_skus: SkuSet,
+    zip_results,
+    history: Optional[ZipHistory] = None,
+) -> None:
+    """Fold this scrape's per-zip yields and fresh drops into the history file.
+
+    Errored zips are skipped. Pass `history` to update an in-memory ZipHistory
+    (the daemon's) instead of re-reading the file.
+    """
+    if history is None:
+        if not config["zip_history_path"]:
+            return
+        history = ZipHistory.load(config["zip_history_path"])
+    yields = count_zip_yields(items, keys, fully_enriched_skus)
+    for r in zip_results or []:
+        zip_code = r.get("zip_code")
+        if not zip_code or r.get("error"):
+            continue
+        new_skus, fresh_drops = yields.get(zip_code, (0, 0))
+        history.record_yield(
+            zip_code,
+            new_skus=new_skus,
+            items=r.get("count") or 0,
+            fresh_drops=fresh_drops,
+        )
+    try:
+        history.save()
+    except OSError as e:
+        print(f"WARNING: Failed to save zip history: {e}")
+
+
+def zip_interval(config: dict, history: ZipHistory, zip_code: str) -> float:
+    """Revisit interval for a zip: WARMER_ZIP_INTERVALS, else its fresh-drop rate."""
+    fixed = config["zip_intervals"].get(zip_code)
+    if fixed is not None:
+        return fixed
+    if not config["adaptive_intervals"]:
+        return config["interval_sec"]
+    # A short --interval (e.g. while testing) lowers the floor with it.
+    return history.revisit_interval(
+        zip_code,
+        default_sec=config["interval_sec"],
+        min_sec=min(config["min_interval_sec"], config["interval_sec"]),
+        max_sec=config["max_interval_sec"],
+    )
+
+
+def select_due_zips(config: dict, stats: dict) -> list[str]:
+    """Narrow config["zip_codes"] to the zips that are due (for --due-only)."""
+    zip_codes = config["zip_codes"] or DEFAULT_ATLANTA_ZIPS
+    history = ZipHistory.load(config["zip_history_path"])
+    due = history.due_zips(
+        zip_codes, lambda zip_code: zip_interval(config, history, zip_code)
+    )
+    stats["due_zips"] = len(due)
+    stats["not_due_zips"] = len(zip_codes) - len(due)
+    print(f"Due zips: {len(due)} of {len(zip_codes)}")
+    return due
+
+
+# Fields that make a staging row worth more to enrichment; under a deadline the
+# richest rows are upserted first.
+PRIORITY_FIELDS = (
+    "internet_number",
+    "barcode_upc",
+    "item_name",
+    "brand",
+    "retail_price",
+    "image_url",
+    "product_link",
+)
+
+
+def prioritize_rows(unique_items: list[dict]) -> list[dict]:
+    """Stable sort: rows with more enrichment fields filled come first."""
+    return sorted(
+        unique_items,
+        key=lambda row: (
+            -sum(1 for f in PRIORITY_FIELDS if row.get(f) not in (None, ""))
+        ),
     )
-    batch_size = config["batch_size"]
 
-    for i in range(0, len(unique_items), batch_size):
+
+class DeadlineBudget:
+    """
+    Splits a wall-clock budget across the warmer's stages.
+
+    Stage ends are fixed fractions of the usable budget measured from the start,
+    so time a stage does not use rolls over to the next one. The margin is kept
+    back for the stats and metrics report.
+    """
+
+    SKIP_SET_END = 0.20  # prune + skip-set fetch
+    SCRAPE_END = 0.70  # dedup + upsert get the rest
+
+    def __init__(self, total_sec: float, margin_sec: Optional[float] = None):
+        self.total_sec = total_sec
+        self.started = time.monotonic()
+        if margin_sec is None:
+            margin_sec = min(30.0, total_sec * 0.1)
+        self.end = self.started + max(1.0, total_sec - margin_sec)
+
+    def stage_end(self, share: float) -> float:
+        return self.started + (self.end - self.started) * share
+
+    def remaining(self) -> float:
+        return self.end - time.monotonic()
+
+
+INGEST_WRITTEN = ("inserted", "updated", "unchanged")
+
+
+def ingest_rows_bulk(supabase, rows: list[dict], stats: dict, span=None) -> list:
+    """Upsert rows with one ingest_enrichment_staging call (migration 034).
+
+    Rows travel as positional arrays in STAGING_FIELDS order, so column names are
+    not repeated per row. A missing retail_price goes as null, which the RPC never
+    writes over a stored price. Outcome codes are counted as ingest_<code>; rows the
+    RPC rejects (invalid_sku, duplicate, internet_number_conflict) are not errors,
+    they just are not counted as upserted.
+
+    Returns the per-row outcome codes.
+    """
+    payload = [[row.get(field) for field in STAGING_FIELDS] for row in rows]
+    response = supabase.rpc("ingest_enrichment_staging", {"p_rows": payload}).execute()
+    if span is not None:
+        span.add_bytes_out(payload_size(payload))
+        span.add_bytes_in(payload_size(response.data))
+    outcomes = list((response.data or {}).get("outcomes") or [])
+    if len(outcomes) != len(rows):
+        raise RuntimeError(
+            f"ingest_enrichment_staging returned {len(outcomes)} outcomes "
+            f"for {len(rows)} rows"
+        )
+    count_ingest_outcomes(outcomes, stats)
+    return outcomes
+
+
+def count_ingest_outcomes(outcomes: list, stats: dict) -> None:
+    for code in outcomes:
+        key = f"ingest_{code}"
+        stats[key] = stats.get(key, 0) + 1
+        if code in INGEST_WRITTEN:
+            stats["upserted_to_staging"] += 1
+
+
+def open_copy_ingest(config: dict) -> Optional[PgCopyIngest]:
+    """Postgres connection for WARMER_INGEST=copy (None in the other modes)."""
+    if config["ingest_mode"] != "copy":
+        return None
+    try:
+        return PgCopyIngest.connect(config["database_url"])
+    except Exception as e:
+        print(f"ERROR: WARMER_INGEST=copy could not connect to Postgres: {e}")
+        sys.exit(1)
+
+
+def ingest_batch_size(config: dict) -> int:
+    """Rows per upsert call: BATCH_SIZE, or WARMER_BULK_ROWS in bulk / copy mode."""
+    if config["ingest_mode"] in ("bulk", "copy"):
+        return config["bulk_rows"]
+    return config["batch_size"]
+
+
+def upsert_unique_items(
+    supabase,
+    unique_items: list[dict],
+    batch_size: int,
+    stats: dict,
+    span=None,
+    journal: Optional[RunJournal] = None,
+    deadline: Optional[float] = None,
+    bulk: bool = False,
+    fallback_batch_size: Optional[int] = None,
+    copy_ingest: Optional[PgCopyIngest] = None,
+) -> list[int]:
+    """Batch upsert staging rows on sku, counting upserts and failed rows in stats.
+
+    With a journal, batches it has already acknowledged are skipped and each
+    successful batch is acknowledged as soon as the upsert returns. With a deadline
+    (time.monotonic()), no batch is started that is not expected to finish in time;
+    the rest are counted as deferred_batches / deferred_rows.
+
+    With bulk=True each batch is one ingest_rows_bulk call. On a database without
+    migration 034 the run falls back to table upserts of fallback_batch_size rows
+    (default: batch_size). With copy_ingest each batch is one binary COPY + merge
+    (same outcome codes as the RPC).
+
+    Returns the indexes of the batches that were upserted.
+    """
+    total_batches = (len(unique_items) + batch_size - 1) // batch_size
+    fallback_batch_size = fallback_batch_size or batch_size
+    if journal is not None:
+        batch_indexes = journal.pending_batches(total_batches)
+    else:
+        batch_indexes = list(range(total_batches))
+
+    slowest_batch_sec = 0.0  # the first batch is always tried
+    acked: list[int] = []
+    for n, index in enumerate(batch_indexes):
+        if deadline is not None and time.monotonic() + slowest_batch_sec > deadline:
+            deferred = batch_indexes[n:]
+            stats["deferred_batches"] = len(deferred)
+            stats["deferred_rows"] = sum(
+                len(unique_items[d * batch_size : (d + 1) * batch_size])
+                for d in deferred
+            )
+            print(
+                f"  Deadline reached: deferring {len(deferred)} batches "
+                f"({stats['deferred_rows']} rows)"
+            )
+            break
+
+        i = index * batch_size
         batch = unique_items[i : i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(unique_items) + batch_size - 1) // batch_size
+        batch_num = index + 1
+        batch_started = time.monotonic()
+        upserted_before = stats["upserted_to_staging"]
 
         try:
-            supabase.table("enrichment_staging").upsert(
-                batch, on_conflict="sku"
-            ).execute()
-            stats["upserted_to_staging"] += len(batch)
+            if copy_ingest is not None:
+                count_ingest_outcomes(copy_ingest.ingest(batch)["outcomes"], stats)
+            elif bulk:
+                try:
+                    ingest_rows_bulk(supabase, batch, stats, span=span)
+                except Exception as e:
+                    if not _is_missing_rpc_error(e, "ingest_enrichment_staging"):
+                        raise
+                    print(
+                        "  WARNING: ingest_enrichment_staging not found (apply "
+                        "migration 034); falling back to row upserts"
+                    )
+                    bulk = False
+            if copy_ingest is None and not bulk:
+                for j in range(0, len(batch), fallback_batch_size):
+                    chunk = batch[j : j + fallback_batch_size]
+                    supabase.table("enrichment_staging").upsert(
+                        chunk, on_conflict="sku"
+                    ).execute()
+                    stats["upserted_to_staging"] += len(chunk)
+                    if span is not None:
+                        span.add_bytes_out(payload_size(chunk))
+            acked.append(index)
+            if journal is not None:
+                journal.ack_batch(index)
+            if span is not None:
+                span.add_items(len(batch))
 
             if batch_num % 10 == 0 or batch_num == total_batches:
                 print(
@@ -499,16 +1533,935 @@ def main():
 
         except Exception as e:
             print(f"  ERROR in batch {batch_num}: {e}")
-            stats["error_count"] += len(batch)
+            stats["error_count"] += len(batch) - (
+                stats["upserted_to_staging"] - upserted_before
+            )
+
+        slowest_batch_sec = max(slowest_batch_sec, time.monotonic() - batch_started)
 
         # Rate limit between batches
         time.sleep(0.1)
 
+    return acked
+
+
+def finish_background_prune(background_prune: BackgroundPrune, metrics) -> None:
+    """Join the background prune and record it as the "prune" stage."""
+    started = time.perf_counter()
+    result = background_prune.join() or {}
+    waited_ms = (time.perf_counter() - started) * 1000
+    metrics.record_stage(
+        "prune",
+        wall_ms=result.get("elapsed_ms", 0),
+        cpu_ms=background_prune.cpu_ms,
+        items=result.get("deleted", 0),
+    )
+    if waited_ms >= 1:
+        print(f"Waited {int(waited_ms)} ms for background prune to finish")
+
+
+def write_run_report(metrics: RunMetrics, config: dict, stats: dict) -> None:
+    """Write the per-stage metrics report (JSON, plus Prometheus textfile if configured)."""
+    metrics.set_counters(stats)
+    metrics.finish()
+    try:
+        if config["metrics_json"]:
+            metrics.write_json(config["metrics_json"])
+            print(f"Run metrics written to {config['metrics_json']}")
+        if config["metrics_prom"]:
+            metrics.write_prometheus(config["metrics_prom"])
+    except OSError as e:
+        print(f"WARNING: Failed to write run metrics: {e}")
+
+
+def open_resume_journal(config: dict) -> Optional[RunJournal]:
+    """The journal to resume from, or None (with the reason printed)."""
+    if not config["journal_dir"]:
+        print("Run journal is disabled (WARMER_JOURNAL_DIR=off); nothing to resume.")
+        return None
+    journal = RunJournal.load(config["journal_dir"])
+    if journal is None:
+        print(f"No run journal in {config['journal_dir']}; nothing to resume.")
+        return None
+    if journal.phase == "complete":
+        print(f"Last run ({journal.run_id}) completed; nothing to resume.")
+        return None
+    if journal.phase not in ("scraped", "upserting"):
+        print(
+            f"Last run ({journal.run_id}) stopped before its scrape was saved; "
+            "run without --resume."
+        )
+        return None
+    print(f"Resuming run {journal.run_id} from phase '{journal.phase}'")
+    return journal
+
+
+def load_zip_latency(config: dict) -> Optional[ZipLatency]:
+    """Per-zip latency stats for adaptive timeouts, or None when disabled."""
+    if not config["zip_latency_path"]:
+        return None
+    return ZipLatency.load(config["zip_latency_path"])
+
+
+def count_hedges(zip_results: list, stats: dict) -> None:
+    """Add hedged-request counters to stats (only when hedging happened)."""
+    hedged = sum(1 for r in zip_results if r.get("hedged"))
+    if hedged:
+        stats["hedged_requests"] = stats.get("hedged_requests", 0) + hedged
+        stats["hedge_wins"] = stats.get("hedge_wins", 0) + sum(
+            1 for r in zip_results if r.get("hedge_won")
+        )
+
+
+def scrape_items(
+    config: dict,
+    metrics: RunMetrics,
+    stats: dict,
+    journal: Optional[RunJournal],
+    background_prune: Optional[BackgroundPrune] = None,
+    budget: Optional[DeadlineBudget] = None,
+) -> tuple[list, list]:
+    """Run scraper_core (or replay the journaled scrape).
+
+    Returns (items, zip_results); zip_results is empty for a replayed scrape.
+    """
+    zip_results: list = []
+    if journal is not None and journal.phase == "scraped":
+        print("\nLoading scrape result from run journal (no upstream calls)...")
+        with metrics.stage("journal_load") as span:
+            scrape_result = journal.load_scrape()
+            span.add_items(len(scrape_result.get("data") or []))
+    else:
+        # Determine zip codes
+        zip_codes = config["zip_codes"] or DEFAULT_ATLANTA_ZIPS
+        if budget is not None:
+            # Highest expected new-SKU yield first, so a cut-off loses the least.
+            zip_codes = ZipHistory.load(config["zip_history_path"]).prioritize(
+                zip_codes
+            )
+        print(f"Using {len(zip_codes)} zip codes: {', '.join(zip_codes[:5])}...")
+
+        # Run scraper (records its own "scrape" and "normalize" stages)
+        print("\nRunning scraper_core...")
+        scrape_result = run_scrape(
+            raw_cookie=config["cookie"],
+            guild_id=config["guild"],
+            zip_codes=zip_codes,
+            api_url=os.environ.get("PENNY_API_URL") or None,
+            metrics=metrics,
+            deadline=budget.stage_end(DeadlineBudget.SCRAPE_END) if budget else None,
+            latency=load_zip_latency(config),
+            hedge=config["hedge"],
+        )
+        zip_results = scrape_result.get("zip_results") or []
+        metrics.add_zip_results(zip_results)
+        count_hedges(zip_results, stats)
+        deferred_zips = scrape_result.get("deferred_zips") or []
+        if deferred_zips:
+            stats["deferred_zips"] = len(deferred_zips)
+            print(
+                f"Scrape deadline reached: deferred {len(deferred_zips)} zips "
+                f"({', '.join(deferred_zips[:5])}{'...' if len(deferred_zips) > 5 else ''})"
+            )
+
+    if background_prune is not None:
+        # Join before upserting: a prune racing the upsert could delete a row we
+        # just refreshed (upserts do not bump created_at).
+        finish_background_prune(background_prune, metrics)
+
+    if not scrape_result.get("ok"):
+        report_scrape_failure(scrape_result)
+        sys.exit(1)
+
+    if journal is not None and journal.phase == "started":
+        with metrics.stage("journal_save"):
+            journal.save_scrape(scrape_result)
+
+    items = scrape_result.get("data", [])
+    raw_count = scrape_result.get("raw_count", len(items))
+    final_count = scrape_result.get("final_count", len(items))
+    print(
+        f"Scraper returned {len(items)} items (raw: {raw_count}, deduped: {final_count})"
+    )
+    stats["fetched_total"] = len(items)
+    return items, zip_results
+
+
+def run_warmer(config: dict, metrics: RunMetrics, stats: dict) -> None:
+    budget = None
+    if config["deadline_sec"]:
+        budget = DeadlineBudget(config["deadline_sec"])
+        stats.update(
+            {
+                "deadline_sec": config["deadline_sec"],
+                "skip_set_partial": 0,
+                "deferred_zips": 0,
+                "deferred_batches": 0,
+                "deferred_rows": 0,
+            }
+        )
+        # Chunked prune shares the skip-set slice of the budget.
+        config["prune_time_budget_sec"] = min(
+            config["prune_time_budget_sec"], config["deadline_sec"] * 0.1
+        )
+        print(f"Deadline mode: {config['deadline_sec']:.0f}s budget")
+
+    journal = None
+    if config["resume"]:
+        journal = open_resume_journal(config)
+        if journal is None:
+            return
+    elif config["due_only"]:
+        due = select_due_zips(config, stats)
+        if not due:
+            print("\nNo zips are due. Exiting.")
+            print_stats(stats)
+            return
+        config["zip_codes"] = due
+
+    # Initialize Supabase client
+    supabase = create_client(config["supabase_url"], config["supabase_key"])
+    print("Connected to Supabase")
+
+    if journal is not None and journal.phase == "upserting":
+        # Everything up to the upsert is in the journal; stats restart from the
+        # dedup snapshot and count acknowledged batches as upserted.
+        with metrics.stage("journal_load") as span:
+            unique_items = journal.load_unique_items()
+            span.add_items(len(unique_items))
+        stats.update(journal.stats)
+        stats["upserted_to_staging"] = journal.acked_rows()
+        stats["error_count"] = 0
+        batch_size = journal.batch_size or ingest_batch_size(config)
+    else:
+        background_prune = None
+        if journal is None:
+            # Prune stale staging rows before adding new ones (or alongside the scrape).
+            # A resumed run already pruned.
+            if config["prune_mode"] == "background":
+                print("\nPruning stale staging rows in the background...")
+                background_prune = BackgroundPrune(config, retention_days=60).start()
+            else:
+                print("\nPruning stale staging rows...")
+                with metrics.stage("prune") as span:
+                    if config["prune_mode"] == "single":
+                        prune_stale_staging(supabase, retention_days=60, span=span)
+                    else:
+                        pruned = prune_stale_staging_chunked(
+                            supabase,
+                            retention_days=60,
+                            chunk_size=config["prune_chunk_size"],
+                            time_budget_sec=config["prune_time_budget_sec"],
+                        )
+                        span.add_items(pruned["deleted"])
+
+            if config["journal_dir"] and not config.get("check_parity"):
+                journal = RunJournal(config["journal_dir"]).begin(
+                    {
+                        "zip_codes": config["zip_codes"] or DEFAULT_ATLANTA_ZIPS,
+                        "max_uniques": config["max_uniques"],
+                    }
+                )
+
+        # Get fully enriched Penny List SKUs (to skip).
+        print("\nFetching fully enriched SKUs from Penny List...")
+        with metrics.stage("skip_set") as span:
+            fully_enriched_skus = get_fully_enriched_skus(
+                supabase,
+                span=span,
+                deadline=budget.stage_end(DeadlineBudget.SKIP_SET_END)
+                if budget
+                else None,
+                stats=stats,
+            )
+        print(f"Found {len(fully_enriched_skus)} fully enriched SKUs in Penny List")
+
+        items, zip_results = scrape_items(
+            config, metrics, stats, journal, background_prune, budget
+        )
+
+        if config.get("check_parity"):
+            print("\nChecking batch vs per-item extraction parity...")
+            if not check_dedupe_parity(
+                items, fully_enriched_skus, config["max_uniques"]
+            ):
+                sys.exit(1)
+            return
+
+        # Dedup by SKU, then internet_number
+        print("\nProcessing and deduplicating items...")
+        with metrics.stage("dedup") as span:
+            keys = extract_key_columns(items)
+            if zip_results:
+                record_zip_history(
+                    config, items, keys, fully_enriched_skus, zip_results
+                )
+            unique_items = dedupe_items(
+                items, fully_enriched_skus, config["max_uniques"], stats, keys=keys
+            )
+            if budget is not None:
+                unique_items = prioritize_rows(unique_items)
+            span.add_items(len(unique_items))
+        print(f"Deduped to {len(unique_items)} unique items")
+
+        if unique_items:
+            with metrics.stage("conflicts") as span:
+                dropped = resolve_internet_number_conflicts(
+                    supabase, unique_items, config, stats, span=span
+                )
+                if dropped:
+                    unique_items = [
+                        row for row in unique_items if row["sku"] not in dropped
+                    ]
+                span.add_items(len(unique_items))
+
+        batch_size = ingest_batch_size(config)
+        if journal is not None:
+            with metrics.stage("journal_save"):
+                journal.save_unique_items(unique_items, batch_size, stats)
+
+    if not unique_items:
+        if journal is not None:
+            journal.complete()
+        print("\nNo new items to upsert. Exiting.")
+        print_stats(stats)
+        return
+
+    # Batch upsert to staging
+    print(f"\nUpserting {len(unique_items)} items in batches of {batch_size}...")
+    if journal is not None and stats["upserted_to_staging"]:
+        print(f"  ({stats['upserted_to_staging']} already acknowledged; skipping them)")
+    copy_ingest = open_copy_ingest(config)
+    try:
+        with metrics.stage("upsert") as span:
+            upsert_unique_items(
+                supabase,
+                unique_items,
+                batch_size,
+                stats,
+                span=span,
+                journal=journal,
+                deadline=budget.end if budget else None,
+                bulk=config["ingest_mode"] == "bulk",
+                fallback_batch_size=config["batch_size"],
+                copy_ingest=copy_ingest,
+            )
+    finally:
+        if copy_ingest is not None:
+            copy_ingest.close()
+
+    if journal is not None:
+        total_batches = (len(unique_items) + batch_size - 1) // batch_size
+        if not journal.pending_batches(total_batches):
+            journal.complete()
+        else:
+            print(
+                f"Run journal kept in {journal.directory}; "
+                "re-run with --resume to finish the remaining batches."
+            )
+
+    print_stats(stats)
+
+
+class StagedRows:
+    """Fingerprint of every row this process has staged, so unchanged rows are skipped."""
+
+    MAX_FINGERPRINTS = 500_000
+
+    def __init__(self):
+        self.fingerprints: dict[int, int] = {}  # sku code -> row fingerprint
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def changed(self, unique_items: list[dict], stats: dict) -> list[tuple]:
+        """(sku code, fingerprint, row) for rows that differ from what was last staged."""
+        stats.setdefault("skipped_unchanged", 0)
+        changed = []
+        for row in unique_items:
+            code = sku_to_code(row["sku"])
+            fingerprint = hash(tuple(sorted(row.items())))
+            if self.fingerprints.get(code) == fingerprint:
+                stats["skipped_unchanged"] += 1
+                continue
+            changed.append((code, fingerprint, row))
+        return changed
+
+    def mark(self, changed: list[tuple], acked: list[int], batch_size: int) -> None:
+        """Remember the rows of the acknowledged upsert batches of `changed`."""
+        if len(self.fingerprints) > self.MAX_FINGERPRINTS:
+            self.fingerprints.clear()
+        for index in acked:
+            for code, fingerprint, _ in changed[
+                index * batch_size : (index + 1) * batch_size
+            ]:
+                self.fingerprints[code] = fingerprint
+
+
+class WarmerDaemon:
+    """
+    Long-running warmer: one process that re-scrapes each zip when it comes due.
+
+    Kept warm across cycles: the Supabase client, scraper_core's HTTP session,
+    the skip set (refetched every skip_set_refresh_sec), per-zip history and
+    schedule, and a fingerprint of every row already staged so an unchanged row
+    is not upserted again. A cycle only scrapes the zips that are due; each
+    zip's interval follows its fresh-drop rate (see zip_interval).
+    """
+
+    RETRY_SEC = 300.0  # failed zips come due again after this (or their interval)
+    FAILING_AFTER = 3  # consecutive failed cycles before /healthz reports 503
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.zip_codes = config["zip_codes"] or DEFAULT_ATLANTA_ZIPS
+        self.supabase = create_client(config["supabase_url"], config["supabase_key"])
+        self.copy_ingest = open_copy_ingest(config)
+        self.scraper = PennyScraperCore(
+            raw_cookie=config["cookie"],
+            guild_id=config["guild"],
+            zip_codes=self.zip_codes,
+            api_url=os.environ.get("PENNY_API_URL")
+            or "https://pro.scouterdev.io/api/penny-items",
+            latency=load_zip_latency(config),
+            hedge=config["hedge"],
+        )
+        self.history = ZipHistory.load(config["zip_history_path"])
+        # time.monotonic(); picks up where the history file left off after a restart.
+        now = time.monotonic()
+        self.next_due = {
+            z: now + self.history.seconds_until_due(z, self.interval_for(z))
+            for z in self.zip_codes
+        }
+        self.skip_set: Optional[SkuSet] = None
+        self.skip_set_at: Optional[float] = None
+        self.pruned_at: Optional[float] = None
+        self.staged = StagedRows()
+        self.started_at = datetime.now(timezone.utc)
+        self.cycles = 0
+        self.consecutive_failures = 0
+        self.last_cycle: dict = {}
+        self.last_metrics: Optional[RunMetrics] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- scheduling ---
+
+    def interval_for(self, zip_code: str) -> float:
+        return zip_interval(self.config, self.history, zip_code)
+
+    def timeout_for(self, zip_code: str) -> float:
+        latency, default = self.scraper.latency, self.scraper.timeout_sec
+        return latency.timeout_for(zip_code, default) if latency else default
+
+    def due_zips(self, now: float) -> list[str]:
+        return [z for z in self.zip_codes if self.next_due[z] <= now]
+
+    def _reschedule(self, zips: list[str], zip_results: list) -> None:
+        now = time.monotonic()
+        failed = {r.get("zip_code") for r in zip_results if r.get("error")}
+        fetched = {r.get("zip_code") for r in zip_results}
+        for zip_code in zips:
+            interval = self.interval_for(zip_code)
+            if zip_code in failed or zip_code not in fetched:
+                interval = min(interval, self.RETRY_SEC)
+            self.next_due[zip_code] = now + interval
+
+    # --- warm state ---
+
+    def _maybe_prune(self, metrics: RunMetrics) -> None:
+        now = time.monotonic()
+        if self.pruned_at is not None and (
+            now - self.pruned_at < self.config["prune_interval_sec"]
+        ):
+            return
+        with metrics.stage("prune") as span:
+            pruned = prune_stale_staging_chunked(
+                self.supabase,
+                retention_days=60,
+                chunk_size=self.config["prune_chunk_size"],
+                time_budget_sec=self.config["prune_time_budget_sec"],
+            )
+            span.add_items(pruned["deleted"])
+        self.pruned_at = now
+
+    def _maybe_refresh_skip_set(self, metrics: RunMetrics) -> None:
+        now = time.monotonic()
+        if self.skip_set is not None and (
+            now - (self.skip_set_at or 0) < self.config["skip_set_refresh_sec"]
+        ):
+            return
+        with metrics.stage("skip_set") as span:
+            skip_set = get_fully_enriched_skus(self.supabase, span=span)
+        # get_fully_enriched_skus swallows errors; keep the old set over an empty one.
+        if len(skip_set) or self.skip_set is None:
+            self.skip_set = skip_set
+        self.skip_set_at = now
+        print(f"Skip set refreshed: {len(self.skip_set)} fully enriched SKUs")
+
+    # --- cycles ---
+
+    def run_cycle(self, zips: list[str]) -> bool:
+        """Scrape `zips`, stage what changed, and reschedule them. Returns success."""
+        metrics = RunMetrics(
+            "staging_warmer_daemon", trace_memory=self.config["trace_memory"]
+        )
+        stats = new_stats()
+        stats["skipped_unchanged"] = 0
+        started_at = datetime.now(timezone.utc)
+        ok, error = False, None
+        zip_results: list = []
+        print(f"\n[{started_at.isoformat()}] Cycle {self.cycles + 1}: {len(zips)} zips")
+
+        try:
+            self._maybe_prune(metrics)
+            self._maybe_refresh_skip_set(metrics)
+
+            self.scraper.metrics = metrics
+            scrape_result = self.scraper.run(zip_codes=zips)
+            zip_results = scrape_result.get("zip_results") or []
+            metrics.add_zip_results(zip_results)
+            count_hedges(zip_results, stats)
+
+            if not scrape_result.get("ok"):
+                report_scrape_failure(scrape_result)
+                error = scrape_result.get("error") or "scrape failed"
+            else:
+                items = scrape_result.get("data", [])
+                stats["fetched_total"] = len(items)
+                with metrics.stage("dedup") as span:
+                    keys = extract_key_columns(items)
+                    record_zip_history(
+                        self.config,
+                        items,
+                        keys,
+                        self.skip_set,
+                        zip_results,
+                        history=self.history,
+                    )
+                    unique_items = dedupe_items(
+                        items,
+                        self.skip_set,
+                        self.config["max_uniques"],
+                        stats,
+                        keys=keys,
+                    )
+                    changed = self.staged.changed(unique_items, stats)
+                    span.add_items(len(changed))
+
+                with metrics.stage("conflicts") as span:
+                    dropped = resolve_internet_number_conflicts(
+                        self.supabase,
+                        [row for _, _, row in changed],
+                        self.config,
+                        stats,
+                        span=span,
+                    )
+                    changed = [c for c in changed if c[2]["sku"] not in dropped]
+                    span.add_items(len(changed))
+
+                batch_size = ingest_batch_size(self.config)
+                with metrics.stage("upsert") as span:
+                    acked = upsert_unique_items(
+                        self.supabase,
+                        [row for _, _, row in changed],
+                        batch_size,
+                        stats,
+                        span=span,
+                        bulk=self.config["ingest_mode"] == "bulk",
+                        fallback_batch_size=self.config["batch_size"],
+                        copy_ingest=self.copy_ingest,
+                    )
+                self.staged.mark(changed, acked, batch_size)
+                ok = stats["error_count"] <= stats["upserted_to_staging"] * 0.1
+                if not ok:
+                    error = "high upsert error rate"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"ERROR: Cycle failed: {error}")
+        # After record_zip_history, so fresh-drop rates feed the next interval.
+        self._reschedule(zips, zip_results)
+
+        write_run_report(metrics, self.config, stats)
+        print_stats(stats, exit_on_error=False)
+
+        with self._lock:
+            self.cycles += 1
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            self.last_metrics = metrics
+            self.last_cycle = {
+                "started_at": started_at.isoformat(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "ok": ok,
+                "error": error,
+                "zips": list(zips),
+                "stats": dict(stats),
+            }
+        return ok
+
+    def run_forever(self) -> None:
+        """Run cycles until stop() (SIGINT/SIGTERM); sleeps until the next zip is due."""
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = self.due_zips(now)
+            if due:
+                self.run_cycle(due)
+                continue
+            wait = min(self.next_due.values()) - now
+            self._stop.wait(max(1.0, min(wait, 60.0)))
+        self.scraper.close()
+        if self.copy_ingest is not None:
+            self.copy_ingest.close()
+
+    def stop(self, *_args) -> None:
+        self._stop.set()
+
+    # --- health endpoint ---
+
+    def health(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            failing = self.consecutive_failures >= self.FAILING_AFTER
+            return {
+                "status": "failing" if failing else "ok",
+                "pid": os.getpid(),
+                "started_at": self.started_at.isoformat(),
+                "cycles": self.cycles,
+                "consecutive_failures": self.consecutive_failures,
+                "last_cycle": self.last_cycle,
+                "skip_set": {
+                    "size": len(self.skip_set) if self.skip_set is not None else None,
+                    "age_sec": round(now - self.skip_set_at)
+                    if self.skip_set_at is not None
+                    else None,
+                },
+                "staged_fingerprints": len(self.staged),
+                "zips": {
+                    z: {
+                        "due_in_sec": max(0, round(self.next_due[z] - now)),
+                        "interval_sec": round(self.interval_for(z)),
+                        "yield_ewma": self.history.expected_yield(z),
+                        "drops_per_hour": self.history.drop_rate(z),
+                        "timeout_sec": round(self.timeout_for(z), 2),
+                    }
+                    for z in self.zip_codes
+                },
+            }
+
+    def metrics_text(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            text = self.last_metrics.to_prometheus() if self.last_metrics else ""
+            lines = [
+                "# HELP penny_warmer_daemon_cycles_total Cycles run since start.",
+                "# TYPE penny_warmer_daemon_cycles_total counter",
+                f"penny_warmer_daemon_cycles_total {self.cycles}",
+                "# HELP penny_warmer_daemon_consecutive_failures Failed cycles in a row.",
+                "# TYPE penny_warmer_daemon_consecutive_failures gauge",
+                f"penny_warmer_daemon_consecutive_failures {self.consecutive_failures}",
+                "# HELP penny_warmer_daemon_skip_set_size SKUs in the in-memory skip set.",
+                "# TYPE penny_warmer_daemon_skip_set_size gauge",
+                f"penny_warmer_daemon_skip_set_size {len(self.skip_set or ())}",
+                "# HELP penny_warmer_daemon_zip_due_seconds Seconds until each zip is due.",
+                "# TYPE penny_warmer_daemon_zip_due_seconds gauge",
+            ]
+            lines += [
+                f'penny_warmer_daemon_zip_due_seconds{{zip="{z}"}} '
+                f"{max(0.0, round(self.next_due[z] - now, 1))}"
+                for z in self.zip_codes
+            ]
+        return text + "\n".join(lines) + "\n"
+
+
+def run_daemon(config: dict) -> None:
+    daemon = WarmerDaemon(config)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+
+    server = None
+    if config["health_port"]:
+        try:
+            server = HealthServer(
+                config["health_port"], daemon.health, daemon.metrics_text
+            ).start()
+            print(
+                f"Health endpoint: http://127.0.0.1:{server.port}/healthz (+ /metrics)"
+            )
+        except OSError as e:
+            print(f"WARNING: Health endpoint not started: {e}")
+
+    intervals = [daemon.interval_for(z) for z in daemon.zip_codes]
+    due_now = len(daemon.due_zips(time.monotonic()))
+    print(
+        f"Daemon mode: {len(daemon.zip_codes)} zips ({due_now} due now), "
+        f"intervals {min(intervals):.0f}s-{max(intervals):.0f}s"
+    )
+    try:
+        daemon.run_forever()
+    finally:
+        if server is not None:
+            server.stop()
+        print("Daemon stopped")
+
+
+# --- work queue ---
+
+
+def run_queue_coordinator(config: dict, args: argparse.Namespace) -> None:
+    """--enqueue and/or --queue-status against the shared zip work queue."""
+    supabase = create_client(config["supabase_url"], config["supabase_key"])
+    queue = open_zip_queue(config["queue"], supabase)
+    run_id = config["queue_run"]
+
+    if args.enqueue:
+        if args.all_stores:
+            zip_codes = store_directory_zips()
+        else:
+            zip_codes = config["zip_codes"] or DEFAULT_ATLANTA_ZIPS
+        added = queue.enqueue(run_id, zip_codes)
+        print(f"Run {run_id}: enqueued {added} new zips ({len(zip_codes)} requested)")
+        # Workers never prune; doing it once here keeps them from racing on it.
+        if added:
+            print("\nPruning stale staging rows...")
+            pruned = prune_stale_staging_chunked(
+                supabase,
+                retention_days=60,
+                chunk_size=config["prune_chunk_size"],
+                time_budget_sec=config["prune_time_budget_sec"],
+            )
+            print(f"Pruned {pruned['deleted']} stale staging rows")
+
+    summary = queue.summary(run_id)
+    print(
+        f"\nRun {run_id}: {summary['done']}/{summary['zips']} zips done, "
+        f"{summary['pending']} pending, {summary['leased']} leased "
+        f"({summary['live_leases']} live), {summary['failed']} failed, "
+        f"{summary['workers']} workers"
+    )
+    if args.queue_status and summary["workers"]:
+        print("\nMerged worker stats:")
+        print_stats(summary["stats"], exit_on_error=False)
+    queue.close()
+
+
+def worker_path(path: Optional[str], worker_id: str) -> Optional[str]:
+    """`path` with the worker id before its extension (report.json -> report.<id>.json)."""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{re.sub(r'[^A-Za-z0-9_.-]', '-', worker_id)}{ext}"
+
+
+def run_queue_worker(config: dict, metrics: RunMetrics, stats: dict) -> None:
+    """
+    Claim shards of zips from the work queue until it drains.
+
+    Each shard is scraped, deduped against the skip set (fetched once) and the rows
+    this worker already staged, upserted, and completed under a heartbeated lease.
+    A zip whose lease lapses (worker died or stalled) is picked up by another worker.
+    """
+    supabase = create_client(config["supabase_url"], config["supabase_key"])
+    queue = open_zip_queue(config["queue"], supabase)
+    run_id = config["queue_run"]
+    worker_id = new_worker_id()
+    lease_sec = config["queue_lease_sec"]
+    print(f"Worker {worker_id} on run {run_id} ({config['queue']})")
+    # Zip history and latency merge into shared files under a lock; the run report
+    # is per process, so each worker writes its own.
+    config["metrics_json"] = worker_path(config["metrics_json"], worker_id)
+    config["metrics_prom"] = worker_path(config["metrics_prom"], worker_id)
+    metrics.labels["worker"] = worker_id
+
+    print("\nFetching fully enriched SKUs from Penny List...")
+    with metrics.stage("skip_set") as span:
+        fully_enriched_skus = get_fully_enriched_skus(supabase, span=span)
+    print(f"Found {len(fully_enriched_skus)} fully enriched SKUs in Penny List")
+
+    copy_ingest = open_copy_ingest(config)
+    scraper = PennyScraperCore(
+        raw_cookie=config["cookie"],
+        guild_id=config["guild"],
+        api_url=os.environ.get("PENNY_API_URL")
+        or "https://pro.scouterdev.io/api/penny-items",
+        metrics=metrics,
+        latency=load_zip_latency(config),
+        hedge=config["hedge"],
+    )
+    staged = StagedRows()
+    failed_shards = 0
+    shards = 0
+    try:
+        while True:
+            zips = queue.claim(run_id, worker_id, config["queue_claim_size"], lease_sec)
+            if not zips:
+                summary = queue.summary(run_id)
+                if not summary["outstanding"]:
+                    break
+                # Others hold the rest; wait in case a lease lapses and comes back.
+                time.sleep(min(30.0, max(1.0, lease_sec / 3)))
+                continue
+
+            shards += 1
+            shard_stats = new_stats()
+            print(f"\nShard {shards}: {len(zips)} zips ({', '.join(zips[:5])}...)")
+            with LeaseHeartbeat(queue, run_id, worker_id, zips, lease_sec) as lease:
+                scrape_result = scraper.run(zip_codes=zips)
+                zip_results = scrape_result.get("zip_results") or []
+                metrics.add_zip_results(zip_results)
+                count_hedges(zip_results, shard_stats)
+
+                if scrape_result.get("ok"):
+                    failed_shards = 0
+                    items = scrape_result.get("data", [])
+                    shard_stats["fetched_total"] = len(items)
+                    with metrics.stage("dedup") as span:
+                        keys = extract_key_columns(items)
+                        record_zip_history(
+                            config, items, keys, fully_enriched_skus, zip_results
+                        )
+                        unique_items = dedupe_items(
+                            items,
+                            fully_enriched_skus,
+                            config["max_uniques"],
+                            shard_stats,
+                            keys=keys,
+                        )
+                        changed = staged.changed(unique_items, shard_stats)
+                        span.add_items(len(changed))
+                    with metrics.stage("conflicts") as span:
+                        dropped = resolve_internet_number_conflicts(
+                            supabase,
+                            [row for _, _, row in changed],
+                            config,
+                            shard_stats,
+                            span=span,
+                        )
+                        changed = [c for c in changed if c[2]["sku"] not in dropped]
+                        span.add_items(len(changed))
+                    with metrics.stage("upsert") as span:
+                        acked = upsert_unique_items(
+                            supabase,
+                            [row for _, _, row in changed],
+                            ingest_batch_size(config),
+                            shard_stats,
+                            span=span,
+                            bulk=config["ingest_mode"] == "bulk",
+                            fallback_batch_size=config["batch_size"],
+                            copy_ingest=copy_ingest,
+                        )
+                    staged.mark(changed, acked, ingest_batch_size(config))
+                else:
+                    failed_shards += 1
+                    report_scrape_failure(scrape_result)
+
+            results = {
+                r["zip_code"]: {"count": r.get("count") or 0, "error": r.get("error")}
+                for r in zip_results
+                if r.get("zip_code") in zips
+            }
+            for zip_code in zips:
+                results.setdefault(
+                    zip_code, {"count": 0, "error": scrape_result.get("error")}
+                )
+            if lease.lost:
+                print("  WARNING: Lost the lease on some zips; another worker has them")
+            queue.complete(run_id, worker_id, results)
+
+            stats.update(merge_stats([stats, shard_stats]))
+            stats["shards"] = shards
+            queue.report_stats(run_id, worker_id, stats)
+
+            if failed_shards >= 3:
+                print("ERROR: 3 shards in a row failed to scrape; stopping this worker")
+                sys.exit(1)
+    finally:
+        scraper.close()
+        if copy_ingest is not None:
+            copy_ingest.close()
+
+    print(f"\nWork queue for run {run_id} drained; this worker ran {shards} shards")
     print_stats(stats)
 
 
-def print_stats(stats: dict):
-    """Print final statistics."""
+def main():
+    args = parse_args()
+
+    if create_client is None:
+        print("ERROR: supabase package not installed. Run: pip install supabase")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("ENRICHMENT STAGING WARMER")
+    print("=" * 60)
+
+    # Load config
+    coordinator_only = (args.enqueue or args.queue_status) and not args.worker
+    config = get_config(resume=args.resume, scrape=not coordinator_only)
+    config["check_parity"] = args.check_parity
+    if args.trace_memory:
+        config["trace_memory"] = True
+    if args.deadline is not None:
+        config["deadline_sec"] = args.deadline if args.deadline > 0 else None
+    if args.interval is not None and args.interval > 0:
+        config["interval_sec"] = args.interval
+    if args.due_only:
+        config["due_only"] = True
+    print(
+        f"Config: max_uniques={config['max_uniques']}, batch_size={config['batch_size']}"
+        + (
+            f", {config['ingest_mode']} ingest of {config['bulk_rows']} rows per call"
+            if config["ingest_mode"] != "rows"
+            else ""
+        )
+    )
+
+    if args.daemon:
+        run_daemon(config)
+        return
+
+    queue_mode = args.enqueue or args.worker or args.queue_status
+    if queue_mode:
+        if not args.queue:
+            print(
+                "ERROR: --enqueue / --worker / --queue-status need --queue or WARMER_QUEUE"
+            )
+            sys.exit(1)
+        config["queue"] = args.queue
+        config["queue_run"] = args.queue_run or datetime.now(timezone.utc).strftime(
+            "%Y-%m-%d"
+        )
+    if args.enqueue or args.queue_status:
+        run_queue_coordinator(config, args)
+        if not args.worker:
+            return
+
+    profiler = None
+    if args.profile or profile_enabled_from_env():
+        profiler = StageProfiler(args.profile_dir)
+        profiler.start()
+        print(f"Profiling enabled (output: {profiler.out_dir})")
+
+    metrics = RunMetrics(
+        "staging_warmer", trace_memory=config["trace_memory"], profiler=profiler
+    )
+    stats = new_stats()
+    try:
+        if args.worker:
+            run_queue_worker(config, metrics, stats)
+        else:
+            run_warmer(config, metrics, stats)
+    finally:
+        # Runs on sys.exit(1) too, so failed runs still leave a report behind.
+        write_run_report(metrics, config, stats)
+        if profiler:
+            profiler.stop()
+            if profiler.write():
+                print("\n" + profiler.format_summary())
+                print(f"Profile written to {profiler.out_dir}")
+
+
+def print_stats(stats: dict, exit_on_error: bool = True):
+    """Print final statistics (and exit 1 on a high error rate unless told not to)."""
     print("\n" + "=" * 60)
     print("STAGING WARMER COMPLETE")
     print("=" * 60)
@@ -519,7 +2472,8 @@ def print_stats(stats: dict):
     # Exit with error code if too many errors
     if stats["error_count"] > stats["upserted_to_staging"] * 0.1:
         print("WARNING: High error rate detected")
-        sys.exit(1)
+        if exit_on_error:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
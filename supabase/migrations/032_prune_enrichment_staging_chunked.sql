@@ -0,0 +1,56 @@
+-- Migration: 032_prune_enrichment_staging_chunked.sql
+-- Purpose: Count-only, bounded pruning of stale enrichment_staging rows.
+--
+-- Why:
+-- - The staging warmer pruned with one unbounded DELETE ... WHERE created_at < cutoff
+--   and counted with len(result.data), so PostgREST returned every deleted row.
+-- - That single statement held row locks on the whole stale set while the consume /
+--   apply RPCs (migrations 029/031) were deleting and reading the same table.
+--
+-- Policy:
+-- - Each call deletes at most p_limit rows, oldest first (idx_staging_created_at).
+-- - Rows locked by a concurrent consume are skipped (SKIP LOCKED), not waited on.
+-- - Returns only the number of rows deleted; callers loop until it is < p_limit.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION prune_enrichment_staging_chunk(
+  p_cutoff TIMESTAMPTZ,
+  p_limit INT DEFAULT 500
+)
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_deleted INT := 0;
+BEGIN
+  IF p_cutoff IS NULL OR p_limit IS NULL OR p_limit < 1 THEN
+    RETURN 0;
+  END IF;
+
+  WITH doomed AS (
+    SELECT sku
+    FROM enrichment_staging
+    WHERE created_at < p_cutoff
+    ORDER BY created_at
+    LIMIT LEAST(p_limit, 5000)
+    FOR UPDATE SKIP LOCKED
+  )
+  DELETE FROM enrichment_staging s
+  USING doomed d
+  WHERE s.sku = d.sku;
+
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+  RETURN v_deleted;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION prune_enrichment_staging_chunk(TIMESTAMPTZ, INT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION prune_enrichment_staging_chunk(TIMESTAMPTZ, INT) TO service_role;
+
+COMMENT ON FUNCTION prune_enrichment_staging_chunk IS
+  'Deletes up to p_limit enrichment_staging rows older than p_cutoff (oldest first, skipping locked rows) and returns the count.';
+
+COMMIT;
@@ -0,0 +1,236 @@
+-- Migration: 033_zip_work_queue.sql
+-- Purpose: Shared zip work queue so several staging-warmer workers split one scrape.
+--
+-- Why:
+-- - Each staging-warmer process owned its whole zip list; two processes duplicated
+--   every request and raced on the same upserts.
+-- - Covering every store zip in data/stores/store_directory.master.json (~2,000)
+--   within one scheduler window needs several workers, possibly on several machines.
+--
+-- Policy:
+-- - A run (run_id) is a set of zips enqueued once; enqueueing again adds only new zips.
+-- - claim_zip_work leases pending (or lease-expired) zips in enqueue order, skipping
+--   rows another worker is claiming right now (SKIP LOCKED). Each claim is an attempt;
+--   a zip whose lease expires after p_max_attempts claims is marked failed.
+-- - heartbeat_zip_work extends only the caller's own leases; complete_zip_work only
+--   finishes zips the caller still holds, so a worker that lost its lease cannot
+--   overwrite the new owner's result.
+-- - Service role only (no RLS policies), like the other warmer tables.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.zip_work_queue (
+  run_id TEXT NOT NULL,
+  zip_code TEXT NOT NULL,
+  position BIGSERIAL,
+  status TEXT NOT NULL DEFAULT 'pending'
+    CHECK (status IN ('pending', 'leased', 'done', 'failed')),
+  lease_owner TEXT,
+  lease_expires_at TIMESTAMPTZ,
+  attempts INT NOT NULL DEFAULT 0,
+  result JSONB,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (run_id, zip_code)
+);
+
+CREATE INDEX IF NOT EXISTS idx_zip_work_queue_claim
+  ON public.zip_work_queue(run_id, status, position);
+
+CREATE TABLE IF NOT EXISTS public.zip_work_workers (
+  run_id TEXT NOT NULL,
+  worker_id TEXT NOT NULL,
+  stats JSONB,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (run_id, worker_id)
+);
+
+ALTER TABLE public.zip_work_queue ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.zip_work_workers ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION enqueue_zip_work(p_run_id TEXT, p_zip_codes TEXT[])
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_added INT := 0;
+BEGIN
+  INSERT INTO public.zip_work_queue(run_id, zip_code)
+  SELECT p_run_id, z.zip_code
+  FROM unnest(p_zip_codes) WITH ORDINALITY AS z(zip_code, ord)
+  WHERE z.zip_code IS NOT NULL
+  ORDER BY z.ord
+  ON CONFLICT (run_id, zip_code) DO NOTHING;
+
+  GET DIAGNOSTICS v_added = ROW_COUNT;
+  RETURN v_added;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION claim_zip_work(
+  p_run_id TEXT,
+  p_worker_id TEXT,
+  p_limit INT DEFAULT 10,
+  p_lease_sec INT DEFAULT 300,
+  p_max_attempts INT DEFAULT 3
+)
+RETURNS TABLE(zip_code TEXT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_limit IS NULL OR p_limit < 1 THEN
+    RETURN;
+  END IF;
+
+  UPDATE public.zip_work_queue q
+  SET status = 'failed',
+      lease_owner = NULL,
+      result = jsonb_build_object('error', 'lease_expired'),
+      updated_at = now()
+  WHERE q.run_id = p_run_id
+    AND q.status = 'leased'
+    AND q.lease_expires_at < now()
+    AND q.attempts >= p_max_attempts;
+
+  RETURN QUERY
+  WITH claimable AS (
+    SELECT q.run_id, q.zip_code
+    FROM public.zip_work_queue q
+    WHERE q.run_id = p_run_id
+      AND (q.status = 'pending'
+           OR (q.status = 'leased' AND q.lease_expires_at < now()))
+    ORDER BY q.position
+    LIMIT LEAST(p_limit, 500)
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE public.zip_work_queue q
+  SET status = 'leased',
+      lease_owner = p_worker_id,
+      lease_expires_at = now() + make_interval(secs => p_lease_sec),
+      attempts = q.attempts + 1,
+      updated_at = now()
+  FROM claimable c
+  WHERE q.run_id = c.run_id AND q.zip_code = c.zip_code
+  RETURNING q.zip_code;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION heartbeat_zip_work(
+  p_run_id TEXT,
+  p_worker_id TEXT,
+  p_zip_codes TEXT[],
+  p_lease_sec INT DEFAULT 300
+)
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_held INT := 0;
+BEGIN
+  UPDATE public.zip_work_queue
+  SET lease_expires_at = now() + make_interval(secs => p_lease_sec),
+      updated_at = now()
+  WHERE run_id = p_run_id
+    AND zip_code = ANY(p_zip_codes)
+    AND status = 'leased'
+    AND lease_owner = p_worker_id;
+
+  GET DIAGNOSTICS v_held = ROW_COUNT;
+  RETURN v_held;
+END;
+$$;
+
+-- p_results: {"<zip>": {"count": 512, "error": null}, ...}
+CREATE OR REPLACE FUNCTION complete_zip_work(
+  p_run_id TEXT,
+  p_worker_id TEXT,
+  p_results JSONB,
+  p_max_attempts INT DEFAULT 3
+)
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_updated INT := 0;
+BEGIN
+  UPDATE public.zip_work_queue q
+  SET status = CASE
+        WHEN COALESCE(r.value->>'error', '') = '' THEN 'done'
+        WHEN q.attempts >= p_max_attempts THEN 'failed'
+        ELSE 'pending'
+      END,
+      lease_owner = NULL,
+      lease_expires_at = NULL,
+      result = r.value,
+      updated_at = now()
+  FROM jsonb_each(COALESCE(p_results, '{}'::jsonb)) AS r(key, value)
+  WHERE q.run_id = p_run_id
+    AND q.zip_code = r.key
+    AND q.status = 'leased'
+    AND q.lease_owner = p_worker_id;
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION zip_work_summary(p_run_id TEXT)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT jsonb_build_object(
+    'counts', COALESCE((
+      SELECT jsonb_object_agg(status, n)
+      FROM (
+        SELECT status, COUNT(*) AS n
+        FROM public.zip_work_queue
+        WHERE run_id = p_run_id
+        GROUP BY status
+      ) s
+    ), '{}'::jsonb),
+    'live_leases', (
+      SELECT COUNT(*)
+      FROM public.zip_work_queue
+      WHERE run_id = p_run_id AND status = 'leased' AND lease_expires_at >= now()
+    ),
+    'workers', COALESCE((
+      SELECT jsonb_object_agg(worker_id, COALESCE(stats, '{}'::jsonb))
+      FROM public.zip_work_workers
+      WHERE run_id = p_run_id
+    ), '{}'::jsonb)
+  );
+$$;
+
+REVOKE ALL ON FUNCTION enqueue_zip_work(TEXT, TEXT[]) FROM PUBLIC;
+REVOKE ALL ON FUNCTION claim_zip_work(TEXT, TEXT, INT, INT, INT) FROM PUBLIC;
+REVOKE ALL ON FUNCTION heartbeat_zip_work(TEXT, TEXT, TEXT[], INT) FROM PUBLIC;
+REVOKE ALL ON FUNCTION complete_zip_work(TEXT, TEXT, JSONB, INT) FROM PUBLIC;
+REVOKE ALL ON FUNCTION zip_work_summary(TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION enqueue_zip_work(TEXT, TEXT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_zip_work(TEXT, TEXT, INT, INT, INT) TO service_role;
+GRANT EXECUTE ON FUNCTION heartbeat_zip_work(TEXT, TEXT, TEXT[], INT) TO service_role;
+GRANT EXECUTE ON FUNCTION complete_zip_work(TEXT, TEXT, JSONB, INT) TO service_role;
+GRANT EXECUTE ON FUNCTION zip_work_summary(TEXT) TO service_role;
+
+COMMENT ON FUNCTION enqueue_zip_work IS
+  'Adds zips to a warmer work-queue run (existing zips are left alone); returns zips added.';
+COMMENT ON FUNCTION claim_zip_work IS
+  'Leases up to p_limit pending or lease-expired zips of a run to p_worker_id (SKIP LOCKED).';
+COMMENT ON FUNCTION heartbeat_zip_work IS
+  'Extends the caller''s leases on p_zip_codes; returns how many it still holds.';
+COMMENT ON FUNCTION complete_zip_work IS
+  'Finishes zips the caller still holds: done, or back to pending / failed on error.';
+COMMENT ON FUNCTION zip_work_summary IS
+  'Zip counts by status, live leases, and per-worker stats for a warmer work-queue run.';
+
+COMMIT;
@@ -0,0 +1,150 @@
+-- Migration: 034_ingest_enrichment_staging_bulk.sql
+-- Purpose: Set-wise bulk ingest of staging rows in one RPC call, with per-row outcomes.
+--
+-- Why:
+-- - The staging warmer sent len(rows) / BATCH_SIZE PostgREST upserts (about 120 for
+--   6,000 rows), each repeating every column name for every row.
+-- - One row whose internet_number belongs to another SKU failed its whole batch.
+--
+-- Payload (p_rows): a JSON array of row arrays, columns in this fixed order:
+--   [sku, internet_number, barcode_upc, item_name, brand, retail_price, image_url, product_link]
+--
+-- Policy (same as the warmer's PostgREST upsert, plus per-row checks):
+-- - Upsert on sku. A NULL retail_price never overwrites a stored one (the warmer
+--   used to drop the key); other columns take the incoming value, NULL included.
+-- - created_at is not touched on update (pruning still ages rows from first insert).
+-- - Rows identical to the stored row are not rewritten.
+-- - Per-row outcome codes, in payload order:
+--     inserted | updated | unchanged
+--     invalid_sku               fails the enrichment_staging CHECK
+--     duplicate                 same sku earlier in the payload (first one wins)
+--     internet_number_conflict  internet_number already held by another sku, in the
+--                               table or earlier in the payload (the row is skipped)
+-- - Returns {"counts": {code: n}, "outcomes": [code, ...]}.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION ingest_enrichment_staging(p_rows JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_outcomes JSONB;
+  v_counts JSONB;
+BEGIN
+  IF p_rows IS NULL OR jsonb_typeof(p_rows) <> 'array' THEN
+    RETURN jsonb_build_object('counts', '{}'::jsonb, 'outcomes', '[]'::jsonb);
+  END IF;
+
+  WITH src AS (
+    SELECT
+      r.ord,
+      NULLIF(btrim(r.v->>0), '') AS sku,
+      CASE WHEN (r.v->>1) ~ '^[0-9]{1,18}$' THEN (r.v->>1)::BIGINT END AS internet_number,
+      NULLIF(r.v->>2, '') AS barcode_upc,
+      NULLIF(r.v->>3, '') AS item_name,
+      NULLIF(r.v->>4, '') AS brand,
+      CASE
+        WHEN (r.v->>5) ~ '^[0-9]{1,7}(\.[0-9]+)?$' THEN round((r.v->>5)::NUMERIC, 2)
+      END AS retail_price,
+      NULLIF(r.v->>6, '') AS image_url,
+      NULLIF(r.v->>7, '') AS product_link
+    FROM (
+      -- Anything that is not a row array gets an outcome too (invalid_sku).
+      SELECT CASE WHEN jsonb_typeof(e.v) = 'array' THEN e.v ELSE '[]'::jsonb END AS v, e.ord
+      FROM jsonb_array_elements(p_rows) WITH ORDINALITY AS e(v, ord)
+    ) r
+  ),
+  ranked AS (
+    SELECT
+      src.*,
+      COALESCE(sku ~ '^[0-9]{6}$' OR sku ~ '^10[01][0-9]{7}$', FALSE) AS valid_sku,
+      row_number() OVER (PARTITION BY sku ORDER BY ord) AS sku_rank
+    FROM src
+  ),
+  ranked_internet AS (
+    SELECT
+      r.*,
+      row_number() OVER (
+        PARTITION BY (r.valid_sku AND r.sku_rank = 1), r.internet_number
+        ORDER BY r.ord
+      ) AS internet_rank
+    FROM ranked r
+  ),
+  classified AS (
+    SELECT
+      r.*,
+      CASE
+        WHEN NOT r.valid_sku THEN 'invalid_sku'
+        WHEN r.sku_rank > 1 THEN 'duplicate'
+        WHEN r.internet_number IS NOT NULL AND (
+          r.internet_rank > 1
+          OR EXISTS (
+            SELECT 1
+            FROM enrichment_staging e
+            WHERE e.internet_number = r.internet_number AND e.sku <> r.sku
+          )
+        ) THEN 'internet_number_conflict'
+      END AS rejected
+    FROM ranked_internet r
+  ),
+  written AS (
+    INSERT INTO enrichment_staging AS s (
+      sku, internet_number, barcode_upc, item_name, brand, retail_price, image_url, product_link
+    )
+    SELECT
+      sku, internet_number, barcode_upc, item_name, brand, retail_price, image_url, product_link
+    FROM classified
+    WHERE rejected IS NULL
+    ON CONFLICT (sku) DO UPDATE
+    SET internet_number = EXCLUDED.internet_number,
+        barcode_upc = EXCLUDED.barcode_upc,
+        item_name = EXCLUDED.item_name,
+        brand = EXCLUDED.brand,
+        retail_price = COALESCE(EXCLUDED.retail_price, s.retail_price),
+        image_url = EXCLUDED.image_url,
+        product_link = EXCLUDED.product_link
+    WHERE (s.internet_number, s.barcode_upc, s.item_name, s.brand, s.retail_price,
+           s.image_url, s.product_link)
+      IS DISTINCT FROM
+          (EXCLUDED.internet_number, EXCLUDED.barcode_upc, EXCLUDED.item_name,
+           EXCLUDED.brand, COALESCE(EXCLUDED.retail_price, s.retail_price),
+           EXCLUDED.image_url, EXCLUDED.product_link)
+    RETURNING s.sku, (xmax = 0) AS inserted
+  ),
+  outcomes AS (
+    SELECT
+      c.ord,
+      COALESCE(
+        c.rejected,
+        CASE
+          WHEN w.sku IS NULL THEN 'unchanged'
+          WHEN w.inserted THEN 'inserted'
+          ELSE 'updated'
+        END
+      ) AS outcome
+    FROM classified c
+    LEFT JOIN written w ON c.rejected IS NULL AND w.sku = c.sku
+  )
+  SELECT
+    COALESCE(jsonb_agg(outcome ORDER BY ord), '[]'::jsonb),
+    COALESCE((
+      SELECT jsonb_object_agg(outcome, n)
+      FROM (SELECT outcome, COUNT(*) AS n FROM outcomes GROUP BY outcome) c
+    ), '{}'::jsonb)
+  INTO v_outcomes, v_counts
+  FROM outcomes;
+
+  RETURN jsonb_build_object('counts', v_counts, 'outcomes', v_outcomes);
+END;
+$$;
+
+REVOKE ALL ON FUNCTION ingest_enrichment_staging(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION ingest_enrichment_staging(JSONB) TO service_role;
+
+COMMENT ON FUNCTION ingest_enrichment_staging IS
+  'Set-wise upsert of staging rows (JSON array of row arrays) preserving non-null retail_price; returns per-row outcome codes.';
+
+COMMIT;
@@ -0,0 +1,120 @@
+"""
+Offline parity test for scripts/staging-warmer.py dedup.
+
+dedupe_items (column-wise, numpy first-occurrence with a sequential fallback)
+must return exactly the rows and stats of dedupe_items_per_item (the reference
+per-item path) on every input. This runs both on synthetic scrape items, with
+and without internet_number clashes and at several max_uniques, and fails on
+the first difference. No scrape or Supabase needed (the live comparison is
+staging-warmer.py --check-parity).
+
+Usage:
+    python tests/staging-warmer-dedupe-parity.py
+"""
+
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+N_ITEMS = 20_000
+
+
+def load_warmer():
+    spec = importlib.util.spec_from_file_location(
+        "staging_warmer", os.path.join(ROOT, "scripts", "staging-warmer.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_scrape_items(warmer, n: int, seed: int) -> tuple:
+    """
+    n scrape-shaped items plus a skip set.
+
+    SKUs repeat and mix 6- and 10-digit forms with invalid and padded values,
+    and every key alias is used. Each SKU has its own internet number; odd seeds
+    also reuse internet numbers across SKUs, which takes dedup off the numpy path
+    onto the sequential fallback.
+    """
+    rng = np.random.default_rng(seed)
+    pool = max(n // 4, 1)
+    sku_pool = [
+        f"100{rng.integers(10**7):07d}" if rng.random() < 0.5 else str(100000 + k)
+        for k in range(pool)
+    ]
+    junk = ["", "  ", "12345", "10212345678", "abc123", None, 123456, "9" * 5000]
+
+    def pick(keys):
+        return keys[int(rng.integers(len(keys)))]
+
+    items = []
+    for _ in range(n):
+        r = rng.random()
+        k = int(rng.integers(pool))
+        if r < 0.05:
+            sku = pick(junk)
+        else:
+            sku = sku_pool[k]
+            if r < 0.1:
+                sku = f" {sku} "
+        item = {
+            pick(warmer.SKU_KEYS): sku,
+            pick(warmer.NAME_KEYS): f"Item {sku}",
+            "brand": "Brand" if rng.random() < 0.7 else None,
+        }
+        if r >= 0.05 and rng.random() < 0.8:
+            if seed % 2 and rng.random() < 0.02:
+                k = int(rng.integers(pool))
+            item[pick(warmer.INTERNET_KEYS)] = str(300000000 + k)
+        if rng.random() < 0.5:
+            item[warmer.RETAIL_CENTS_KEY] = int(rng.integers(100, 50000))
+        elif rng.random() < 0.5:
+            price = f"${rng.integers(1, 500)}.{rng.integers(100):02d}"
+            item[pick(warmer.RETAIL_PRICE_KEYS)] = price
+        if rng.random() < 0.5:
+            item[pick(warmer.UPC_KEYS)] = str(rng.integers(10**11, 10**12))
+        if rng.random() < 0.5:
+            item[pick(warmer.IMAGE_KEYS)] = f"https://images.example/{sku}.jpg"
+        items.append(item)
+    enriched = warmer.SkuSet.from_skus(s for s in sku_pool if rng.random() < 0.2)
+    return items, enriched
+
+
+def uses_numpy_path(warmer, items: list, enriched) -> bool:
+    keys = warmer.extract_key_columns(items)
+    codes = keys["sku_code"]
+    candidates = np.flatnonzero((codes >= 0) & ~enriched.contains_many(codes))
+    rows = warmer._first_unique_rows(codes, keys["internet_number"], candidates)
+    return rows is not None
+
+
+def main() -> int:
+    warmer = load_warmer()
+    paths = set()
+    cases = 0
+    for seed in range(4):
+        items, enriched = synthetic_scrape_items(warmer, N_ITEMS, seed)
+        paths.add(uses_numpy_path(warmer, items, enriched))
+        for max_uniques in (10**9, N_ITEMS // 10, 1):
+            batch_stats, item_stats = warmer.new_stats(), warmer.new_stats()
+            batch = warmer.dedupe_items(items, enriched, max_uniques, batch_stats)
+            per_item = warmer.dedupe_items_per_item(
+                items, enriched, max_uniques, item_stats
+            )
+            case = f"seed={seed} max_uniques={max_uniques}"
+            assert batch_stats == item_stats, f"{case}: {batch_stats} != {item_stats}"
+            assert len(batch) == len(per_item), f"{case}: row counts differ"
+            for n, (a, b) in enumerate(zip(batch, per_item, strict=True)):
+                assert a == b, f"{case}: row {n}: {a} != {b}"
+            cases += 1
+    assert paths == {True, False}, "both dedup paths should be exercised"
+    print(f"dedupe parity OK: {cases} cases, {N_ITEMS} items each")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())